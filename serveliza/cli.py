@@ -1,9 +1,13 @@
 """Console script for serveliza."""
 import argparse
+import json
 import sys
 from . import __version__, __author__
 from serveliza.roll.exporter import RollExporter
-from serveliza.roll import ElectoralRoll
+from serveliza.roll.vectorizer import RollVectorizer
+from serveliza.roll.parsers import RollParser
+from serveliza.roll.catalog import RollCatalog
+from serveliza.roll import ElectoralRoll, RollMerger
 from serveliza import serveliza
 
 DESC = 'Serveliza is an application to extract data of ' \
@@ -17,6 +21,22 @@ DESC_SUBCMDS = 'Serveliza has different utilities to extract data ' \
 DESC_ROLL = 'The roll command allows the extraction of ' \
             'electoral roll data from pdf files to csv files.'
 
+DESC_ROLL_MERGE = 'The roll-merge command combines the outputs (csv ' \
+                  'files and summaries) of sharded roll commands ' \
+                  '(see --shard) into one consistent result.'
+
+DESC_ROLL_CATALOG = 'The roll-catalog command scans the pdf files (only ' \
+                    'the header of their first page) to list the rolls, ' \
+                    'regions, communes and pages they have, caching the ' \
+                    'results in an index file.'
+
+DESC_SERVE = 'The serve command starts a local extraction service (HTTP ' \
+             'on a port or a unix socket) with a pool of warmed up ' \
+             'workers: POST a pdf file (its content, or a json object ' \
+             'with its path) to /roll to receive its entries and ' \
+             'metadata in NDJSON, and GET /metrics for the depth of the ' \
+             'queue and the latencies.'
+
 EPILOG = f'Made with ♥ by @{__author__}.'
 
 
@@ -29,13 +49,33 @@ def roll_cli_wrapper(args, parser):
         'source': source,
         'output': args.output,
         'processor': args.processor,
+        'parser': args.parser,
+        'engine': args.engine,
+        'workers': args.workers,
         'mode': args.mode,
         'mode_sep': args.separator,
         'no_suffix': args.no_suffix,
         'recursive': args.recursive,
         'no_summary': args.no_summary,
         'silent': args.silent,
-        'no_colors': args.no_colors}
+        'no_colors': args.no_colors,
+        'compression': args.compression,
+        'compression_thread': args.compression_thread,
+        'file_format': args.format,
+        'part_size': args.part_size,
+        'shard': args.shard,
+        'shard_by': args.shard_by,
+        'pipeline': args.pipeline,
+        'parse_process': args.parse_process,
+        'fields': args.fields,
+        'regions': args.regions,
+        'provinces': args.provinces,
+        'communes': args.communes,
+        'catalog_index': args.catalog_index,
+        'trace': args.trace,
+        'profile': args.profile,
+        'memory_report': args.memory_report,
+        'page_timeout': args.page_timeout}
     try:
         serveliza.roll_from_pdf_to_csv(**kwargs)
     except TypeError as error:
@@ -58,12 +98,92 @@ def roll_parser(subparser):
         '-p', '--processor', help=ElectoralRoll.processor.__doc__,
         type=str, default='pdftotext',
         choices=processors)
+    parser_roll.add_argument(
+        '--parser', help=ElectoralRoll.parser.__doc__,
+        type=str, default='regex', choices=list(ElectoralRoll.parsers))
+    parser_roll.add_argument(
+        '--fields', help='Fields to extract from each entry, separated by '
+        'commas (default all): ' + ','.join(RollParser.projectable_fields),
+        type=str, metavar='fields', default=None)
+    parser_roll.add_argument(
+        '--regions', help='Regions to extract, separated by commas (the '
+        'files whose first page is of another region are skipped).',
+        type=str, metavar='regions', default=None)
+    parser_roll.add_argument(
+        '--provinces', help='Provinces to extract, separated by commas.',
+        type=str, metavar='provinces', default=None)
+    parser_roll.add_argument(
+        '--communes', help='Communes to extract, separated by commas.',
+        type=str, metavar='communes', default=None)
+    parser_roll.add_argument(
+        '--catalog-index', help='Index of the catalog (see roll-catalog) '
+        'used to filter the files by their places.',
+        type=str, metavar='index', default=None)
+    parser_roll.add_argument(
+        '--engine', help='Engine to parse the entries: line by line in each '
+        'page (sheet) or all entries of a file at once (vectorized).',
+        type=str, default='sheet', choices=RollVectorizer.engines)
+    parser_roll.add_argument(
+        '-w', '--workers', help='Number of worker processes to distribute '
+        'the files (largest first).',
+        type=int, metavar='N', default=1)
     parser_roll.add_argument(
         '-m', '--mode', help=RollExporter.mode.__doc__,
         type=str, default='unified', choices=RollExporter.modes)
     parser_roll.add_argument(
         '-s', '--separator', help=RollExporter.mode_sep.__doc__,
         type=str, default='region', choices=RollExporter.mode_sep_opts)
+    parser_roll.add_argument(
+        '-f', '--format', help=RollExporter.file_format.__doc__,
+        type=str, default='csv', choices=RollExporter.file_formats)
+    parser_roll.add_argument(
+        '--part-size', help=RollExporter.part_size.__doc__,
+        type=str, metavar='size', default='128mb')
+    parser_roll.add_argument(
+        '-c', '--compression', help=RollExporter.compression.__doc__,
+        type=str, default=None, choices=list(RollExporter.compressions))
+    parser_roll.add_argument(
+        '--compression-thread',
+        help=RollExporter.compression_thread.__doc__,
+        action='store_true', default=False)
+    parser_roll.add_argument(
+        '--pipeline', help='Overlaps rendering, parsing and exporting of '
+        'the pages in threads connected by bounded queues.',
+        action='store_true', default=False)
+    parser_roll.add_argument(
+        '--parse-process', help='Parses the pages in a worker process '
+        '(with --pipeline).',
+        action='store_true', default=False)
+    parser_roll.add_argument(
+        '--trace', help='Writes the spans of the files, pages and stages '
+        'in a json file (Chrome trace format, see chrome://tracing or '
+        'ui.perfetto.dev).',
+        type=str, metavar='path', default=None)
+    parser_roll.add_argument(
+        '--profile', help='Runs cProfile on each stage and writes its '
+        'stats (.pstats) and collapsed stacks for flamegraphs '
+        '(.collapsed) by stage and processor in the directory.',
+        type=str, metavar='dir', default=None)
+    parser_roll.add_argument(
+        '--memory-report', help='Adds a report of the memory to the '
+        'summary (peak by file and stage, bytes by memorized entry, size '
+        'of the errors and top allocation sites), sampling the resident '
+        'memory (rss) or also tracing the allocations (tracemalloc).',
+        choices=['rss', 'tracemalloc'], default=None)
+    parser_roll.add_argument(
+        '--page-timeout', help='Renders the pages in isolated worker '
+        'processes with a budget of seconds by page, the pages that time '
+        'out or crash are recorded in the summary and retried once with '
+        'the other processor.',
+        type=float, metavar='seconds', default=None)
+    parser_roll.add_argument(
+        '--shard', help='Processes only the files assigned to the shard i '
+        'of N (by a stable hash), its output can be combined with the '
+        'roll-merge command.',
+        type=str, metavar='i/N', default=None)
+    parser_roll.add_argument(
+        '--shard-by', help='Key to assign the files to shards.',
+        type=str, default='path', choices=['path', 'size'])
     parser_roll.add_argument(
         '-r', '--recursive', help=ElectoralRoll.recursive.__doc__,
         action='store_true', default=False)
@@ -82,6 +202,152 @@ def roll_parser(subparser):
     return parser_roll
 
 
+def roll_merge_cli_wrapper(args, parser):
+    if not args.sources:
+        parser.print_help()
+        return 0
+    try:
+        exported = serveliza.roll_merge(
+            args.sources, output=args.output, no_suffix=args.no_suffix)
+    except (TypeError, ValueError) as error:
+        print(f'Error! > {error}')
+        return 1
+    if not args.silent:
+        print('Merged to:')
+        for path in exported:
+            print(f' > {path}')
+
+
+def roll_merge_parser(subparser):
+    parser_merge = subparser.add_parser(
+        'roll-merge', help=DESC_ROLL_MERGE,
+        description=DESC+' '+DESC_ROLL_MERGE, epilog=EPILOG)
+    parser_merge.set_defaults(func=roll_merge_cli_wrapper)
+    parser_merge.add_argument(
+        'sources', nargs='*', type=str,
+        help=RollMerger.sources.__doc__)
+    parser_merge.add_argument(
+        '-o', '--output', help=RollMerger.output.__doc__,
+        type=str, metavar='output', default='output')
+    parser_merge.add_argument(
+        '--no-suffix', help=RollExporter.random_suffix.__doc__,
+        action='store_true', default=False)
+    parser_merge.add_argument(
+        '--silent', help='Does not print the merged files on screen.',
+        action='store_true', default=False)
+    return parser_merge
+
+
+def roll_catalog_cli_wrapper(args, parser):
+    if not args.source:
+        parser.print_help()
+        return 0
+    try:
+        catalog = serveliza.roll_catalog(
+            args.source, index=None if args.no_index else args.index,
+            workers=args.workers, processor=args.processor,
+            recursive=args.recursive)
+    except TypeError as error:
+        print(f'Error! > {error}')
+        return 1
+    if args.json:
+        print(json.dumps(catalog, ensure_ascii=False, indent=1))
+        return 0
+    for name, record in catalog.items():
+        if not record['is_roll']:
+            print(f'{name} | {record["pages"]} pages | not a roll')
+            continue
+        places = ' / '.join([str(record[x]) for x in [
+            'region', 'province', 'commune']])
+        declared = record['declared'] if record['declared'] else '-'
+        print(f'{name} | {record["pages"]} pages | {record["rid"]} | '
+              f'{places} | declared: {declared}')
+
+
+def roll_catalog_parser(subparser):
+    parser_catalog = subparser.add_parser(
+        'roll-catalog', help=DESC_ROLL_CATALOG,
+        description=DESC+' '+DESC_ROLL_CATALOG, epilog=EPILOG)
+    parser_catalog.set_defaults(func=roll_catalog_cli_wrapper)
+    parser_catalog.add_argument(
+        'source', nargs='*', type=str,
+        help=ElectoralRoll.source.__doc__)
+    parser_catalog.add_argument(
+        '-i', '--index', help=RollCatalog.index.__doc__,
+        type=str, metavar='index', default='.serveliza-catalog.json')
+    parser_catalog.add_argument(
+        '--no-index', help='Does not read or write the index file.',
+        action='store_true', default=False)
+    processors = [x[0] for x in ElectoralRoll.processor_ref.items()]
+    parser_catalog.add_argument(
+        '-p', '--processor', help=ElectoralRoll.processor.__doc__,
+        type=str, default='pdftotext', choices=processors)
+    parser_catalog.add_argument(
+        '-w', '--workers', help=RollCatalog.workers.__doc__,
+        type=int, metavar='N', default=None)
+    parser_catalog.add_argument(
+        '-r', '--recursive', help=ElectoralRoll.recursive.__doc__,
+        action='store_true', default=False)
+    parser_catalog.add_argument(
+        '--json', help='Prints the catalog in json format.',
+        action='store_true', default=False)
+    return parser_catalog
+
+
+def serve_cli_wrapper(args, parser):
+    try:
+        serveliza.roll_serve(
+            host=args.host, port=args.port, socket=args.socket,
+            workers=args.workers, max_queue=args.max_queue,
+            processor=args.processor, parser=args.parser,
+            engine=args.engine, fields=args.fields, silent=args.silent)
+    except (TypeError, OSError) as error:
+        print(f'Error! > {error}')
+        return 1
+
+
+def serve_parser(subparser):
+    parser_serve = subparser.add_parser(
+        'serve', help=DESC_SERVE, description=DESC+' '+DESC_SERVE,
+        epilog=EPILOG)
+    parser_serve.set_defaults(func=serve_cli_wrapper)
+    parser_serve.add_argument(
+        '--host', help='Host of the HTTP server.',
+        type=str, default='127.0.0.1')
+    parser_serve.add_argument(
+        '--port', help='Port of the HTTP server.',
+        type=int, default=8000)
+    parser_serve.add_argument(
+        '--socket', help='Listens on a unix socket instead of the port.',
+        type=str, metavar='path', default=None)
+    parser_serve.add_argument(
+        '-w', '--workers', help='Number of worker processes (default the '
+        'number of CPUs).',
+        type=int, metavar='N', default=None)
+    parser_serve.add_argument(
+        '--max-queue', help='Maximum of requests waiting for a worker, '
+        'the next ones are rejected (503).',
+        type=int, metavar='N', default=64)
+    processors = [x[0] for x in ElectoralRoll.processor_ref.items()]
+    parser_serve.add_argument(
+        '-p', '--processor', help=ElectoralRoll.processor.__doc__,
+        type=str, default='pdftotext', choices=processors)
+    parser_serve.add_argument(
+        '--parser', help=ElectoralRoll.parser.__doc__,
+        type=str, default='regex', choices=list(ElectoralRoll.parsers))
+    parser_serve.add_argument(
+        '--engine', help='Engine to parse the entries.',
+        type=str, default='sheet', choices=RollVectorizer.engines)
+    parser_serve.add_argument(
+        '--fields', help='Fields to extract from each entry, separated by '
+        'commas (default all): ' + ','.join(RollParser.projectable_fields),
+        type=str, metavar='fields', default=None)
+    parser_serve.add_argument(
+        '--silent', help='Does not print the address and the requests.',
+        action='store_true', default=False)
+    return parser_serve
+
+
 def main():
     '''Console script for serveliza.'''
     parser = argparse.ArgumentParser(
@@ -94,12 +360,23 @@ def main():
         title='sub-commands', description=DESC_SUBCMDS, help='description:')
     # roll subcommand parser:
     parser_roll = roll_parser(subparser)
+    # roll-merge subcommand parser:
+    parser_roll_merge = roll_merge_parser(subparser)
+    # roll-catalog subcommand parser:
+    parser_roll_catalog = roll_catalog_parser(subparser)
+    # serve subcommand parser:
+    parser_serve = serve_parser(subparser)
     # insert other subcommands here:
     # parser_cmd = cmd_parser(subparser)
     # ...
+    subparsers = {
+        roll_cli_wrapper: parser_roll,
+        roll_merge_cli_wrapper: parser_roll_merge,
+        roll_catalog_cli_wrapper: parser_roll_catalog,
+        serve_cli_wrapper: parser_serve}
     args = parser.parse_args()
-    if hasattr(args, 'func') and args.func == roll_cli_wrapper:
-        args.func(args, parser_roll)
+    if hasattr(args, 'func') and args.func in subparsers:
+        args.func(args, subparsers[args.func])
     else:
         parser.print_help()
     return 0
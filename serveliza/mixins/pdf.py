@@ -66,10 +66,17 @@ class PDFProcessorMixin(*PROCESSORS):
 
         >>> obj.process_pdf(*args)
         '''
+        self.close_pdf()  # ensure closing file.
+        return self._process_pdf
+
+    def close_pdf(self):
+        '''
+        Closes the file of the last processed pdf (if any), so its pages \
+        are released.
+        '''
         if self._tmp_file:
-            self._tmp_file.close()  # ensure closing file.
+            self._tmp_file.close()
             self._tmp_file = None
-        return self._process_pdf
 
     @property
     def process_pdf_page(self):
@@ -2,24 +2,106 @@
 # --------------------------
 import pdftotext
 from pdfminer.pdfpage import PDFPage
+from pdfminer.pdfparser import PDFParser
+from pdfminer.pdfdocument import PDFDocument
+from pdfminer.pdftypes import resolve1
 from pdfminer.pdfinterp import PDFResourceManager, PDFPageInterpreter
 from pdfminer.layout import LAParams
 from pdfminer.converter import PDFPageAggregator
 
 
+def open_binary(pathfile):
+    '''
+    Opens a path in binary mode, or returns it if it is already a \
+    binary file-like object.
+    '''
+    if hasattr(pathfile, 'read'):
+        return pathfile
+    return open(str(pathfile), 'rb')
+
+
+class PdfminersixPages:
+    '''
+    :param obj file: binary file-like object of the pdf file.
+
+    Lazy sequence of the pages of a pdf document for :meth:`processor_\
+    pdfminersix <.PdfminersixMixin.processor_pdfminersix>`. Its length \
+    is read from the page tree of the catalog (the pages are counted \
+    without rendering them only if it is missing) and the pages are \
+    created one at a time while they are iterated, so they are released \
+    after they are processed. The document does not cache its objects, \
+    so the memory does not grow with the pages already processed.
+
+    >>> pages = PdfminersixPages(open('/path/to/file.pdf', 'rb'))
+    >>> len(pages), pages[0]
+    (38, <PDFPage: ...>)
+    '''
+
+    def __len__(self):
+        if self._count is None:
+            self._count = sum(
+                [1 for _ in PDFPage.create_pages(self._document)])
+        return self._count
+
+    def __iter__(self):
+        for page in PDFPage.create_pages(self._document):
+            yield page
+
+    def __getitem__(self, index):
+        '''
+        Returns a page by its index. The pages are created in order, so \
+        the access is sequential (an index before the last one restarts \
+        the iteration).
+        '''
+        if index < 0:
+            index += len(self)
+        if self._pages is None or index < self._next:
+            self._pages, self._next = iter(self), 0
+        for page in self._pages:
+            self._next += 1
+            if self._next > index:
+                return page
+        self._pages = None
+        raise IndexError('page index out of range')
+
+    def __init__(self, file):
+        self._document = PDFDocument(PDFParser(file), caching=False)
+        self._pages, self._next = None, 0
+        try:
+            pages = resolve1(self._document.catalog['Pages'])
+            self._count = int(resolve1(pages['Count']))
+        except Exception:
+            self._count = None
+
+
 class PdftotextMixin:
     '''
     '''
+    #: options of pdftotext.PDF (eg: {'physical': True} to render the \
+    #: pages keeping the layout of the columns).
+    pdftotext_options = {}
+
     def processor_pdftotext(self, pathfile):
         '''
         Method to use `pdftotext <https://github.com/jalan/pdftotext>`_ \
-        in a file specified in the argument as a path.
+        in a file specified in the argument as a path or as a binary \
+        file-like object (eg: a memory buffer), with the options of \
+        :attr:`pdftotext_options <.PdftotextMixin.pdftotext_options>`. \
+        The pdf is loaded by poppler, but its pages are rendered one at a \
+        time when they are iterated.
 
         >>> obj.processor_pdftotext('/path/to/file.pdf')
         list # without processing
         '''
-        self._tmp_file = open(str(pathfile), 'rb')
-        return pdftotext.PDF(self._tmp_file)
+        self._tmp_file = open_binary(pathfile)
+        try:
+            return pdftotext.PDF(self._tmp_file, **self.pdftotext_options)
+        except TypeError as error:
+            if not self.pdftotext_options:
+                raise
+            raise TypeError(
+                'pdftotext options not supported by the installed '
+                f'version ({error}).')
 
     def processor_pdftotext_page(self, page):
         '''pdftotext not need that.'''
@@ -31,9 +113,13 @@ class PdfminersixMixin:
     '''
     def processor_pdfminersix(self, pathfile):
         '''
+        Method to use `pdfminersix <https://pdfminersix.readthedocs.io/>`_ \
+        in a file specified in the argument as a path or as a binary \
+        file-like object (eg: a memory buffer). It returns the pages \
+        lazily (see :class:`PdfminersixPages <.PdfminersixPages>`).
         '''
-        self._tmp_file = open(str(pathfile), 'rb')
-        return [x for x in PDFPage.get_pages(self._tmp_file)]
+        self._tmp_file = open_binary(pathfile)
+        return PdfminersixPages(self._tmp_file)
 
     def processor_pdfminersix_page(self, page):
         '''
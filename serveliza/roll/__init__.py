@@ -1,5 +1,9 @@
 
 from .roll import ElectoralRoll
+from .merger import RollMerger
+from .server import RollServer
 
 
 ER = ElectoralRoll
+
+__all__ = ['ElectoralRoll', 'RollMerger', 'RollServer', 'ER']
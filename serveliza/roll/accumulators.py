@@ -0,0 +1,346 @@
+#: key of the places that are not related to a file (they are sorted \
+#: after the places of the files).
+LAST_KEY = (float('inf'), '')
+
+
+class RollCounter:
+    '''
+    :param dict values: initial values by name (integers or timedeltas).
+
+    Mergeable counter of named values, used for the entries (*total*, \
+    *rescue*, *errors*), the nulls of each field and the durations of the \
+    stages. The merge is the sum of the values of each name, so it is \
+    associative and commutative.
+
+    >>> RollCounter({'total': 2}).merge(RollCounter({'total': 3}))
+    RollCounter({'total': 5})
+    '''
+
+    def add(self, name, value):
+        '''
+        :param str name: name of the value.
+        :param value: value to add (integer or timedelta).
+        '''
+        if name in self._values:
+            self._values[name] += value
+        else:
+            self._values[name] = value
+
+    def get(self, name, default=0):
+        '''
+        :param str name: name of the value.
+        :return: the value or the default.
+        '''
+        return self._values.get(name, default)
+
+    def update(self, values):
+        '''
+        :param dict values: values to add by name.
+        '''
+        for name, value in values.items():
+            self.add(name, value)
+
+    def merge(self, other):
+        '''
+        :param obj other: another instance of :class:`RollCounter \
+            <.RollCounter>`.
+        :return: new instance with the sum of both counters.
+        '''
+        merged = RollCounter(self._values)
+        merged.update(other._values)
+        return merged
+
+    def to_dict(self):
+        '''
+        :return: dictionary with the values by name.
+        '''
+        return dict(self._values)
+
+    def __eq__(self, other):
+        return isinstance(other, RollCounter) and \
+            self._values == other._values
+
+    def __repr__(self):
+        return f'RollCounter({self._values})'
+
+    def __init__(self, values=None):
+        self._values = dict(values or {})
+
+
+class RollPlaces:
+    '''
+    Mergeable set of places (regions, provinces or communes) that keeps \
+    the order of a serial run. Each place is stored with the smallest \
+    key where it was found (the key of the file and the number of the \
+    sheet), so the places of partial results merged in any order are \
+    listed as in a serial run.
+
+    >>> places = RollPlaces()
+    >>> places.add('ANTARTICA', ((1000, 'b.pdf'), 0))
+    >>> places.merge(other).to_list()
+    ['CABO DE HORNOS', 'ANTARTICA']
+    '''
+
+    def add(self, place, key):
+        '''
+        :param str place: name of the place.
+        :param tuple key: position of the place in a serial run.
+        '''
+        if place not in self._keys or key < self._keys[place]:
+            self._keys[place] = key
+
+    def merge(self, other):
+        '''
+        :param obj other: another instance of :class:`RollPlaces \
+            <.RollPlaces>`.
+        :return: new instance with the places of both (with the smallest \
+            key of each one).
+        '''
+        merged = RollPlaces()
+        merged._keys = dict(self._keys)
+        for place, key in other._keys.items():
+            merged.add(place, key)
+        return merged
+
+    def to_list(self):
+        '''
+        :return: list of places in the order of a serial run.
+        '''
+        return [x[0] for x in sorted(
+            self._keys.items(), key=lambda x: (x[1], str(x[0])))]
+
+    def __init__(self):
+        self._keys = {}
+
+
+class RollAccumulator:
+    '''
+    Mergeable metadata of an electoral roll (the metadata of a roll in \
+    :attr:`ElectoralRoll.metadata <.ElectoralRoll.metadata>`): the name \
+    and year of the roll, the counters of entries and nulls and the \
+    places. It is updated with the parsed sheets by :meth:`add \
+    <.RollAccumulator.add>` and partial accumulators (from workers or \
+    shards) are combined by :meth:`merge <.RollAccumulator.merge>` in \
+    any order with the same result as a serial run.
+
+    >>> accumulator = RollAccumulator()
+    >>> accumulator.add(parsed, ((1000, 'a.pdf'), 0))
+    >>> accumulator.merge(other).to_dict()
+    {'roll': ..., 'year': ..., 'regions': [...], 'communes': [...],
+     'provinces': [...], 'nulls': {'total': 0},
+     'entries': {'total': 999, 'rescue': 0, 'errors': 0}}
+    '''
+
+    #: places of the roll and their attribute in the header.
+    places = {'regions': 'region', 'communes': 'commune',
+              'provinces': 'province'}
+
+    def add(self, parsed, key):
+        '''
+        :param obj parsed: instance of :class:`RollParser <.RollParser>`.
+        :param tuple key: position of the sheet in a serial run.
+
+        Adds a parsed sheet: its roll, places, entries and nulls.
+        '''
+        self.add_roll(parsed, key)
+        self.add_sheet_places(parsed, key)
+        self.add_sheet_entries(parsed)
+        self.add_sheet_nulls(parsed)
+
+    def add_roll(self, parsed, key):
+        '''
+        Takes the name and year of the roll of the first sheet (in the \
+        order of a serial run) and the declared entries.
+        '''
+        if self.key is None or key < self.key:
+            self.key = key
+            self.roll, self.year = parsed.header['roll'], \
+                parsed.header['year']
+        if self.declared is None:
+            self.declared = parsed.header.get('total_sheets') or None
+
+    def add_sheet_places(self, parsed, key):
+        '''
+        Adds the region, province and commune of a parsed sheet.
+        '''
+        for name, attr in self.places.items():
+            self._places[name].add(parsed.header[attr], key)
+
+    def add_sheet_entries(self, parsed):
+        '''
+        Adds the entries, rescued entries and errors of a parsed sheet.
+        '''
+        self.entries.update({
+            'total': len(parsed.entries),
+            'rescue': parsed.metadata['entries'].get('rescue', 0),
+            'errors': len(parsed.errors)})
+
+    def add_sheet_nulls(self, parsed):
+        '''
+        Adds the nulls (total and of each field) of a parsed sheet.
+        '''
+        nulls = parsed.metadata['nulls']
+        if not nulls['total']:
+            return None
+        self.nulls.add('total', nulls['total'])
+        for field in parsed.metadata['fields']:
+            if field in nulls:
+                self.nulls.add(field, nulls[field])
+
+    def add_metadata(self, metadata, key=LAST_KEY):
+        '''
+        :param dict metadata: metadata of a roll (eg: of a summary).
+        :param tuple key: position of the roll in a serial run.
+
+        Adds the metadata of a roll already accumulated (its places are \
+        sorted after those of the files, see :meth:`add_places \
+        <.RollAccumulator.add_places>`).
+        '''
+        if self.key is None or key < self.key:
+            self.key = key
+            self.roll, self.year = metadata.get('roll'), metadata.get('year')
+        entries = dict(metadata.get('entries', {}))
+        if self.declared is None:
+            self.declared = entries.get('declared')
+        entries.pop('declared', None)
+        self.entries.update(entries)
+        self.nulls.update(metadata.get('nulls', {}))
+        for name in self.places:
+            for idx, place in enumerate(metadata.get(name, [])):
+                self._places[name].add(place, (key, idx))
+
+    def add_places(self, file, key):
+        '''
+        :param dict file: metadata of a file (with its *region*, \
+            *province* and *commune*).
+        :param tuple key: position of the file in a serial run.
+        '''
+        for name, attr in self.places.items():
+            if file.get(attr) is not None:
+                self._places[name].add(file[attr], (key, 0))
+
+    def merge(self, other):
+        '''
+        :param obj other: another instance of :class:`RollAccumulator \
+            <.RollAccumulator>`.
+        :return: new instance with the metadata of both.
+        '''
+        merged = RollAccumulator()
+        first = other if self.key is None or (
+            other.key is not None and other.key < self.key) else self
+        merged.key, merged.roll, merged.year = \
+            first.key, first.roll, first.year
+        merged.declared = self.declared if self.declared is not None \
+            else other.declared
+        merged.entries = self.entries.merge(other.entries)
+        merged.nulls = self.nulls.merge(other.nulls)
+        for name in self.places:
+            merged._places[name] = self._places[name].merge(
+                other._places[name])
+        return merged
+
+    def to_dict(self):
+        '''
+        :return: dictionary with the metadata of the roll.
+        '''
+        entries = self.entries.to_dict()
+        if self.declared:
+            entries['declared'] = self.declared
+        return {
+            'roll': self.roll, 'year': self.year,
+            **{x: self._places[x].to_list() for x in self.places},
+            'nulls': self.nulls.to_dict(), 'entries': entries}
+
+    def __init__(self):
+        self.key, self.roll, self.year, self.declared = None, None, None, \
+            None
+        self.entries = RollCounter({'total': 0, 'rescue': 0, 'errors': 0})
+        self.nulls = RollCounter({'total': 0})
+        self._places = {x: RollPlaces() for x in self.places}
+
+
+class RollPartial:
+    '''
+    Mergeable partial result of a run of :class:`ElectoralRoll \
+    <.ElectoralRoll>` (of a worker, a shard or a summary): the \
+    accumulators of each roll (see :class:`RollAccumulator \
+    <.RollAccumulator>`), the durations of the stages and the start and \
+    finalization of the analysis. Partial results reduced with \
+    :meth:`merge <.RollPartial.merge>` in any order give the metadata of \
+    a serial run.
+
+    >>> partial = RollPartial.from_metadata(shard_1.metadata)
+    >>> partial.merge(RollPartial.from_metadata(shard_2.metadata))\
+    .to_metadata()
+    {'files': {...}, 'analysis': {...}, 'rolls': {...}}
+    '''
+
+    @classmethod
+    def from_metadata(cls, metadata, convert=None):
+        '''
+        :param dict metadata: metadata of a run (see \
+            :attr:`ElectoralRoll.metadata <.ElectoralRoll.metadata>`) or \
+            of its summary.
+        :param function convert: function that converts a timestamp or \
+            a duration serialized in a summary (with its value and its \
+            kind, *datetime* or *timedelta*), by default they are taken \
+            as is.
+        :return: instance of :class:`RollPartial <.RollPartial>`.
+
+        The places of each roll are sorted by the files where they were \
+        found, as in a serial run (by size and name).
+        '''
+        convert = convert or (lambda value, kind: value)
+        partial = cls()
+        files = metadata.get('files', {}) or {}
+        partial.files = dict(files)
+        analysis = metadata.get('analysis', {}) or {}
+        for name in ['started', 'finalized']:
+            if analysis.get(name):
+                setattr(partial, name, convert(analysis[name], 'datetime'))
+        for stage, duration in (analysis.get('durations') or {}).items():
+            partial.durations.add(stage, convert(duration, 'timedelta'))
+        for rid, roll in (metadata.get('rolls', {}) or {}).items():
+            accumulator = RollAccumulator()
+            accumulator.add_metadata(roll)
+            for name, file in files.items():
+                if file.get('rid') == rid:
+                    accumulator.add_places(
+                        file, (file.get('bytes', 0), name))
+            partial.rolls[rid] = accumulator
+        return partial
+
+    def merge(self, other):
+        '''
+        :param obj other: another instance of :class:`RollPartial \
+            <.RollPartial>`.
+        :return: new instance with the partial results of both.
+        '''
+        merged = RollPartial()
+        merged.files = {**self.files, **other.files}
+        merged.durations = self.durations.merge(other.durations)
+        started = [x for x in [self.started, other.started] if x]
+        finalized = [x for x in [self.finalized, other.finalized] if x]
+        merged.started = min(started) if started else None
+        merged.finalized = max(finalized) if finalized else None
+        merged.rolls = dict(self.rolls)
+        for rid, accumulator in other.rolls.items():
+            merged.rolls[rid] = merged.rolls[rid].merge(accumulator) \
+                if rid in merged.rolls else accumulator
+        return merged
+
+    def to_metadata(self):
+        '''
+        :return: dictionary with the metadata (files, analysis and rolls).
+        '''
+        return {
+            'files': dict(self.files),
+            'analysis': {
+                'started': self.started, 'finalized': self.finalized,
+                'durations': self.durations.to_dict()},
+            'rolls': {x: y.to_dict() for x, y in self.rolls.items()}}
+
+    def __init__(self):
+        self.files, self.rolls = {}, {}
+        self.durations = RollCounter()
+        self.started, self.finalized = None, None
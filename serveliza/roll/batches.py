@@ -0,0 +1,225 @@
+import numpy as np
+
+try:
+    from multiprocessing import shared_memory, resource_tracker
+except ImportError:
+    shared_memory = None
+
+
+class RollBatch:
+    '''
+    :param list sheets: parsed sheets (instances of :class:`RollParser \
+        <.RollParser>`) whose entries are packed in the batch.
+
+    :class:`RollBatch <.RollBatch>` transfers the entries of parsed \
+    sheets from a worker process to the main process as a columnar \
+    batch, instead of pickling them as lists of small strings. For each \
+    field, the values of all sheets are joined by a separator in one UTF-8 \
+    buffer, with a mask of the nulls and, only if a value has the \
+    separator, an array of offsets (in characters). The block is \
+    placed in shared memory (*multiprocessing.shared_memory*, python \
+    3.8 or later, otherwise it travels as one bytes object) and only its \
+    name and layout are pickled with the sheets.
+
+    In the worker, the entries of the sheets are moved to the batch. In \
+    the main process, :meth:`unpack <.RollBatch.unpack>` decodes and \
+    splits each buffer at once (there is no deserialization per row), \
+    gives the entries back to the sheets and releases the shared memory.
+
+    >>> batch = RollBatch(sheets)  # worker process
+    >>> sheets[0].entries
+    []
+    >>> batch.unpack(sheets)  # main process
+    >>> sheets[0].entries[0]
+    ('NAME', '1.111.111-1', ...)
+    '''
+
+    #: separator of the values in the buffers (the unit separator).
+    separator = '\x1f'
+
+    def pack(self, sheets):
+        '''
+        :param list sheets: parsed sheets.
+        :return: the block (bytes) of the batch.
+
+        Builds the block with one buffer for each field of the entries of \
+        all sheets and stores the layout of the batch: the rows and width \
+        of each sheet and, for each field, the position of its parts in \
+        the block. Fields with repeated values (as the places or the \
+        circunscription) are dictionary encoded: the buffer has the \
+        unique values and an array has the code of each entry.
+        '''
+        rows = []
+        for parsed in sheets:
+            entries = parsed.entries
+            width = max([len(x) for x in entries] or [0])
+            self._sections.append((len(entries), width))
+            rows += entries
+            parsed._entries = []
+        width = max([x[1] for x in self._sections] or [0])
+        if any(len(x) != width for x in rows):
+            rows = [list(x) + [None] * (width - len(x)) for x in rows]
+        parts = []
+        for column in zip(*rows):
+            span = {}
+            uniques = list(dict.fromkeys(column))
+            if len(uniques) * 2 <= len(column):
+                index = {x: idx for idx, x in enumerate(uniques)}
+                codes = np.array(list(map(index.__getitem__, column)),
+                                 dtype=np.int32)
+                span['codes'] = self.append(parts, codes.tobytes())
+                column = uniques
+            values = [x or '' for x in column]
+            text = self.separator.join(values)
+            if text.count(self.separator) != len(values) - 1:
+                text = ''.join(values)
+                offsets = np.cumsum(
+                    [0] + [len(x) for x in values], dtype=np.int64)
+                span['offsets'] = self.append(parts, offsets.tobytes())
+            span['values'] = self.append(parts, text.encode('utf-8'))
+            if None in column:
+                nulls = np.array([x is None for x in column], dtype=np.uint8)
+                span['nulls'] = self.append(parts, nulls.tobytes())
+            self._spans.append(span)
+        return b''.join(parts)
+
+    @staticmethod
+    def append(parts, data):
+        '''
+        :param list parts: parts of the block.
+        :param bytes data: data to append.
+        :return: tuple with the position of the data in the block.
+        '''
+        start = sum([len(x) for x in parts])
+        parts.append(data)
+        return start, start + len(data)
+
+    def unpack(self, sheets):
+        '''
+        :param list sheets: the parsed sheets of the batch (without \
+            entries).
+
+        Gives back the entries of each sheet from the block and releases \
+        it.
+        '''
+        block = self.open()
+        try:
+            entries = self.read(block)
+        finally:
+            self.release()
+        start = 0
+        for parsed, (rows, width) in zip(sheets, self._sections):
+            parsed._entries = entries[start:start + rows]
+            if width < len(self._spans):
+                parsed._entries = [x[:width] for x in parsed._entries]
+            start += rows
+
+    def read(self, block):
+        '''
+        :param block: buffer of the block.
+        :return: list of entries (tuples) of all sheets.
+
+        Each buffer is decoded once and split by the separator (or \
+        sliced by its offsets if a value has the separator), and the \
+        codes of the dictionary encoded fields are mapped to their values \
+        (which are shared, as unpickling does).
+        '''
+        columns = []
+        for span in self._spans:
+            start, end = span['values']
+            text = bytes(block[start:end]).decode('utf-8')
+            if 'offsets' in span:
+                start, end = span['offsets']
+                index = np.frombuffer(block[start:end], dtype=np.int64)
+                index = index.tolist()
+                column = [text[x:y] for x, y in zip(index, index[1:])]
+            else:
+                column = text.split(self.separator)
+            if 'nulls' in span:
+                start, end = span['nulls']
+                nulls = np.frombuffer(block[start:end], dtype=np.uint8)
+                for idx in np.flatnonzero(nulls).tolist():
+                    column[idx] = None
+            if 'codes' in span:
+                start, end = span['codes']
+                codes = np.frombuffer(block[start:end], dtype=np.int32)
+                column = list(map(column.__getitem__, codes.tolist()))
+            columns.append(column)
+        return list(zip(*columns))
+
+    def open(self):
+        '''
+        :return: buffer of the block (in shared memory or in bytes).
+        '''
+        if self._name is None:
+            return self._data
+        self._memory = shared_memory.SharedMemory(name=self._name)
+        return self._memory.buf
+
+    def release(self):
+        '''
+        Closes and removes the shared memory of the batch (also if it \
+        was not read).
+        '''
+        if self._name is not None:
+            try:
+                memory = self._memory or shared_memory.SharedMemory(
+                    name=self._name)
+                memory.close()
+                memory.unlink()
+            except FileNotFoundError:
+                pass
+            self._memory = None
+        self._name, self._data = None, b''
+
+    @staticmethod
+    def start_tracker():
+        '''
+        Starts the resource tracker of the main process before the \
+        workers, so they share it: the blocks created by the workers are \
+        registered in it until the main process releases them, and the \
+        blocks that are never released (eg: when the run is interrupted) \
+        are removed when the main process exits.
+        '''
+        if shared_memory is not None:
+            resource_tracker.ensure_running()
+
+    @property
+    def size(self):
+        '''
+        :return: integer.
+
+        Bytes of the block of the batch.
+        '''
+        return self._size
+
+    @property
+    def in_shared_memory(self):
+        '''
+        :return: boolean.
+
+        Property that indicates if the block is in shared memory.
+        '''
+        return self._name is not None
+
+    def __getstate__(self):
+        return {'sections': self._sections, 'spans': self._spans,
+                'name': self._name,
+                'data': self._data, 'size': self._size}
+
+    def __setstate__(self, state):
+        self._sections, self._spans = state['sections'], state['spans']
+        self._name, self._data = state['name'], state['data']
+        self._size, self._memory = state['size'], None
+
+    def __init__(self, sheets):
+        self._sections, self._spans = [], []
+        self._name, self._memory = None, None
+        self._data = self.pack(sheets)
+        self._size = len(self._data)
+        if shared_memory is None or not self._data:
+            return None
+        memory = shared_memory.SharedMemory(create=True, size=self._size)
+        memory.buf[:self._size] = self._data
+        self._name, self._data = memory.name, b''
+        memory.close()
@@ -0,0 +1,236 @@
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from collections import deque
+import hashlib
+import json
+import io
+import os
+
+from serveliza.mixins.pdf import PDFProcessorMixin
+from .adapters import RollAdapter
+from .parsers import RollParser
+from .layouts import detect_layout
+
+
+def scan_file(source, options):
+    '''
+    :param source: absolute path of the pdf file or its content (bytes).
+    :param dict options: processor and pdftotext options.
+    :return: dictionary with the header of the file (see :class:`\
+        RollCatalog <.RollCatalog>`).
+
+    Function executed in the worker processes of :class:`RollCatalog \
+    <.RollCatalog>`. It renders only the first page of the file and \
+    parses its header (with the parser of its layout, if it is detected).
+    '''
+    worker = PDFProcessorMixin()
+    worker.processor = options['processor']
+    worker.pdftotext_options = options['pdftotext_options']
+    if isinstance(source, bytes):
+        source = io.BytesIO(source)
+    record = {'is_roll': False, 'pages': 0}
+    try:
+        pdf = worker.process_pdf(source)
+        record['pages'] = len(pdf)
+        if not record['pages']:
+            return record
+        sheet = RollAdapter(
+            worker.process_pdf_page(pdf[0]), options['processor']).sheet
+    except Exception as error:
+        record['error'] = f'{error.__class__.__name__}: {error}'
+        return record
+    finally:
+        worker.close_pdf()
+    if not isinstance(sheet, str) or not sheet.strip():
+        return record
+    parser_class = detect_layout(sheet)
+    parser = (parser_class or RollParser)(sheet, auto=False)
+    parser.run(entries=False)
+    if not parser.header:
+        return record
+    header = parser.header
+    record.update({
+        'is_roll': True,
+        'layout': parser_class.layout_name if parser_class else None,
+        'rid': parser.metadata.get('rid'), 'roll': header.get('roll'),
+        'year': header.get('year'), 'region': header.get('region'),
+        'province': header.get('province'),
+        'commune': header.get('commune'),
+        'declared': header.get('total_entries')})
+    return record
+
+
+class RollCatalog:
+    '''
+    :param str index: path of the index file where the scanned files \
+        are cached (default None, without cache).
+    :param int workers: Number of worker processes to scan the files \
+        (default the number of cpus).
+
+    :class:`RollCatalog <.RollCatalog>` makes a fast scan of the files \
+    of :class:`ElectoralRoll <.ElectoralRoll>` before a long run: it \
+    renders only the first page of each file and parses its header, so \
+    it knows the roll, the region, province and commune, the pages and \
+    the declared entries (*Registros*) of each file, and which files are \
+    not electoral rolls. The files are scanned in parallel (see \
+    :func:`scan_file <.scan_file>`).
+
+    The results are cached in a json index by the signature of each \
+    file (its path, size and modification time, or the hash of the \
+    content of the files in memory), so the next scans only render the \
+    new or modified files.
+
+    >>> roll = ElectoralRoll(source='/path/to/dir')
+    >>> roll.catalog(index='catalog.json')
+    {'file.pdf': {'is_roll': True, 'pages': 99, 'layout': '2016',
+     'rid': 'PEA-EM-2016', 'roll': 'PADRON ELECTORAL ... 2016',
+     'year': 2016, 'region': 'METRO...', 'province': 'SANTIA...',
+     'commune': 'SANTIA...', 'declared': None, 'cached': False}}
+    '''
+
+    #: version of the format of the index.
+    index_version = 1
+
+    def run(self, roll):
+        '''
+        :param obj roll: instance of :class:`ElectoralRoll <.ElectoralRoll>`.
+        :return: dictionary with the record of each file by name.
+
+        Scans the files that are not in the index (or were modified), \
+        ordered from the largest, and updates the index.
+        '''
+        files = roll._metadata.files
+        cached = self.load_index()
+        catalog, pending = {}, []
+        for name, file in files.items():
+            key, signature = self.get_signature(roll, file.data)
+            entry = cached.get(key)
+            if entry and entry.get('signature') == signature:
+                catalog[name] = {**entry['record'], 'cached': True}
+            else:
+                pending.append((name, key, signature))
+        pending.sort(key=lambda x: -files[x[0]].data['bytes'])
+        options = {'processor': roll.processor,
+                   'pdftotext_options': roll.pdftotext_options}
+        sources = (self.get_source(roll, files[x[0]].data) for x in pending)
+        if self.workers > 1 and len(pending) > 1:
+            records = self.scan(sources, options,
+                                min(self.workers, len(pending)))
+        else:
+            records = [scan_file(x, options) for x in sources]
+        for (name, key, signature), record in zip(pending, records):
+            cached[key] = {'signature': signature, 'record': record}
+            catalog[name] = {**record, 'cached': False}
+        if pending:
+            self.save_index(cached)
+        return {x: catalog[x] for x in files}
+
+    @staticmethod
+    def scan(sources, options, workers):
+        '''
+        :param iter sources: sources of the files (see :meth:`get_source \
+            <.RollCatalog.get_source>`).
+        :param dict options: processor and pdftotext options.
+        :param int workers: number of worker processes.
+        :return: list with the record of each file.
+
+        Scans the files in worker processes with at most two files per \
+        worker in flight, so the content of the members of archives and \
+        the files in memory is read (and sent to the workers) only \
+        shortly before it is scanned.
+        '''
+        records, window = [], deque()
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for source in sources:
+                if len(window) >= 2 * workers:
+                    records.append(window.popleft().result())
+                window.append(executor.submit(scan_file, source, options))
+            records += [x.result() for x in window]
+        return records
+
+    @staticmethod
+    def get_signature(roll, file):
+        '''
+        :param obj roll: instance of :class:`ElectoralRoll <.ElectoralRoll>`.
+        :param dict file: data of file.
+        :return: tuple with the key of the file in the index and its \
+            signature.
+
+        The files on disk and the members of archives are identified by \
+        their absolute path, size and modification time. The files in \
+        memory (that have no modification time) by the hash of their \
+        content.
+        '''
+        if file.get('buffer'):
+            digest = hashlib.sha1(
+                roll.open_file(file).getvalue()).hexdigest()
+            return f'sha1:{digest}', digest
+        return file['absolute'], f"{file['bytes']}:{file['mtime']}"
+
+    @staticmethod
+    def get_source(roll, file):
+        '''
+        :param obj roll: instance of :class:`ElectoralRoll <.ElectoralRoll>`.
+        :param dict file: data of file.
+        :return: absolute path of the file or its content (bytes) for \
+            members of archives and pdf files in memory.
+        '''
+        source = roll.open_file(file)
+        return source.getvalue() if hasattr(source, 'getvalue') else source
+
+    def load_index(self):
+        '''
+        :return: dictionary with the cached entries (empty if there is no \
+            index, it can not be read or has another version).
+        '''
+        if not self.index or not Path(self.index).is_file():
+            return {}
+        try:
+            with open(self.index, encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if not isinstance(data, dict) or \
+                data.get('version') != self.index_version:
+            return {}
+        return data.get('files', {})
+
+    def save_index(self, files):
+        '''
+        :param dict files: cached entries of the index.
+
+        Writes the index to a temporary file that replaces the previous \
+        one, so an interrupted scan does not leave a broken index.
+        '''
+        if not self.index:
+            return None
+        path = Path(self.index)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temporary = path.with_name(path.name + '.tmp')
+        with open(temporary, 'w', encoding='utf-8') as f:
+            json.dump({'version': self.index_version, 'files': files}, f,
+                      ensure_ascii=False, indent=1)
+        os.replace(str(temporary), str(path))
+
+    @property
+    def index(self):
+        '''
+        Path of the index file (or None).
+        '''
+        return self._index
+
+    @property
+    def workers(self):
+        '''
+        Number of worker processes.
+        '''
+        return self._workers
+
+    def __init__(self, index=None, workers=None):
+        self._index = str(index) if index else None
+        try:
+            self._workers = int(workers or os.cpu_count() or 1)
+        except (TypeError, ValueError):
+            raise TypeError('workers must be an integer.')
+        if self._workers < 1:
+            raise TypeError('workers must be greater than 0.')
@@ -1,11 +1,82 @@
 from pathlib import Path
 from datetime import datetime, timedelta
 from string import ascii_letters
+from urllib.parse import quote
+import threading
 import random
+import queue
+import gzip
+import lzma
+import bz2
+import io
 import yaml
 from slugify import slugify
 import csv
 
+from serveliza.utils import humanize
+
+
+class RollCountingStream:
+    '''
+    :param obj stream: text stream to wrap.
+
+    Wrapper of a text stream that counts the characters written through \
+    it (uncompressed size), used by :class:`RollExporter <.RollExporter>` \
+    for the size-based rollover of the partitioned mode.
+    '''
+
+    def write(self, text):
+        self.size += len(text)
+        return self.stream.write(text)
+
+    def close(self):
+        self.stream.close()
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.size = 0
+
+
+class RollParquetWriter:
+    '''
+    :param obj file: path of the parquet file.
+    :param list fields: fields of the entries (columns).
+    :param str compression: parquet compression codec.
+    :raises ImportError: parquet format requires the pyarrow library.
+
+    Writer of entries in a parquet file with the interface of the csv \
+    writers used by :class:`RollExporter <.RollExporter>`. Each call to \
+    :meth:`writerows <.RollParquetWriter.writerows>` writes a row group \
+    with string columns.
+    '''
+
+    def writerows(self, entries):
+        entries = list(entries)
+        if not entries:
+            return None
+        columns = [self.pa.array(list(x), type=self.pa.string())
+                   for x in zip(*entries)]
+        table = self.pa.Table.from_arrays(columns, schema=self.schema)
+        self.size += table.nbytes
+        self.writer.write_table(table)
+
+    def close(self):
+        self.writer.close()
+
+    def __init__(self, file, fields, compression=None):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise ImportError('parquet format requires the pyarrow '
+                              'library (pip install pyarrow).')
+        self.pa = pyarrow
+        self.schema = pyarrow.schema(
+            [(x, pyarrow.string()) for x in fields])
+        self.writer = pyarrow.parquet.ParquetWriter(
+            str(file), self.schema, compression=compression or 'snappy')
+        self.size = 0
+
 
 class RollExporter:
     '''
@@ -24,15 +95,39 @@ class RollExporter:
         random text string appended to the end.
     :param bool summary: Determines whether to generate a summary file of \
         the export and the extracted data.
+    :param str compression: Compressor used to write the csv files \
+        (*gzip*, *bz2*, *xz* or *zstd*, default None, see more in \
+        :attr:`compression <.RollExporter.compression>`).
+    :param bool compression_thread: Determines whether the writing \
+        (and compression) of the files runs in a background thread.
+    :param str file_format: Format of the files in partitioned mode \
+        (*csv* or *parquet*, default csv).
+    :param part_size: Size (in bytes or text string as '128mb') of each \
+        part file in partitioned mode before rolling over to a new one.
+
+    The files are kept open (one handle per file) during the export, so \
+    the :meth:`close <.RollExporter.close>` method must be called at the \
+    end to flush and close them.
 
     It is instantiated within an instance of :class:`ElectoralRoll \
     <.ElectoralRoll>`.
     '''
 
     #: Available export modes.
-    modes = ['unified', 'separated']
+    modes = ['unified', 'separated', 'partitioned']
     #: Available file separation modes
     mode_sep_opts = ['commune', 'region']
+    #: Available compressors and their file suffixes.
+    compressions = {'gzip': '.gz', 'bz2': '.bz2', 'xz': '.xz', 'zstd': '.zst'}
+    #: Available file formats (parquet only in partitioned mode).
+    file_formats = ['csv', 'parquet']
+    #: Columns stored in the partition path (as region and commune) \
+    #: instead of the part files.
+    partition_columns = ['region', 'comuna']
+    #: Value of partitions without data (as hive does).
+    default_partition = '__HIVE_DEFAULT_PARTITION__'
+    #: Maximum of sheets waiting for the background thread.
+    queue_size = 64
 
     def export_sheet(self, parsed):
         '''
@@ -41,19 +136,192 @@ class RollExporter:
 
         :meth:`export_sheet <.RollExporter.export_sheet>` is a method of \
         exporting the data from a parsed sheet into files as configured \
-        in the constructor.
+        in the constructor. In partitioned mode it returns the directory \
+        of the electoral roll (*rid=...*).
         '''
         if not self.is_active:
             return None
         file, created = self.get_or_create_file(parsed)
-        with file.open('a') as f:
-            writer = csv.writer(f)
-            if created:
-                writer.writerow(parsed.fields)
-            for entry in parsed.entries:
-                writer.writerow(entry)
+        task = (file, created, parsed.fields, parsed.entries)
+        if self.compression_thread:
+            if self._thread is None:
+                self.start_thread()
+            self._queue.put(task)
+        else:
+            self.write_entries(*task)
+        if self.mode == 'partitioned':
+            file = file.parents[1]
         return str(file.absolute())
 
+    def write_entries(self, file, created, fields, entries):
+        '''
+        :param obj file: path of the file (or partition directory).
+        :param bool created: if the file was created (writes the fields).
+        :param list fields: fields of the entries.
+        :param list entries: entries to write.
+
+        Method that writes the entries in the persistent handle of \
+        the file (see :meth:`get_handle <.RollExporter.get_handle>` and \
+        :meth:`get_part <.RollExporter.get_part>`).
+        '''
+        if self.mode == 'partitioned':
+            kept = [idx for idx, x in enumerate(fields)
+                    if x not in self.partition_columns]
+            if len(kept) < len(fields):
+                fields = [fields[x] for x in kept]
+                entries = [tuple(x[y] for y in kept) for x in entries]
+            writer, created = self.get_part(file, fields)
+        else:
+            writer = self.get_handle(file)[1]
+        if created and self.file_format == 'csv':
+            writer.writerow(fields)
+        writer.writerows(entries)
+
+    def get_handle(self, file):
+        '''
+        :param obj file: path of the file.
+        :return: tuple with the stream and the csv writer of the file.
+
+        Returns the handle of the file, opening it (in append mode and \
+        through the compressor if defined) the first time.
+        '''
+        key = str(file)
+        if key not in self._handles:
+            stream = RollCountingStream(self.open_stream(file))
+            self._handles[key] = (stream, csv.writer(stream))
+        return self._handles[key]
+
+    def get_part(self, partition, fields):
+        '''
+        :param obj partition: path of the partition directory.
+        :param list fields: fields of the entries.
+        :return: tuple with the writer of the current part file of the \
+            partition and if it was created.
+
+        Returns the writer of the current part file of the partition. \
+        When the part passes the :attr:`part_size \
+        <.RollExporter.part_size>` it is closed and the next one \
+        (*part-NNNN*) is created. Existing parts are never overwritten.
+        '''
+        key = str(partition)
+        handle = self._handles.get(key)
+        if handle and handle[0].size < self.part_size:
+            return handle[1], False
+        if handle:
+            handle[0].close()
+        number = self._parts.get(key, -1) + 1
+        file = partition / self.part_name(number)
+        while file.exists():
+            number += 1
+            file = partition / self.part_name(number)
+        self._parts[key] = number
+        if self.file_format == 'parquet':
+            writer = RollParquetWriter(file, fields, self.compression)
+            self._handles[key] = (writer, writer)
+        else:
+            stream = RollCountingStream(self.open_stream(file))
+            self._handles[key] = (stream, csv.writer(stream))
+        return self._handles[key][1], True
+
+    def part_name(self, number):
+        '''
+        :param int number: number of the part.
+        :return: name of the part file (eg: *part-0000.csv*).
+        '''
+        name = f'part-{number:04d}'
+        if self.random_suffix:
+            name += f'-{self.random_suffix}'
+        name += '.' + self.file_format
+        if self.compression and self.file_format == 'csv':
+            name += self.compressions[self.compression]
+        return name
+
+    def get_partition(self, parsed):
+        '''
+        :param obj parsed: an instance of :class:`RollParser <.RollParser>`.
+        :return: path of the partition directory of the sheet.
+
+        Creates (if not exists) and returns the hive-style partition \
+        directory of the sheet: *rid=.../region=.../commune=...*. The \
+        values are escaped as URIs (as hive does).
+        '''
+        def __value(value):
+            return quote(value, safe=" ',") if value \
+                else self.default_partition
+        partition = self.output / f'rid={parsed.metadata["rid"]}'
+        partition /= f'region={__value(parsed.header.get("region"))}'
+        partition /= f'commune={__value(parsed.header.get("commune"))}'
+        partition.mkdir(parents=True, exist_ok=True)
+        return partition
+
+    def open_stream(self, file):
+        '''
+        :param obj file: path of the file.
+        :return: text stream to write in the file.
+        :raises ImportError: zstd compression requires the zstandard \
+            library.
+        '''
+        if not self.compression:
+            return file.open('a')
+        if self.compression == 'gzip':
+            return gzip.open(str(file), 'at')
+        if self.compression == 'bz2':
+            return bz2.open(str(file), 'at')
+        if self.compression == 'xz':
+            return lzma.open(str(file), 'at')
+        try:
+            import zstandard
+        except ImportError:
+            raise ImportError('zstd compression requires the zstandard '
+                              'library (pip install zstandard).')
+        writer = zstandard.ZstdCompressor().stream_writer(file.open('ab'))
+        return io.TextIOWrapper(writer)
+
+    def start_thread(self):
+        '''
+        Starts the background thread that writes the sheets queued by \
+        :meth:`export_sheet <.RollExporter.export_sheet>`.
+        '''
+        self._queue = queue.Queue(maxsize=self.queue_size)
+        self._thread = threading.Thread(
+            target=self.consume_queue, daemon=True)
+        self._thread.start()
+
+    def consume_queue(self):
+        '''
+        Loop of the background thread. A None task stops it. If an \
+        error occurs it is kept to be raised by :meth:`close \
+        <.RollExporter.close>` and the remaining tasks are discarded.
+        '''
+        while True:
+            task = self._queue.get()
+            if task is None:
+                break
+            if self._thread_error:
+                continue
+            try:
+                self.write_entries(*task)
+            except Exception as error:
+                self._thread_error = error
+
+    def close(self):
+        '''
+        Waits for the background thread (if any) and closes all the \
+        handles of the exported files.
+        '''
+        if not self.is_active:
+            return None
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+        for stream, _ in self._handles.values():
+            stream.close()
+        self._handles, self._parts = {}, {}
+        if self._thread_error:
+            error, self._thread_error = self._thread_error, None
+            raise error
+
     def export_summary(self, rid, metadata):
         '''
         :param str rid: identifier of the electoral roll
@@ -84,6 +352,8 @@ class RollExporter:
         return str(file.absolute())
 
     def get_or_create_file(self, parsed):
+        if self.mode == 'partitioned':
+            return self.get_partition(parsed), False
         suffix, created = '', False
         if self.mode == 'separated':
             suffix = slugify(parsed.header[self.mode_sep]) + '-'
@@ -91,6 +361,8 @@ class RollExporter:
         if self.random_suffix:
             name += f'-{self.random_suffix}'
         name += '.csv'
+        if self.compression:
+            name += self.compressions[self.compression]
         file = self.output / name
         if not file.exists():
             created = True
@@ -127,7 +399,10 @@ class RollExporter:
         Determines the data export mode in files. If it is "unified" \
         (default) it creates a single csv file with the data, or if it \
         is "separated" into several according to communal or \
-        regional criteria.'
+        regional criteria.' If it is "partitioned" it creates \
+        hive-style directories by roll, region and commune \
+        (rid=.../region=.../commune=...) with part files (the region \
+        and commune columns are stored only in the partition path).
         '''
         return self._mode
 
@@ -152,6 +427,59 @@ class RollExporter:
                             ','.join(self.mode_sep_opts))
         self._mode_sep = mode_sep
 
+    @property
+    def compression(self):
+        '''
+        Compressor used to write the csv files (gzip, bz2, xz or zstd). \
+        The data is compressed in a streaming way, so the csv files are \
+        never written uncompressed.
+        '''
+        return self._compression
+
+    @compression.setter
+    def compression(self, compression):
+        if compression and compression not in self.compressions:
+            raise TypeError('compression must be: ' +
+                            ','.join(self.compressions))
+        self._compression = compression or None
+
+    @property
+    def file_format(self):
+        '''
+        Format of the exported files in partitioned mode (csv or parquet).
+        '''
+        return self._file_format
+
+    @file_format.setter
+    def file_format(self, file_format):
+        if file_format not in self.file_formats:
+            raise TypeError('file_format must be: ' +
+                            ','.join(self.file_formats))
+        if file_format == 'parquet' and self.mode != 'partitioned':
+            raise TypeError('parquet format is only available in '
+                            'partitioned mode.')
+        if file_format == 'parquet' and self.compression not in [
+                None, 'gzip', 'zstd']:
+            raise TypeError('parquet format only supports gzip or zstd '
+                            'compression.')
+        self._file_format = file_format
+
+    @property
+    def part_size(self):
+        '''
+        Size of each part file in partitioned mode (in bytes, uncompressed \
+        csv or in memory parquet data) before rolling over to a new one.
+        '''
+        return self._part_size
+
+    @property
+    def compression_thread(self):
+        '''
+        Determines whether the writing and compression of the files \
+        runs in a background thread, overlapping with the parsing.
+        '''
+        return self._compression_thread
+
     @property
     def is_active(self):
         '''
@@ -191,3 +519,11 @@ class RollExporter:
             self._random_suffix = ''.join([random.choice(
                 ascii_letters) for x in range(5)])
         self._summary = bool(kwargs.get('summary', True))
+        self.compression = kwargs.get('compression', None)
+        self._compression_thread = bool(
+            kwargs.get('compression_thread', False))
+        self.file_format = kwargs.get('file_format', None) or 'csv'
+        self._part_size = humanize.to_bytes(
+            kwargs.get('part_size', None) or '128mb')
+        self._handles, self._parts = {}, {}
+        self._queue, self._thread, self._thread_error = None, None, None
@@ -0,0 +1,169 @@
+import os
+import re
+
+from slugify import slugify
+
+from .parsers import RollParser, load_dpa_fixture
+
+
+#: words that are ignored in the names of regions and provinces.
+STOPWORDS = ('de', 'del', 'la', 'las', 'los', 'el', 'y', 'region',
+             'provincia')
+
+
+def normalize_place(name):
+    '''
+    :param str name: name of a region, province or commune.
+    :return: tuple with the words of the name, without accents, \
+        punctuation and case.
+
+    >>> normalize_place('Antártica Chilena')
+    ('antartica', 'chilena')
+    '''
+    return tuple(slugify(str(name or ''), separator=' ').split())
+
+
+def abbreviated_words(name):
+    '''
+    :param str name: name of a region or province.
+    :return: set with the normalized words of the name that are \
+        abbreviations: followed by a dot and with at least two letters \
+        (a single initial, as *C.* in *DEL GRAL. C. IBANEZ*, is not).
+
+    >>> abbreviated_words('DE MAGALLANES Y ANTARTICA CH.')
+    {'ch'}
+    '''
+    words = [normalize_place(x) for x in re.findall(
+        r'[^\s.]+\.', str(name or ''))]
+    return {x[-1] for x in words if x and len(x[-1]) >= 2}
+
+
+class RollFilter:
+    '''
+    :param list regions: names of the regions to extract (default None).
+    :param list provinces: names of the provinces to extract (default \
+        None).
+    :param list communes: names of the communes to extract (default \
+        None, they must be communes of the DPA fixture, see \
+        :attr:`RollParser.dpa_fixture_path \
+        <.RollParser.dpa_fixture_path>`).
+    :param str catalog_index: path of the index of the catalog used to \
+        filter the files (default None, see :class:`RollCatalog \
+        <.RollCatalog>`).
+
+    :class:`RollFilter <.RollFilter>` restricts the extraction of \
+    :class:`ElectoralRoll <.ElectoralRoll>` to some places. The names \
+    are normalized (without accents, punctuation and case, see \
+    :func:`normalize_place <.normalize_place>`): the communes must be \
+    equal to a commune of the DPA, and the words of the regions and \
+    provinces (without *de*, *region*, etc.) must be in the name of the \
+    header, or abbreviated in the header with a dot (eg: *Magallanes y \
+    Antártica Chilena* matches *DE MAGALLANES Y ANTARTICA CH.*, see \
+    :func:`abbreviated_words <.abbreviated_words>`). A header matches if its \
+    region, province and commune match the filters that are defined.
+
+    The work is skipped as early as possible:
+
+    * The files are filtered before the run by the header of their \
+      first page (see :meth:`ElectoralRoll.catalog \
+      <.ElectoralRoll.catalog>`), so the files that dont match are not \
+      rendered past their first page.
+    * In the files that match, each parser stops after the header of \
+      its sheet if it does not match (see :attr:`RollParser.is_filtered \
+      <.RollParser.is_filtered>`), and the sheet is not memorized or \
+      exported.
+
+    >>> roll = ElectoralRoll(source='/path/to/dir',
+    ...                      regions=['Metropolitana'])
+    >>> roll.filter.match({'region': 'METROPOLITANA DE SANTIAGO',
+    ...                    'province': 'SANTIAGO', 'commune': 'NUNOA'})
+    True
+    '''
+
+    #: levels of the filters and their attribute in the header.
+    levels = {'regions': 'region', 'provinces': 'province',
+              'communes': 'commune'}
+
+    def match(self, header):
+        '''
+        :param dict header: header of a sheet or record of the catalog \
+            (with *region*, *province* and *commune*).
+        :return: boolean.
+        '''
+        for level, attr in self.levels.items():
+            names = self._names[level]
+            if names is None:
+                continue
+            place = normalize_place(header.get(attr))
+            if level == 'communes':
+                if place not in names:
+                    return False
+            elif not any(self.match_words(
+                    x, place, abbreviated_words(header.get(attr)))
+                    for x in names):
+                return False
+        return True
+
+    @staticmethod
+    def match_words(name, place, abbreviated=()):
+        '''
+        :param tuple name: normalized name of the filter.
+        :param tuple place: normalized name of the header.
+        :param set abbreviated: words of the place that are abbreviations \
+            (see :func:`abbreviated_words <.abbreviated_words>`).
+        :return: boolean.
+
+        Returns true if each word of the name (except the stopwords) is \
+        a word of the place, or starts with an abbreviated word of the \
+        place.
+        '''
+        words = [x for x in place if x not in STOPWORDS]
+        return all(any(x == y or (y in abbreviated and x.startswith(y))
+                       for y in words)
+                   for x in name if x not in STOPWORDS)
+
+    def normalize(self, level, names):
+        '''
+        :param str level: level of the filter (*regions*, *provinces* or \
+            *communes*).
+        :param list names: names of the places (or a text string with \
+            names separated by commas).
+        :raises TypeError: the communes must be in the DPA fixture.
+        :return: set of normalized names or None.
+        '''
+        if isinstance(names, str):
+            names = [x for x in names.split(',') if x.strip()]
+        if not names:
+            return None
+        normalized = {normalize_place(x) for x in names}
+        normalized.discard(())
+        if level == 'communes':
+            fixture = load_dpa_fixture(os.path.join(
+                os.path.dirname(__file__), RollParser.dpa_fixture_path))
+            known = {normalize_place(x) for x in fixture}
+            unknown = [' '.join(x) for x in normalized if x not in known]
+            if unknown:
+                raise TypeError('communes not found in the DPA: ' +
+                                ','.join(sorted(unknown)))
+        return normalized or None
+
+    @property
+    def catalog_index(self):
+        '''
+        Path of the index of the catalog used to filter the files.
+        '''
+        return self._catalog_index
+
+    @property
+    def is_active(self):
+        '''
+        :return: boolean.
+
+        Property that indicates if some filter is defined.
+        '''
+        return any(x is not None for x in self._names.values())
+
+    def __init__(self, *args, **kwargs):
+        self._names = {x: self.normalize(x, kwargs.get(x, None))
+                       for x in self.levels}
+        self._catalog_index = kwargs.get('catalog_index', None)
@@ -0,0 +1,162 @@
+import re
+
+from .parsers import RollParser
+
+
+class RollLayoutParser(RollParser):
+    '''
+    :class:`RollLayoutParser <.RollLayoutParser>` is the base of the \
+    parsers specialized in the layout of the electoral rolls of a year. \
+    The layouts differ in the name of the roll, the labels of the header \
+    and the fields of the table, so each specialized parser replaces the \
+    permissive regular expressions of :class:`RollParser <.RollParser>` \
+    by the literals of its layout and knows the fields of the table.
+
+    Class attributes beginning with "*layout_*" define the layout: \
+    *layout_name* is its name, *layout_roll* is a precompiled pattern \
+    of the name of the roll, *layout_fields_line* is a precompiled \
+    pattern of the fields line and *layout_fields* are the fields of the \
+    table (as :meth:`parse_fields <.RollParser.parse_fields>` slugifies \
+    them).
+
+    The layout of a file is detected from its first page with \
+    :func:`detect_layout <.detect_layout>` and new layouts are added \
+    with :func:`register_layout <.register_layout>`.
+    '''
+    #: name of the layout.
+    layout_name = None
+    #: precompiled pattern of the name of the roll.
+    layout_roll = None
+    #: precompiled pattern of the fields line.
+    layout_fields_line = None
+    #: fields of the table.
+    layout_fields = []
+
+    @classmethod
+    def detect(cls, sheet):
+        '''
+        :param str sheet: first adapted sheet of a file.
+        :return: boolean.
+
+        Returns true if the sheet has the name of the roll and the fields \
+        line of the layout.
+        '''
+        if not cls.layout_roll or not cls.layout_roll.search(sheet):
+            return False
+        return any(cls.layout_fields_line.match(x.strip())
+                   for x in sheet.split('\n'))
+
+    def parse_fields(self):
+        '''
+        Method that takes the known fields of the layout (see \
+        :meth:`RollParser.parse_fields <.RollParser.parse_fields>`) if \
+        the fields line matches the layout, otherwise they are parsed \
+        from the fields line.
+        '''
+        index = self.fields_index
+        if not index or not self.layout_fields_line.match(
+                self.sheet[index].strip()):
+            return super().parse_fields()
+        self._fields = list(self.layout_fields)
+        if self.more_fields:
+            self._fields.insert(3, 'comuna')
+            self._fields.insert(3, 'provincia')
+            self._fields.insert(3, 'region')
+            self._fields.append('reference')
+
+
+class RollParser2013(RollLayoutParser):
+    '''
+    Parser of the 2013 layout: *PADRON ELECTORAL*, the *SEX* field and \
+    a row counter after the table.
+    '''
+    regex_roll = r'PADRON\s+ELECTORAL\s[A-Z,\s-]{1,200}\d+'
+    regex_region = r'REGION[0,]*\s*:(?:\s*(?!\s)|\s*(?=\s{3}(?!\s)))' \
+        r'([A-ZÑ\'\s.]*\s{3})'
+    regex_pagination = r'PAGINA\s*(?!\s)(\d*)\s*de\s*(\d*)'
+    layout_name = '2013'
+    layout_roll = re.compile(r'PADRON\s+ELECTORAL')
+    layout_fields_line = re.compile(
+        r'NOMBRE\s+C\.IDENTIDAD\s+SEX\s+DOMICILIO ELECTORAL\s+'
+        r'CIRCUNSCRIPCI[OÓ]N\s+MESA$')
+    layout_fields = ['nombre', 'c-identidad', 'sex', 'domicilio-electoral',
+                     'circunscripcion', 'mesa']
+
+
+class RollParser2016(RollLayoutParser):
+    '''
+    Parser of the 2016 layout: *PADRON ELECTORAL*, the *SEXO* field and \
+    the *REGISTROS* total above the header.
+    '''
+    regex_roll = r'PADRON\s+ELECTORAL\s[A-Z,\s-]{1,200}\d+'
+    regex_region = r'REGION[0,]*\s*:(?:\s*(?!\s)|\s*(?=\s{3}(?!\s)))' \
+        r'([A-ZÑ\'\s.]*\s{3})'
+    regex_pagination = r'PAGINA\s*(\d+)\s*de\s*(\d+)'
+    layout_name = '2016'
+    layout_roll = re.compile(r'PADRON\s+ELECTORAL')
+    layout_fields_line = re.compile(
+        r'NOMBRE\s+C\.IDENTIDAD\s+SEXO\s+DOMICILIO ELECTORAL\s+'
+        r'CIRCUNSCRIPCI[OÓ]N\s+MESA$')
+    layout_fields = ['nombre', 'c-identidad', 'sexo', 'domicilio-electoral',
+                     'circunscripcion', 'mesa']
+
+
+class RollParser2020(RollLayoutParser):
+    '''
+    Parser of the 2020 layout: *PADRÓN ELECTORAL*, the *SEXO* field \
+    (*VARON* or *MUJER*) and the *Registros* total in the header.
+    '''
+    regex_roll = r'PADRÓN\s+ELECTORAL\s[A-Z,\s-]{1,200}\d+'
+    regex_region = r'REGIÓN[0,]*\s*:(?:\s*(?!\s)|\s*(?=\s{3}(?!\s)))' \
+        r'([A-ZÑ\'\s.]*\s{3})'
+    regex_pagination = r'Página\s*:\s*(\d+)\s*de\s*(\d+)'
+    layout_name = '2020'
+    layout_roll = re.compile(r'PADRÓN\s+ELECTORAL')
+    layout_fields_line = re.compile(
+        r'NOMBRE\s+C\.IDENTIDAD\s+SEXO\s+DOMICILIO ELECTORAL\s+'
+        r'CIRCUNSCRIPCI[OÓ]N\s+MESA$')
+    layout_fields = ['nombre', 'c-identidad', 'sexo', 'domicilio-electoral',
+                     'circunscripcion', 'mesa']
+
+
+#: registry of the layouts, in order of detection.
+LAYOUTS = [RollParser2020, RollParser2016, RollParser2013]
+
+
+def register_layout(parser_class, first=False):
+    '''
+    :param class parser_class: subclass of :class:`RollLayoutParser \
+        <.RollLayoutParser>`.
+    :param bool first: detects the layout before the registered ones \
+        (default False).
+    :raises TypeError: parser_class must be a RollLayoutParser.
+    :return: the parser class (it can be used as a decorator).
+
+    Adds a layout to the registry. The layouts are only checked on the \
+    first page of each file, so they dont slow down the parsing of the \
+    others.
+
+    >>> @register_layout
+    ... class RollParser2024(RollLayoutParser):
+    ...     layout_name = '2024'
+    '''
+    if not isinstance(parser_class, type) or \
+            not issubclass(parser_class, RollLayoutParser):
+        raise TypeError('parser_class must be a RollLayoutParser.')
+    if parser_class not in LAYOUTS:
+        LAYOUTS.insert(0 if first else len(LAYOUTS), parser_class)
+    return parser_class
+
+
+def detect_layout(sheet):
+    '''
+    :param str sheet: first adapted sheet of a file.
+    :return: parser class of the layout or None if it is not detected.
+
+    >>> detect_layout(sheet)
+    <class 'serveliza.roll.layouts.RollParser2016'>
+    '''
+    for parser_class in LAYOUTS:
+        if parser_class.detect(sheet):
+            return parser_class
+    return None
@@ -1,7 +1,193 @@
+import sys
+import zlib
+import pickle
+import tempfile
+
+from serveliza.utils import humanize
+from .accumulators import RollAccumulator
+
+
+class RollSpillList:
+    '''
+    :param str spill_dir: directory for the temporary segments (default \
+        the temporary directory of the system).
+
+    :class:`RollSpillList <.RollSpillList>` is a list-like container \
+    used by :class:`RollMemorizer <.RollMemorizer>` to store entries \
+    and errors. Items are kept in memory until :meth:`spill \
+    <.RollSpillList.spill>` is called, then they are written as a \
+    compressed segment in a temporary file and released from memory. \
+    Iteration, indexing and length read the segments back \
+    transparently, one segment at a time (the last segment read by \
+    index is kept decoded, so sequential access and slices decode each \
+    segment once).
+
+    >>> entries = RollSpillList()
+    >>> entries += [('NAME', '1.111.111-1', ...)]
+    >>> entries.spill()
+    >>> len(entries), entries[0]
+    (1, ('NAME', '1.111.111-1', ...))
+    '''
+
+    @property
+    def memory(self):
+        '''
+        :return: integer.
+
+        Estimated bytes of the items held in memory (not spilled).
+        '''
+        return self._memory
+
+    @property
+    def segments(self):
+        '''
+        :return: list of tuples (offset, size, length).
+
+        Segments spilled to disk.
+        '''
+        return self._segments
+
+    def extend(self, items):
+        '''
+        :param list items: items to add (or another instance of \
+            :class:`RollSpillList <.RollSpillList>`).
+
+        Adds the items to the in-memory buffer and updates the \
+        :attr:`memory <.RollSpillList.memory>` estimation from a \
+        sample of the batch. The segments of another list are copied as \
+        they are (see :meth:`extend_segments \
+        <.RollSpillList.extend_segments>`) and only its buffer is added \
+        to memory.
+        '''
+        if isinstance(items, RollSpillList):
+            self.extend_segments(items)
+            items = items._buffer
+        if not items:
+            return None
+        self._buffer += items
+        self._length += len(items)
+        self._memory += len(items) * self.sizeof(items[0])
+
+    def spill(self):
+        '''
+        Writes the in-memory buffer as a new segment in the temporary \
+        file and releases it from memory.
+        '''
+        if not self._buffer:
+            return None
+        if not self._file:
+            self._file = tempfile.TemporaryFile(dir=self._spill_dir)
+        data = zlib.compress(pickle.dumps(
+            self._buffer, pickle.HIGHEST_PROTOCOL), 1)
+        self._file.seek(0, 2)
+        self._segments.append((self._file.tell(), len(data),
+                               len(self._buffer)))
+        self._file.write(data)
+        self._buffer, self._memory = [], 0
+
+    def extend_segments(self, other):
+        '''
+        :param obj other: another instance of :class:`RollSpillList \
+            <.RollSpillList>`.
+
+        Copies the spilled segments of another list to the temporary \
+        file, one at a time and still compressed (the in-memory buffer \
+        is spilled first to keep the order of the items).
+        '''
+        if not other.segments:
+            return None
+        self.spill()
+        if not self._file:
+            self._file = tempfile.TemporaryFile(dir=self._spill_dir)
+        for offset, size, length in other.segments:
+            other._file.seek(offset)
+            data = other._file.read(size)
+            self._file.seek(0, 2)
+            self._segments.append((self._file.tell(), size, length))
+            self._file.write(data)
+            self._length += length
+
+    def read_segment(self, segment):
+        '''
+        :param tuple segment: a segment of :attr:`segments \
+            <.RollSpillList.segments>`.
+        :return: list of items of the segment.
+        '''
+        offset, size, _ = segment
+        self._file.seek(offset)
+        return pickle.loads(zlib.decompress(self._file.read(size)))
+
+    def close(self):
+        '''
+        Closes (and removes) the temporary file of segments.
+        '''
+        if self._file:
+            self._file.close()
+            self._file = None
+        self._segments, self._buffer = [], []
+        self._length, self._memory = 0, 0
+        self._cached = (None, None)
+
+    @staticmethod
+    def sizeof(item):
+        '''
+        :return: estimated bytes of an item (and its values if it is \
+            a list, tuple or dictionary).
+        '''
+        size = sys.getsizeof(item)
+        if isinstance(item, dict):
+            item = list(item.values())
+        if isinstance(item, (list, tuple)):
+            size += sum([sys.getsizeof(x) for x in item])
+        return size
+
+    def __iadd__(self, items):
+        self.extend(items)
+        return self
+
+    def __len__(self):
+        return self._length
+
+    def __iter__(self):
+        for segment in self._segments:
+            for item in self.read_segment(segment):
+                yield item
+        for item in self._buffer:
+            yield item
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[x] for x in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if index < 0 or index >= len(self):
+            raise IndexError('RollSpillList index out of range')
+        for number, segment in enumerate(self._segments):
+            if index < segment[2]:
+                if self._cached[0] != number:
+                    self._cached = (number, self.read_segment(segment))
+                return self._cached[1][index]
+            index -= segment[2]
+        return self._buffer[index]
+
+    def __init__(self, spill_dir=None):
+        self._spill_dir = spill_dir
+        self._file = None
+        self._segments, self._buffer = [], []
+        self._length, self._memory = 0, 0
+        self._cached = (None, None)
+
 
 class RollMemorizer:
     '''
     :param bool memorize: If the memorizer is activated (default True)
+    :param max_memory: Memory ceiling in bytes (int) or in text string \
+        (eg: '512mb') for the memorized entries and errors. Once it is \
+        passed they are spilled to temporary segments on disk (see more \
+        in :class:`RollSpillList <.RollSpillList>`). By default there \
+        is no limit (a text string that is not a measure raises \
+        TypeError).
+    :param str spill_dir: Directory for the temporary segments.
 
     :class:`RollMemorizer <.RollMemorizer>` is a class that allows it \
     to store data and errors from the electoral roll. It is instantiated \
@@ -13,8 +199,15 @@ class RollMemorizer:
         '''
         :return: dictionary with all data.
 
-        Property where all the memorized data are stored.
+        Property where all the memorized data are stored. The metadata \
+        of the rolls updated since the last access is taken from their \
+        accumulators (see :attr:`accumulators \
+        <.RollMemorizer.accumulators>`).
         '''
+        for rid in self._outdated:
+            self._storage[rid]['metadata'] = \
+                self._accumulators[rid].to_dict()
+        self._outdated.clear()
         return self._storage
 
     @property
@@ -26,6 +219,36 @@ class RollMemorizer:
         '''
         return self._errors
 
+    @property
+    def max_memory(self):
+        '''
+        :return: integer or None.
+
+        Memory ceiling in bytes as defined in the constructor.
+        '''
+        return self._max_memory
+
+    @property
+    def memory(self):
+        '''
+        :return: integer.
+
+        Estimated bytes of the entries and errors held in memory.
+        '''
+        memory = self.errors.memory
+        for rid in self._storage:
+            memory += self._storage[rid]['entries'].memory
+        return memory
+
+    def spill(self):
+        '''
+        Spills the entries and errors held in memory to disk (see \
+        :meth:`RollSpillList.spill <.RollSpillList.spill>`).
+        '''
+        for rid in self._storage:
+            self._storage[rid]['entries'].spill()
+        self._errors.spill()
+
     @property
     def is_active(self):
         '''
@@ -36,9 +259,12 @@ class RollMemorizer:
         '''
         return self._is_active
 
-    def memorize(self, parsed):
+    def memorize(self, parsed, key=None):
         '''
         :param obj parsed: an instance of :class:`RollParser <.RollParser>`.
+        :param tuple key: key of the file of the sheet in the order of a \
+            serial run (its size and name, by default the sheets are \
+            ordered as they are memorized).
 
         :meth:`memorize <.RollMemorizer.memorize>` is the main method of \
         :class:`RollMemorizer <.RollMemorizer>`. It will memorize the \
@@ -55,19 +281,26 @@ class RollMemorizer:
             <.RollMemorizer.store_metadata_entries>`.
         * :meth:`store_metadata_nulls \
             <.RollMemorizer.store_metadata_nulls>`.
-        * :meth:`store_metadata_nulls \
-            <.RollMemorizer.store_metadata_nulls>`.
 
-        It then stores, if active, the entries and errors.
+        The metadata is accumulated in a :class:`RollAccumulator \
+        <.RollAccumulator>` of the roll (see :meth:`merge \
+        <.RollMemorizer.merge>`). It then stores, if active, the entries \
+        and errors. If the :attr:`max_memory <.RollMemorizer.max_memory>` \
+        is passed they are spilled to disk.
         '''
         rid = parsed.metadata['rid']
+        self._sequence += 1
+        self._key = ((key or (0, '')), self._sequence)
         self.prepare_rid(parsed)
         self.store_metadata_places(parsed)
         self.store_metadata_entries(parsed)
         self.store_metadata_nulls(parsed)
+        self._outdated.add(rid)
         if self.is_active:
             self._storage[rid]['entries'] += parsed.entries
             self._errors += parsed.errors
+            if self.max_memory and self.memory > self.max_memory:
+                self.spill()
 
     def prepare_rid(self, parsed):
         '''
@@ -80,23 +313,14 @@ class RollMemorizer:
         key for the :attr:`storage <.RollMemorizer.storage>` property.
         '''
         rid = parsed.metadata['rid']
-        if rid in self.storage:
+        if rid in self._storage:
             return None
-        metadata = {
-            'roll': parsed.header['roll'],
-            'year':     parsed.header['year'],
-            'regions':      [],
-            'communes':     [],
-            'provinces':    [],
-            'nulls': {'total': 0},
-            'entries': {'total': 0, 'rescue': 0, 'errors': 0}}
-        declared = parsed.header.get('total_sheets', False)
-        if declared:
-            metadata['entries']['declared'] = declared
+        accumulator = RollAccumulator()
+        accumulator.add_roll(parsed, self._key)
+        self._accumulators[rid] = accumulator
         self._storage[rid] = {
-            'entries':  [],
-            'fields':   parsed.fields,
-            'metadata': metadata}
+            'entries':  RollSpillList(self._spill_dir),
+            'fields':   parsed.fields}
 
     def store_metadata_places(self, parsed):
         '''
@@ -106,22 +330,8 @@ class RollMemorizer:
         is a method to memorize the places (regions, provinces and communes) \
         present in the parsed sheet.
         '''
-        rid = parsed.metadata['rid']
-        region = parsed.header['region']
-        regions = self.storage[rid]['metadata']['regions']
-        province = parsed.header['province']
-        provinces = self.storage[rid]['metadata']['provinces']
-        commune = parsed.header['commune']
-        communes = self.storage[rid]['metadata']['communes']
-        if region not in regions:
-            self._storage[rid]['metadata']['regions']\
-                .append(region)
-        if province not in provinces:
-            self._storage[rid]['metadata']['provinces']\
-                .append(province)
-        if commune not in communes:
-            self._storage[rid]['metadata']['communes']\
-                .append(commune)
+        self._accumulators[parsed.metadata['rid']].add_sheet_places(
+            parsed, self._key)
 
     def store_metadata_entries(self, parsed):
         '''
@@ -133,17 +343,7 @@ class RollMemorizer:
          number of entries is declared in the header, it is added as \
          *declared*.
         '''
-        rid = parsed.metadata['rid']
-        entries = self.storage[rid]['metadata']['entries']
-        pentries = parsed.metadata['entries']
-        total = entries['total'] + len(parsed.entries)
-        rescue = entries['rescue'] + pentries.get('rescue', 0)
-        errors = entries['errors'] + len(parsed.errors)
-        final_entries = {'total': total, 'rescue': rescue, 'errors': errors}
-        declared = entries.get('declared', False)
-        if declared:
-            final_entries['declared'] = declared
-        self._storage[rid]['metadata']['entries'] = final_entries
+        self._accumulators[parsed.metadata['rid']].add_sheet_entries(parsed)
 
     def store_metadata_nulls(self, parsed):
         '''
@@ -153,23 +353,50 @@ class RollMemorizer:
         is a method to memorize the metadata of the null data in the entries \
         (total and for each field with null data) present in the parsed sheet.
         '''
-        rid = parsed.metadata['rid']
-        pnulls = parsed.metadata['nulls']
-        if not pnulls['total']:
-            return None
-        nulls = self.storage[rid]['metadata']['nulls']
-        total = nulls['total'] + pnulls['total']
-        fields = parsed.metadata['fields']
-        result = {'total': total}
-        for field in fields:
-            if field not in pnulls:
-                continue
-            result[field] = pnulls[field]
-            if field in nulls:
-                result[field] += nulls[field]
-        self._storage[rid]['metadata']['nulls'].update(result)
+        self._accumulators[parsed.metadata['rid']].add_sheet_nulls(parsed)
+
+    @property
+    def accumulators(self):
+        '''
+        :return: dictionary with the :class:`RollAccumulator \
+            <.RollAccumulator>` of each roll identifier.
+        '''
+        return self._accumulators
+
+    def merge(self, other):
+        '''
+        :param obj other: another instance of :class:`RollMemorizer \
+            <.RollMemorizer>` (eg: of a worker or a shard).
+
+        Merges the metadata of the rolls of another memorizer (see \
+        :meth:`RollAccumulator.merge <.RollAccumulator.merge>`), so the \
+        memorizers of partial runs can be combined in any order with the \
+        same metadata of a serial run. The entries and errors of the \
+        other memorizer are appended (its spilled segments are copied \
+        without loading them into memory).
+
+        >>> memorizer.merge(shard.memorizer)
+        '''
+        for rid, accumulator in other.accumulators.items():
+            if rid not in self._storage:
+                self._accumulators[rid] = RollAccumulator()
+                self._storage[rid] = {
+                    'entries': RollSpillList(self._spill_dir),
+                    'fields': other.storage[rid]['fields']}
+            self._accumulators[rid] = self._accumulators[rid].merge(
+                accumulator)
+            self._outdated.add(rid)
+            self._storage[rid]['entries'] += other.storage[rid]['entries']
+        self._errors += other.errors
+        if self.max_memory and self.memory > self.max_memory:
+            self.spill()
 
     def __init__(self, *args, **kwargs):
         memorize = kwargs.get('memorize', True)
         self._is_active = bool(memorize)
-        self._storage, self._errors = {}, []
+        self._max_memory = humanize.to_bytes(kwargs.get('max_memory', None))
+        self._spill_dir = kwargs.get('spill_dir', None)
+        self._storage = {}
+        self._errors = RollSpillList(self._spill_dir)
+        self._accumulators, self._outdated = {}, set()
+        self._sequence, self._key = 0, None
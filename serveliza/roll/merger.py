@@ -0,0 +1,325 @@
+from pathlib import Path
+from datetime import datetime, timedelta
+import shutil
+import heapq
+import gzip
+import lzma
+import bz2
+import csv
+import io
+import re
+import yaml
+from slugify import slugify
+
+from .exporter import RollExporter
+from .accumulators import RollPartial
+
+
+class RollMerger:
+    '''
+    :param list sources: outputs of the shards, directories or summary \
+        files (see :meth:`export_summary <.RollExporter.export_summary>`).
+    :param str output: directory to store the merged result.
+    :param bool random_suffix: Determines whether merged files have a \
+        random text string appended to the end (default True).
+
+    :class:`RollMerger <.RollMerger>` is a class that combines the \
+    outputs of sharded runs of :class:`ElectoralRoll <.ElectoralRoll>` \
+    (see its *shard* parameter) into one consistent result, as if it \
+    were a single run.
+
+    Each shard processes its files ordered by size, so its csv files are \
+    a sequence of blocks of entries (one per pdf file) whose lengths are \
+    declared in its summary. The blocks of all shards are combined with \
+    a k-way streaming merge (nothing is loaded in memory), giving the \
+    same order of a serial run. Partitioned outputs are combined by \
+    copying their part files into the same partitions. The summaries are \
+    merged into a new one.
+
+    >>> merger = RollMerger(['shard-1/', 'shard-2/'], output='merged')
+    >>> merger.run()
+    ['/path/to/merged/RID-data-XXXXX.csv', ...]
+    '''
+
+    #: decompressors of the csv files by suffix.
+    decompressors = {'.gz': gzip.open, '.bz2': bz2.open, '.xz': lzma.open}
+
+    def run(self):
+        '''
+        :return: list with the absolute paths of the merged files.
+
+        Method that executes the merge: loads the summaries, merges the \
+        csv files of each group (with the same name in each shard), \
+        copies the partitions and exports the merged summary.
+        '''
+        self.load_summaries()
+        groups, partitions = self.get_outputs()
+        exported = []
+        for stem, shards in groups.items():
+            exported.append(self.merge_group(stem, shards))
+        for partition in partitions:
+            exported.append(self.merge_partition(partition))
+        metadata = self.merge_metadata()
+        metadata['exported_to'] = sorted(set(exported))
+        rids = list(metadata['rolls'])
+        summary = self.exporter.export_summary(
+            rids[0] if rids else None, metadata)
+        metadata['exported_to'].append(summary)
+        self._metadata = metadata
+        return metadata['exported_to']
+
+    def load_summaries(self):
+        '''
+        Loads the summaries of the sources (the summary files found in \
+        each directory).
+        '''
+        self._summaries = []
+        for source in self.sources:
+            path = Path(str(source))
+            paths = sorted(path.glob('*-summary*.txt')) if path.is_dir() \
+                else [path]
+            for summary in paths:
+                with summary.open() as f:
+                    metadata = yaml.safe_load(f)
+                suffix = summary.name.split('.txt')[0].split('-summary')[-1]
+                self._summaries.append({
+                    'path': summary, 'suffix': suffix,
+                    'metadata': metadata or {}})
+        if not self._summaries:
+            raise TypeError('Sources dont have summary files.')
+
+    def get_outputs(self):
+        '''
+        :return: tuple with a dictionary of csv files grouped by their \
+            name (without the random suffix) and a list of directories \
+            of partitions.
+
+        The exported files are taken from the *exported_to* key of each \
+        summary, relative to the directory of the summary.
+        '''
+        groups, partitions = {}, []
+        for summary in self._summaries:
+            for exported in summary['metadata'].get('exported_to', []):
+                path = summary['path'].parent / Path(exported).name
+                if path == summary['path'] or not path.exists():
+                    continue
+                if path.is_dir():
+                    partitions.append(path)
+                    continue
+                stem = path.name.split('.csv')[0]
+                if summary['suffix'] and stem.endswith(summary['suffix']):
+                    stem = stem[:-len(summary['suffix'])]
+                groups.setdefault(stem, []).append((summary, path))
+        return groups, partitions
+
+    def merge_group(self, stem, shards):
+        '''
+        :param str stem: name of the csv file without the random suffix.
+        :param list shards: list of tuples with the summary and the csv \
+            file of each shard.
+        :return: absolute path of the merged csv file.
+
+        Merges the csv files of a group with a k-way streaming merge of \
+        their blocks of entries (see :meth:`iter_entries \
+        <.RollMerger.iter_entries>`).
+        '''
+        suffixes = ''.join(shards[0][1].suffixes[-2:])
+        if not suffixes.startswith('.csv'):
+            suffixes = '.csv'
+        compression = [x for x, y in self.exporter.compressions.items()
+                       if suffixes.endswith(y)]
+        self.exporter.compression = compression[0] if compression else None
+        name = stem
+        if self.exporter.random_suffix:
+            name += f'-{self.exporter.random_suffix}'
+        file = self.output / (name + suffixes)
+        with self.open_text(shards[0][1]) as f:
+            fields = next(csv.reader(f), None)
+        iterators = [self.iter_entries(path, self.get_blocks(stem, summary))
+                     for summary, path in shards]
+        stream = self.exporter.open_stream(file)
+        try:
+            writer = csv.writer(stream)
+            if fields:
+                writer.writerow(fields)
+            for _, entry in heapq.merge(*iterators, key=lambda x: x[0]):
+                writer.writerow(entry)
+        finally:
+            stream.close()
+        return str(file.absolute())
+
+    def get_blocks(self, stem, summary):
+        '''
+        :param str stem: name of the csv file without the random suffix.
+        :param dict summary: summary of the shard.
+        :return: list of tuples with the key ((bytes, name) of the pdf \
+            file) and the number of entries of each block in the csv file.
+
+        The pdf files of the shard that were exported in the csv file \
+        are those whose roll identifier (unified mode) or commune or \
+        region (separated mode) match the name of the csv file.
+        '''
+        blocks = []
+        for name, file in summary['metadata'].get('files', {}).items():
+            rid = file.get('rid')
+            stems = [f'{rid}-data'] + [
+                f'{rid}-{slugify(str(file.get(x)))}-data'
+                for x in ['commune', 'region']]
+            if stem not in stems:
+                continue
+            total = file.get('entries', {}).get('total', 0)
+            blocks.append(((file.get('bytes', 0), name), total))
+        return sorted(blocks)
+
+    def iter_entries(self, path, blocks):
+        '''
+        :param obj path: path of a csv file of a shard.
+        :param list blocks: blocks of entries of the file (see \
+            :meth:`get_blocks <.RollMerger.get_blocks>`).
+        :raises ValueError: the number of entries of the csv file does \
+            not match its summary.
+        :return: generator of tuples with the key of the block and the \
+            entry.
+        '''
+        with self.open_text(path) as f:
+            reader = csv.reader(f)
+            next(reader, None)
+            for key, total in blocks:
+                for _ in range(total):
+                    entry = next(reader, None)
+                    if entry is None:
+                        raise ValueError(f'{str(path)} has less entries '
+                                         'than declared in its summary.')
+                    yield key, entry
+            if next(reader, None) is not None:
+                raise ValueError(f'{str(path)} has more entries than '
+                                 'declared in its summary.')
+
+    def merge_partition(self, partition):
+        '''
+        :param obj partition: directory of a partitioned output \
+            (*rid=...*) of a shard.
+        :return: absolute path of the merged directory.
+
+        Copies the part files into the same partitions of the output, \
+        numbering them after the existing ones.
+        '''
+        target = self.output / partition.name
+        for part in sorted(partition.glob('**/part-*')):
+            directory = target / part.parent.relative_to(partition)
+            directory.mkdir(parents=True, exist_ok=True)
+            number = len(list(directory.glob('part-*')))
+            name = f'part-{number:04d}'
+            if self.exporter.random_suffix:
+                name += f'-{self.exporter.random_suffix}'
+            name += part.name[part.name.index('.'):]
+            with part.open('rb') as src, (directory / name).open('wb') as dst:
+                shutil.copyfileobj(src, dst)
+        return str(target.absolute())
+
+    def merge_metadata(self):
+        '''
+        :return: dictionary with the merged metadata.
+
+        Merges the metadata of the summaries: the files, the analysis \
+        (first start, last finalization and sum of durations) and the \
+        rolls (sum of entries and nulls, places in order of the files as \
+        in a serial run). Each summary is converted into a mergeable \
+        partial result (see :class:`RollPartial <.RollPartial>`) and \
+        they are reduced in order.
+        '''
+        merged = RollPartial()
+        for summary in self._summaries:
+            merged = merged.merge(RollPartial.from_metadata(
+                summary['metadata'], self.convert))
+        return merged.to_metadata()
+
+    def open_text(self, path):
+        '''
+        :param obj path: path of a csv file (also compressed).
+        :return: text stream to read the file.
+        '''
+        if path.suffix in self.decompressors:
+            return self.decompressors[path.suffix](str(path), 'rt')
+        if path.suffix == '.zst':
+            import zstandard
+            reader = zstandard.ZstdDecompressor().stream_reader(
+                path.open('rb'), read_across_frames=True)
+            return io.TextIOWrapper(reader)
+        return path.open()
+
+    def convert(self, value, kind):
+        '''
+        Converts a datetime or a timedelta (as the *kind* says) \
+        serialized in a summary.
+        '''
+        if kind == 'datetime':
+            return self.to_datetime(value)
+        return self.to_timedelta(value)
+
+    @staticmethod
+    def to_datetime(value):
+        '''
+        Converts a datetime serialized in a summary into a datetime.
+        '''
+        if isinstance(value, datetime):
+            return value
+        for fmt in ['%Y-%m-%d %H:%M:%S.%f', '%Y-%m-%d %H:%M:%S']:
+            try:
+                return datetime.strptime(str(value), fmt)
+            except ValueError:
+                continue
+
+    @staticmethod
+    def to_timedelta(value):
+        '''
+        Converts a timedelta serialized in a summary into a timedelta.
+        '''
+        if isinstance(value, timedelta):
+            return value
+        matched = re.match(
+            r'^(?:(-?\d+) days?, )?(\d+):(\d+):(\d+(?:\.\d+)?)$', str(value))
+        if not matched:
+            return timedelta()
+        days, hours, minutes, seconds = matched.groups()
+        return timedelta(days=int(days or 0), hours=int(hours),
+                         minutes=int(minutes), seconds=float(seconds))
+
+    @property
+    def sources(self):
+        '''
+        Outputs of the shards (directories or summary files).
+        '''
+        return self._sources
+
+    @property
+    def output(self):
+        '''
+        Directory to store the merged result.
+        '''
+        return self.exporter.output
+
+    @property
+    def exporter(self):
+        '''
+        :return: inner instance of :class:`RollExporter <.RollExporter>` \
+            used to write the merged files and summary.
+        '''
+        return self._exporter
+
+    @property
+    def metadata(self):
+        '''
+        :return: dictionary with the merged metadata (after :meth:`run \
+            <.RollMerger.run>`).
+        '''
+        return self._metadata
+
+    def __init__(self, sources, output='output', random_suffix=True,
+                 *args, **kwargs):
+        if isinstance(sources, (str, Path)):
+            sources = [sources]
+        self._sources = list(sources)
+        self._exporter = RollExporter(
+            export=True, output=output, random_suffix=random_suffix)
+        self._summaries, self._metadata = [], {}
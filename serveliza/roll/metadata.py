@@ -0,0 +1,125 @@
+from datetime import timedelta
+import threading
+
+
+#: stages of the flow of :class:`ElectoralRoll <.ElectoralRoll>`.
+STAGES = ('processing', 'adapting', 'parsing', 'memorizing', 'exporting')
+
+
+class RollDurations:
+    '''
+    Durations of the stages of the flow (one instance for each file and \
+    one for the analysis), updated in place.
+
+    >>> durations = RollDurations()
+    >>> durations.add('parsing', timedelta(seconds=1))
+    >>> durations.to_dict()
+    {'processing': datetime.timedelta(0), ...,
+     'parsing': datetime.timedelta(seconds=1), ...}
+    '''
+    __slots__ = STAGES
+
+    def add(self, stage, duration):
+        '''
+        :param str stage: name of the stage (see :data:`STAGES`).
+        :param obj duration: timedelta to add.
+        '''
+        setattr(self, stage, getattr(self, stage) + duration)
+
+    def to_dict(self):
+        '''
+        :return: dictionary with the duration of each stage.
+        '''
+        return {x: getattr(self, x) for x in STAGES}
+
+    def __init__(self):
+        for stage in STAGES:
+            setattr(self, stage, timedelta())
+
+
+class RollFileMetadata:
+    '''
+    :param dict data: data of the file (see :func:`get_metadata_from_pdfs \
+        <serveliza.utils.pdf.get_metadata_from_pdfs>`).
+
+    Metadata of a file: its data (that is updated with the results of \
+    its extraction) and the durations of its stages.
+    '''
+    __slots__ = ('data', 'durations')
+
+    def to_dict(self):
+        '''
+        :return: dictionary with the data and the durations of the file.
+        '''
+        return {**self.data, 'durations': self.durations.to_dict()}
+
+    def __init__(self, data):
+        self.data = data
+        self.durations = RollDurations()
+
+
+class RollMetadata:
+    '''
+    Model of the metadata of :class:`ElectoralRoll <.ElectoralRoll>`: \
+    the files, the analysis (start, finalization, durations and the \
+    reports of the executors) and the exported files. The durations and \
+    the exported files are updated in place in constant time for each \
+    sheet, and :meth:`snapshot <.RollMetadata.snapshot>` builds the \
+    dictionary of :attr:`ElectoralRoll.metadata <.ElectoralRoll.metadata>` \
+    only when it is read (eg: for the summary). The durations are added \
+    under a lock, since the stages of the pipeline run in threads.
+    '''
+    __slots__ = ('files', 'durations', 'started', 'finalized', 'reports',
+                 'exported_to', '_exported', '_lock')
+
+    def add_files(self, files):
+        '''
+        :param dict files: data of the files by name.
+        '''
+        for name, data in files.items():
+            self.files[name] = RollFileMetadata(data)
+
+    def add_duration(self, file, stage, duration):
+        '''
+        :param str file: name of the file.
+        :param str stage: name of the stage.
+        :param obj duration: timedelta to add.
+
+        Adds the duration of a stage to the file and to the analysis.
+        '''
+        with self._lock:
+            self.files[file].durations.add(stage, duration)
+            self.durations.add(stage, duration)
+
+    def add_exported(self, path):
+        '''
+        :param str path: absolute path of an exported file.
+        '''
+        if self.exported_to is None:
+            self.exported_to = []
+        if path not in self._exported:
+            self._exported.add(path)
+            self.exported_to.append(path)
+
+    def snapshot(self, rolls):
+        '''
+        :param dict rolls: metadata of the rolls (see :attr:`RollMemorizer.\
+            storage <.RollMemorizer.storage>`).
+        :return: dictionary with all metadata.
+        '''
+        analysis = {'started': self.started, 'finalized': self.finalized,
+                    'durations': self.durations.to_dict(), **self.reports}
+        metadata = {
+            'files': {x: y.to_dict() for x, y in self.files.items()},
+            'analysis': analysis}
+        if self.exported_to is not None:
+            metadata['exported_to'] = list(self.exported_to)
+        metadata['rolls'] = rolls
+        return metadata
+
+    def __init__(self):
+        self.files, self.reports = {}, {}
+        self.durations = RollDurations()
+        self.started, self.finalized = None, None
+        self.exported_to, self._exported = None, set()
+        self._lock = threading.Lock()
@@ -0,0 +1,319 @@
+import tracemalloc
+import sys
+import os
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+def get_rss():
+    '''
+    :return: resident memory of the process in bytes (or None).
+
+    Reads the current resident memory from */proc* (Linux). On other \
+    systems it takes the peak resident memory of the process.
+    '''
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError, AttributeError):
+        return get_peak_rss()
+
+
+def get_peak_rss():
+    '''
+    :return: peak resident memory of the process in bytes (or None if \
+        the system does not have the *resource* module).
+    '''
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def start_tracing():
+    '''
+    :return: boolean, true if the tracing was started by this call.
+
+    Starts :mod:`tracemalloc` (if it is not tracing) and resets its peak.
+    '''
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    if hasattr(tracemalloc, 'reset_peak'):
+        tracemalloc.reset_peak()
+    return started
+
+
+def sample_task(mode, memory):
+    '''
+    :param str mode: mode of the monitor (*rss* or *tracemalloc*, or \
+        None).
+    :param dict memory: peak memory of the previous samples of the task.
+    :return: dictionary with the peak of the resident (*rss*) and \
+        traced (*traced*) memory of the task.
+
+    Function executed in the worker processes of the scheduler after \
+    each page (see :meth:`RollMemoryMonitor.add_file \
+    <.RollMemoryMonitor.add_file>`).
+    '''
+    if not mode:
+        return memory
+    memory, rss = dict(memory or {}), get_rss()
+    if rss is not None:
+        memory['rss'] = max(memory.get('rss', 0), rss)
+    if mode == 'tracemalloc' and tracemalloc.is_tracing():
+        memory['traced'] = max(memory.get('traced', 0),
+                               tracemalloc.get_traced_memory()[1])
+    return memory
+
+
+class RollMemoryMonitor:
+    '''
+    :param str memory_report: mode of the memory accounting, *rss* to \
+        sample the resident memory of the process or *tracemalloc* to \
+        also trace the allocations of python with :mod:`tracemalloc` \
+        (default None, the monitor is not active).
+    :param int memory_top: number of allocation sites in the report \
+        (default 10).
+
+    :class:`RollMemoryMonitor <.RollMemoryMonitor>` samples the memory \
+    around each stage and each file of the flow of :class:`ElectoralRoll \
+    <.ElectoralRoll>` and adds a report to the analysis of the metadata \
+    (and of the summary exported by :meth:`RollExporter.export_summary \
+    <.RollExporter.export_summary>`) with:
+
+    * *rss*: the resident memory at the start and end of the run and \
+      its peak.
+    * *traced*: the python memory retained by the run and its peak \
+      (*tracemalloc* mode).
+    * *stages*: the peak growth of the memory within each stage and the \
+      memory it retained.
+    * *files*: the peak memory of each file (in the worker process \
+      that rendered it when there are workers).
+    * *memorized*: the entries held in memory and the bytes by entry \
+      (measured in a sample, see :meth:`measure_entries \
+      <.RollMemoryMonitor.measure_entries>`, and as estimated by \
+      :class:`RollMemorizer <.RollMemorizer>` for its *max_memory*).
+    * *errors*: the size of the store of errors (held in memory and \
+      spilled to disk).
+    * *top*: the allocation sites that retain more memory at the end of \
+      the run (*tracemalloc* mode).
+
+    The *rss* mode costs a read of */proc* per stage, while \
+    *tracemalloc* slows the run several times. The stages of the \
+    pipeline run in threads at the same time, so their peaks overlap. \
+    It is instantiated within an instance of :class:`ElectoralRoll \
+    <.ElectoralRoll>`.
+
+    >>> roll = ElectoralRoll(source='/path/to/dir',
+    ...                      memory_report='tracemalloc')
+    >>> roll.run()
+    >>> roll.metadata['analysis']['memory']['memorized']
+    {'entries': 312, 'estimated': 239152, 'bytes_per_entry': 444, \
+     'estimated_per_entry': 766}
+    '''
+
+    #: modes of the memory accounting.
+    modes = ('rss', 'tracemalloc')
+
+    def start(self):
+        '''
+        Starts the accounting of a run (and the tracing of the \
+        allocations in *tracemalloc* mode).
+        '''
+        self._stages, self._files = {}, {}
+        self._rss = [get_rss(), None]
+        self._traced = None
+        if self.is_tracing:
+            self._started = start_tracing()
+            self._traced = tracemalloc.get_traced_memory()[0]
+
+    def sample(self):
+        '''
+        :return: tuple with the resident and traced memory before a stage.
+        '''
+        traced = None
+        if self.is_tracing:
+            traced = tracemalloc.get_traced_memory()[0]
+            if hasattr(tracemalloc, 'reset_peak'):
+                tracemalloc.reset_peak()
+        return get_rss(), traced
+
+    def add_stage(self, file, stage, sample):
+        '''
+        :param str file: name of the file.
+        :param str stage: name of the stage.
+        :param tuple sample: memory before the stage (see :meth:`sample \
+            <.RollMemoryMonitor.sample>`).
+
+        Adds the growth of the memory within a stage to the stage and \
+        the memory after it to the file.
+        '''
+        rss, traced = sample
+        stats = self._stages.setdefault(stage, {'peak': 0, 'retained': 0})
+        after = {'rss': get_rss()}
+        if traced is not None:
+            current, peak = tracemalloc.get_traced_memory()
+            stats['retained'] += current - traced
+            if hasattr(tracemalloc, 'reset_peak'):
+                stats['peak'] = max(stats['peak'], peak - traced)
+            after['traced'] = peak
+        elif rss is not None and after['rss'] is not None:
+            stats['retained'] += after['rss'] - rss
+            stats['peak'] = max(stats['peak'], after['rss'] - rss)
+        self.add_file(file, after)
+
+    def add_file(self, file, memory):
+        '''
+        :param str file: name of the file.
+        :param dict memory: resident (*rss*) and traced (*traced*) \
+            memory sampled in the file.
+        '''
+        stats = self._files.setdefault(file, {})
+        for name, value in (memory or {}).items():
+            if value is not None:
+                stats[name] = max(stats.get(name, 0), value)
+
+    def export(self, memorizer):
+        '''
+        :param obj memorizer: instance of :class:`RollMemorizer \
+            <.RollMemorizer>`.
+        :return: dictionary with the report of the memory.
+
+        Ends the accounting of a run (and the tracing of the allocations \
+        if it was started by the monitor).
+        '''
+        self._rss[1] = get_rss()
+        report = {
+            'mode': self.memory_report,
+            'rss': {'start': self._rss[0], 'end': self._rss[1],
+                    'peak': max([x for x in self._rss + [get_peak_rss()]
+                                 if x is not None], default=None)},
+            'stages': self._stages, 'files': self._files}
+        if self.is_tracing and tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            report['traced'] = {'retained': current - self._traced,
+                                'peak': peak}
+            report['top'] = self.get_top()
+            if self._started:
+                tracemalloc.stop()
+        report['memorized'] = self.get_memorized(memorizer)
+        errors = memorizer.errors
+        report['errors'] = {
+            'count': len(errors), 'in_memory': self.in_memory(errors),
+            'estimated': errors.memory,
+            'spilled': sum([x[1] for x in errors.segments])}
+        return report
+
+    def get_memorized(self, memorizer):
+        '''
+        :param obj memorizer: instance of :class:`RollMemorizer \
+            <.RollMemorizer>`.
+        :return: dictionary with the entries held in memory and the bytes \
+            by entry (measured and estimated by the memorizer).
+        '''
+        lists = [x['entries'] for x in memorizer.storage.values()]
+        entries = sum([self.in_memory(x) for x in lists])
+        estimated = memorizer.memory - memorizer.errors.memory
+        memorized = {'entries': entries, 'estimated': estimated}
+        if entries:
+            memorized['bytes_per_entry'] = sum([
+                self.measure_entries(x) * self.in_memory(x)
+                for x in lists]) // entries
+            memorized['estimated_per_entry'] = estimated // entries
+        return memorized
+
+    @classmethod
+    def measure_entries(cls, entries, size=1000):
+        '''
+        :param obj entries: instance of :class:`RollSpillList \
+            <.RollSpillList>`.
+        :param int size: maximum of entries of the sample.
+        :return: bytes by entry held in memory.
+
+        Measures the entries of an evenly spaced sample of those held in \
+        memory: their tuple, its reference in the list and its values \
+        (the values shared between entries, as the commune of a sheet, \
+        are counted once).
+        '''
+        count = cls.in_memory(entries)
+        if not count:
+            return 0
+        offset, step = len(entries) - count, max(count // size, 1)
+        sample = [entries[offset + x] for x in range(0, count, step)]
+        values = {id(y): y for x in sample for y in x}
+        total = sum([sys.getsizeof(x) + 8 for x in sample]) + \
+            sum([sys.getsizeof(x) for x in values.values()])
+        return total // len(sample)
+
+    def get_top(self):
+        '''
+        :return: list with the allocation sites that retain more memory \
+            (file and line, bytes and number of blocks).
+        '''
+        snapshot = tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__)])
+        top = []
+        for stat in snapshot.statistics('lineno')[:self.memory_top]:
+            frame = stat.traceback[0]
+            top.append({'site': f'{frame.filename}:{frame.lineno}',
+                        'bytes': stat.size, 'count': stat.count})
+        return top
+
+    @staticmethod
+    def in_memory(items):
+        '''
+        :param obj items: instance of :class:`RollSpillList \
+            <.RollSpillList>`.
+        :return: number of items held in memory (not spilled).
+        '''
+        return len(items) - sum([x[2] for x in items.segments])
+
+    @property
+    def memory_report(self):
+        '''
+        Mode of the memory accounting (*rss* or *tracemalloc*).
+        '''
+        return self._memory_report
+
+    @property
+    def memory_top(self):
+        '''
+        Number of allocation sites in the report.
+        '''
+        return self._memory_top
+
+    @property
+    def is_active(self):
+        '''
+        :return: boolean.
+
+        Property that indicates if the monitor is active (a mode defined \
+        in the constructor).
+        '''
+        return self._memory_report is not None
+
+    @property
+    def is_tracing(self):
+        '''
+        :return: boolean.
+
+        Property that indicates if the allocations are traced \
+        (*tracemalloc* mode).
+        '''
+        return self._memory_report == 'tracemalloc'
+
+    def __init__(self, *args, **kwargs):
+        memory_report = kwargs.get('memory_report', None) or None
+        if memory_report is not None and memory_report not in self.modes:
+            raise TypeError('memory_report must be: ' + ','.join(self.modes))
+        try:
+            memory_top = int(kwargs.get('memory_top', None) or 10)
+        except (TypeError, ValueError):
+            raise TypeError('memory_top must be an integer.')
+        self._memory_report, self._memory_top = memory_report, memory_top
+        self._stages, self._files = {}, {}
+        self._rss, self._traced, self._started = [None, None], None, False
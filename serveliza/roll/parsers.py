@@ -3,11 +3,28 @@ import os
 import re
 import json
 from datetime import datetime as dt
+from functools import lru_cache
 
 # third party libraries
 from slugify import slugify
 
 
+@lru_cache(maxsize=None)
+def load_dpa_fixture(path):
+    '''
+    :param str path: path of the json fixture with the circunscriptions \
+        of each commune (see :attr:`RollParser.dpa_fixture_path \
+        <.RollParser.dpa_fixture_path>`).
+    :return: dictionary with communes as key and list of \
+        circunscriptions as value.
+
+    The fixture is read once for each process and shared by the parsers \
+    of all sheets (it must not be modified).
+    '''
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
 class RollParser:
     '''
     :class:`RollParser <.RollParser>` is intended to be instantiated \
@@ -19,50 +36,99 @@ class RollParser:
     for the fields in each record and a key name for each. Finally, the \
     *dpa_fixture_path* class attribute defines the path of the .json file \
     that contains a compressed dictionary with communes and constituencies.
+
+    The regular expressions are written so they run in linear time on \
+    any text (the quantifiers of a pattern do not overlap, so a failed \
+    match does not backtrack over long runs of spaces, letters or \
+    digits), and the lines of the header and of the entries are clipped \
+    to :attr:`max_line_length <.RollParser.max_line_length>`. The header \
+    is searched as one text (its lines joined), so the name of the roll \
+    is bounded to 200 characters before its year: a search starts again \
+    at each *PADRON ELECTORAL* of the header, and an unbounded name would \
+    scan the rest of the header from each of them.
     '''
     # regex_begin = r'^REPUBLICA\s+DE\s+CHILE'
     #: roll name regex
-    regex_roll = r'PADRO?Ó?N\s+ELECTORAL\s+[A-Z,\s-]+\d+'
+    regex_roll = r'PADRO?Ó?N\s+ELECTORAL\s[A-Z,\s-]{1,200}\d+'
     #: region regex
-    regex_region = r'REGIO?Ó?N[0,]*\s*:\s*([A-ZÑ\'\s.]*\s{3})'
+    regex_region = r'REGIO?Ó?N[0,]*\s*:(?:\s*(?!\s)|\s*(?=\s{3}(?!\s)))' \
+        r'([A-ZÑ\'\s.]*\s{3})'
     #: commune regex
-    regex_commune = r'COMUNA[0,]*\s*:\s*([A-ZÑ\' -]*\s{3})'
+    regex_commune = r'COMUNA[0,]*\s*:(?:\s*(?!\s)|\s*(?=\s{3}(?!\s)))' \
+        r'([A-ZÑ\' -]*\s{3})'
     #: province regex
     regex_province = r'PROVINCIA[0,]*\s*:\s*([A-ZÑ\' ]*)'
     #: total entries regex (optional)
     regex_total_entries = r'Registros\s*:\s*(\d+)'
     #: pagination regex (optional)
-    regex_pagination = r'[PAaáGgIiNn]+\s*:?\s*(\d*)\s*de\s*(\d*)'
+    regex_pagination = r'(?<![PAaáGgIiNn])[PAaáGgIiNn]+\s*(?!\s):?\s*(?!\s)' \
+        r'(\d*)\s*de\s*(\d*)'
     #: regex's for parsing entries.
     regexs_entries = {
         'name': r'^[A-ZÑa-z\s]+',
-        'rut': r'\d*\.?\d+\.\d+-[0-9kK]',
+        'rut': r'(?<!\d)(?:\d*\.)?\d+\.\d+-[0-9kK]',
         'sex': r'\s(VAR|MUJ)[ONER]*\s',
-        'table': r'\s(\d+\s?\w?)\s*\d*$'}
+        'table': r'\s(\d+(?!\d)(?:\s\w?|[^\W\d])?)\s*\d*$'}
+    #: prefix of the table regex to find where the table starts (the \
+    #: spaces before it).
+    regex_table_prefix = r'(?<!\s)\s*'
+    #: fields line regex.
+    regex_fields_line = r'^NOMBRE\s+C'
+    #: maximum length of the lines searched by the regex's (longer lines, \
+    #: as the watermark noise of some pages, are clipped).
+    max_line_length = 10000
+    #: options of pdftotext to render the sheets (see more in \
+    #: :class:`PdftotextMixin <.PdftotextMixin>`).
+    pdftotext_options = {}
     #: path to commune-circuns json.
     dpa_fixture_path = '../utils/DPA-commune-circuns.json'
+    #: fields that can be projected (see :attr:`projection \
+    #: <.RollParser.projection>`).
+    projectable_fields = (
+        'nombre', 'c-identidad', 'sexo', 'sex', 'region', 'provincia',
+        'comuna', 'domicilio-electoral', 'circunscripcion', 'mesa',
+        'reference')
+    #: aliases of the fields (the sex field is *sex* or *sexo* by year).
+    fields_aliases = {'sex': 'sexo', 'sexo': 'sex'}
+    #: values of an entry (in the order of the fields, see \
+    #: :meth:`complete_entry <.RollParser.complete_entry>`).
+    entry_values = ('name', 'rut', 'sex', 'region', 'province', 'commune',
+                    'direction', 'circun', 'table', 'reference')
+
+    def run(self, entries=True):
+        '''
+        :param bool entries: parses the entries (default True). If false \
+            they are left to be parsed by other means (eg: \
+            :class:`RollVectorizer <.RollVectorizer>`).
 
-    def run(self):
-        '''
         Method that starts the voter registry sheet analyzer by executing:
         * :meth:`decompose <.RollParser.decompose>`
         * :meth:`parse_header <.RollParser.parse_header>`
         * :meth:`parse_fields <.RollParser.parse_fields>`
+        * :meth:`project_fields <.RollParser.project_fields>`
         * :meth:`parse_entries <.RollParser.parse_entries>`
 
         It measures the duration times of each method executed and saves \
         them in the :attr:`metadata[times] <.RollParser.metadata>` \
-        property.
+        property. If the header does not match the :attr:`place_filter \
+        <.RollParser.place_filter>` it stops after the header (see \
+        :attr:`is_filtered <.RollParser.is_filtered>`).
         '''
         self.decompose()
         if not self.__get_fields_index():
             return None
         header_at = dt.now()
         self.parse_header()
+        if self.place_filter is not None and \
+                not self.place_filter.match(self.header):
+            self._is_filtered = True
+            return None
         fields_at = dt.now()
         self.parse_fields()
+        self.project_fields()
         entries_at = dt.now()
-        self.parse_entries()
+        if entries:
+            self.parse_entries()
         finish_at = dt.now()
         times = {
             'header': fields_at - header_at,
@@ -123,7 +189,8 @@ class RollParser:
                 [w[0] for w in header['roll'].split(' ') if len(w) > 2]))
             return f'{id_roll}-{str(header["year"])}'
         idx = self.__get_fields_index()
-        target = ' \t '.join(self.sheet[:idx])
+        target = ' \t '.join(
+            [self.__guard(x, 'header') for x in self.sheet[:idx]])
         attributes = ['roll', 'region', 'commune', 'province']
         header = {}
         for attr in attributes:
@@ -131,7 +198,7 @@ class RollParser:
                 regex=getattr(self, 'regex_'+attr),
                 target=target, ecode='header-no-'+attr)
         year = self.__parser(
-            r'\d+$', header['roll'], 'header-no-year')
+            r'(?<!\d)\d+$', header['roll'], 'header-no-year')
         if year:
             header['year'] = int(year)
         total_entries = re.findall(self.regex_total_entries, target)
@@ -142,8 +209,8 @@ class RollParser:
             header['pagination'] = pagination[0]
         self._metadata['rid'] = __identify(header)
         self._header = header
-        with open(os.path.dirname(__file__)+'/'+self.dpa_fixture_path) as f:
-            fixture = json.load(f)
+        fixture = load_dpa_fixture(
+            os.path.dirname(__file__)+'/'+self.dpa_fixture_path)
         if 'PAGINA' in header['commune']:
             header['commune'] = header['commune'].replace('PAGINA', '').strip()
         if header['commune'] in fixture:
@@ -198,56 +265,194 @@ class RollParser:
             self._fields.insert(3, 'region')
             self._fields.append('reference')
 
+    def project_fields(self):
+        '''
+        Method that selects the fields of the :attr:`projection \
+        <.RollParser.projection>` (if any) from the fields of the sheet. \
+        A field not found in the sheet is added to the errors and its \
+        values are None. The values of the entries that are not needed by \
+        the projected fields are not parsed (eg: the circunscription is \
+        only searched for *circunscripcion* or *domicilio-electoral*).
+        '''
+        if self.projection is None or not self._fields:
+            return None
+        values = self.entry_values if self.more_fields else [
+            x for x in self.entry_values if x not in [
+                'region', 'province', 'commune', 'reference']]
+        index = []
+        for field in self.projection:
+            if field not in self._fields:
+                field = self.fields_aliases.get(field, field)
+            if field in self._fields:
+                index.append(self._fields.index(field))
+            else:
+                index.append(None)
+                self._errors.append({
+                    'code': 'projection-field-not-found',
+                    'fields': self._fields,
+                    'target': field})
+        self._index = index
+        self._needed = {values[x] for x in index if x is not None}
+        if 'direction' in self._needed:
+            self._needed.add('circun')
+
     @property
     def fields(self):
         '''
         Property that contains the fields of the electoral roll \
         detected in the sheet through the :meth:`parse_fields \
-        <.RollParser.parse_fields>` method.
+        <.RollParser.parse_fields>` method (or the fields of the \
+        :attr:`projection <.RollParser.projection>`).
         '''
+        if self._index is not None:
+            return list(self.projection)
         return self._fields
 
+    @property
+    def projection(self):
+        '''
+        :return: tuple of fields or None.
+
+        Property with the fields to extract from each entry (in the order \
+        of the entries), *sex* and *sexo* are aliases. If it is None all \
+        fields are extracted.
+
+        >>> parser = RollParser(sheet, fields=['c-identidad', 'mesa'])
+        >>> parser.entries[0]
+        ('1.111.111-1', '1 M')
+        '''
+        return self._projection
+
     def parse_entries(self):
         '''
         Method that analyzes and extracts each data entry from the voter \
         registration sheet.
 
-        First determine if each line of text is well composed, that is, \
-        it begins with at least one letter and ends with a number or a space \
-        next to a single letter. Then each line of text is analyzed as if it \
-        were an input through the :meth:`parse_entry \
+        First the lines of text are classified in a single pass (see \
+        :meth:`split_entries <.RollParser.split_entries>`), joining the \
+        malformed lines as they come. Then each well composed line is \
+        analyzed as if it were an input through the :meth:`parse_entry \
         <.RollParser.parse_entry>` method.
 
-        Afterwards, the lines considered malformed are internally processed, \
-        joining them in relation to whether they start with a letter or a \
-        space. Then use the :meth:`parse_entry \
-        <.RollParser.parse_entry>` method again for each of them. \
-        Those that are rescued will remain in the :attr:`metadata \
+        Afterwards, the joined malformed lines are analyzed with the \
+        :meth:`parse_entry <.RollParser.parse_entry>` method. Those that \
+        are rescued will remain in the :attr:`metadata \
         <.RollParser.metadata>` property in the keys *entires* > \
         *rescue*.
         '''
-        index = self.__get_fields_index()
-        if not index:
+        lines = self.split_entries()
+        if lines is None:
             return None
-        index += 1
+        lines, groups, orphans = lines
         entries = []
-        malformed = []
-        for line in self.sheet[index:]:
-            if not re.match(r'^\w+.+\d+\s?\w?$', line):
-                if line.strip():
-                    malformed.append(line)
-                continue
+        for line in lines:
             entry = self.parse_entry(line)
             if entry:
                 entries.append(entry)
+        self.store_entries(entries, groups, orphans)
+
+    @staticmethod
+    def classify_line(line):
+        '''
+        :param str line: line of text of the entries.
+        :return: kind of the line: *entry* (well composed), *start* \
+            (malformed line that begins an entry, eg: with a wrapped name \
+            or domicile), *continuation* (malformed line that continues \
+            the previous start) or *noise* (blank line).
+
+        A line is well composed if it begins with at least one letter and \
+        ends with a number or a space next to a single letter (as the \
+        regular expression ``^\\w+.+\\d+\\s?\\w?$``). Only its first and \
+        last characters are checked, so the line is not scanned.
+
+        >>> RollParser.classify_line('NAME  1.111.111-1  VAR  ...  1 M')
+        'entry'
+        '''
+        def is_word(char):
+            return char.isalnum() or char == '_'
+        text = line[:-1] if line.endswith('\n') else line
+        if '\n' in text:
+            if re.match(r'^\w+.+\d+\s?\w?$', line):
+                return 'entry'
+        elif text and is_word(text[0]):
+            size, last = len(text), text[-1]
+            if last.isdecimal():
+                return 'entry' if size > 2 else 'start'
+            if size > 3 and text[-2].isdecimal() and (
+                    is_word(last) or last.isspace()):
+                return 'entry'
+            if size > 4 and is_word(last) and text[-2].isspace() and \
+                    text[-3].isdecimal():
+                return 'entry'
+            return 'start'
+        if not line or line.isspace():
+            return 'noise'
+        return 'start' if is_word(line[0]) else 'continuation'
+
+    def split_entries(self):
+        '''
+        :return: tuple with the list of well composed lines, the list of \
+            groups of malformed lines and the list of continuations \
+            without a start, after the fields line (or None if the sheet \
+            has no fields line).
+
+        Classifies each line once (see :meth:`classify_line \
+        <.RollParser.classify_line>`) and joins the malformed lines as \
+        they come: each start opens a group and the continuations are \
+        added to the group in progress (the well composed lines between \
+        them are not taken into account).
+        '''
+        index = self.__get_fields_index()
+        if not index:
+            return None
+        index += 1
+        lines, groups, orphans = [], [], []
+        for line in self.sheet[index:]:
+            kind = self.classify_line(line)
+            if kind == 'entry':
+                lines.append(line)
+            elif kind == 'start':
+                groups.append(line)
+            elif kind == 'continuation':
+                if groups:
+                    groups[-1] += line
+                else:
+                    orphans.append(line)
+        return lines, groups, orphans
+
+    def store_entries(self, entries, groups, orphans):
+        '''
+        :param list entries: entries parsed from the well composed lines.
+        :param list groups: groups of malformed lines (see \
+            :meth:`split_entries <.RollParser.split_entries>`).
+        :param list orphans: continuations without a start.
+
+        Rescues the entries of the groups of malformed lines (except the \
+        last one, which is not closed by another start) and stores all \
+        entries and their metadata (*total*, *rescue* and *errors*) and \
+        the duration of the rescue (in the *times* key).
+        '''
         total_entries = len(entries)
         self.metadata['entries'] = {}
-        if malformed:
+        rescue_at = dt.now()
+        if groups or orphans:
             # try to take entry again
-            rescue_entries = self.__rescue_entries(malformed)
-            entries += rescue_entries
+            for line in orphans:
+                self._errors.append({
+                    'code': 'malformed-no-start',
+                    'target': line})
+            for group in groups[:-1]:
+                entry = self.parse_entry(group)
+                if not entry:
+                    self._errors.append({
+                        'code': 'malformed-no-entry',
+                        'target': group})
+                else:
+                    entries.append(entry)
             self._metadata['entries']['rescue'] = len(entries) - total_entries
             total_entries = len(entries)
+        self._metadata.setdefault('times', {})['rescue'] = \
+            dt.now() - rescue_at
         self._metadata['entries']['errors'] = len(self.errors)
         self._metadata['entries']['total'] = total_entries
         self._entries = entries
@@ -270,6 +475,9 @@ class RollParser:
             fields = [fields[0], fields[1], fields[2], fields[-1]]
             values = []
             for idx, field in enumerate(fields):
+                if needed is not None and attr_fields[idx] not in needed:
+                    values.append(None)
+                    continue
                 value = self.__parser(
                     regex=self.regexs_entries[attr_fields[idx]],
                     target=line, ecode='entry-'+field)
@@ -284,7 +492,7 @@ class RollParser:
         def __parse_circun(line, field):
             largest = len(sorted(self.circuns, key=lambda x: len(x))[-1])
             table_position = re.search(
-                r'\s*'+self.regexs_entries['table'], line)
+                self.regex_table_prefix + self.regexs_entries['table'], line)
             if not table_position:
                 table_position = 150
             else:
@@ -330,54 +538,79 @@ class RollParser:
                 self._metadata['nulls'][field] += 1
         if 'nulls' not in self.metadata:
             self._metadata['nulls'] = {'total': 0}
-        regex_vals = __regex_fields(line, self.fields)
-        entry = regex_vals
-        circun = __parse_circun(line, self.fields[-2])
-        entry.insert(3, circun)
-        direction = __parse_dir(
-            line, self.regexs_entries['sex'], circun, self.fields[-3])
-        entry.insert(3, direction)
-        if self.more_fields:
-            entry.insert(3, self.header['commune'])
-            entry.insert(3, self.header['province'])
-            entry.insert(3, self.header['region'])
-            reference = self.metadata['rid']
-            reference += '-' + slugify(self.header['commune'])
-            if 'pagination' in self.header:
-                pag = self.header['pagination']
-                reference += '-page-' + str(pag[0]) + '-of-' + str(pag[1])
-            entry.append(reference)
-        return entry
-
-    def __rescue_entries(self, malformed):
-        pentries = []
-        entries = []
-        lastentry = ''
-        for txt in malformed:
-            if re.match(r'^\w+', txt):
-                if lastentry:
-                    pentries.append(lastentry)
-                lastentry = txt
-            elif lastentry:
-                lastentry += txt
-            else:
-                self._errors.append({
-                    'code': 'malformed-no-start',
-                    'target': txt})
-        for e in pentries:
-            entry = self.parse_entry(e)
-            if not entry:
-                self._errors.append({
-                    'code': 'malformed-no-entry',
-                    'target': e})
-            else:
-                entries.append(entry)
-        return entries
+        needed = self._needed
+        line = self.__guard(line, 'entry')
+        name, rut, sex, table = __regex_fields(line, self._fields)
+        circun, direction = None, None
+        if needed is None or 'circun' in needed:
+            circun = __parse_circun(line, self._fields[-2])
+        if needed is None or 'direction' in needed:
+            direction = __parse_dir(
+                line, self.regexs_entries['sex'], circun, self._fields[-3])
+        return self.complete_entry([name, rut, sex, direction, circun, table])
+
+    def complete_entry(self, entry):
+        '''
+        :param list entry: values of the direct fields of the sheet \
+            (*nombre*, *c-identidad*, *sexo*, *domicilio-electoral*, \
+            *circunscripcion* and *mesa*).
+        :return: tuple with the values of the entry in the order of the \
+            :attr:`fields <.RollParser.fields>`.
+
+        Adds the region, province, commune and reference of the sheet to \
+        an entry if the :attr:`more_fields <.RollParser.more_fields>` \
+        option is active. These values are the same objects for all \
+        entries of the sheet (see :attr:`constants \
+        <.RollParser.constants>`), so each entry is one tuple. If there \
+        is a :attr:`projection <.RollParser.projection>` the entry only \
+        has the values of the projected fields.
+        '''
+        if not self.more_fields:
+            entry = tuple(entry)
+        else:
+            name, rut, sex, direction, circun, table = entry
+            region, province, commune, reference = self.constants
+            entry = (name, rut, sex, region, province, commune, direction,
+                     circun, table, reference)
+        if self._index is None:
+            return entry
+        return tuple([entry[x] if x is not None else None
+                      for x in self._index])
+
+    @property
+    def constants(self):
+        '''
+        :return: tuple with the region, province, commune and reference \
+            of the sheet.
+
+        Property with the values that are added to each entry of the \
+        sheet, built once from the :attr:`header <.RollParser.header>` \
+        (the reference has the rid, the commune and the pagination, it is \
+        None if the :attr:`projection <.RollParser.projection>` does not \
+        have it).
+
+        >>> parser.constants
+        ('METRO...', 'SANTIA...', 'SANTIA...',
+         'PEA-EM-2016-santiago-page-1-of-99')
+        '''
+        if self._constants is None:
+            reference = None
+            if self._needed is None or 'reference' in self._needed:
+                reference = self.metadata['rid']
+                reference += '-' + slugify(self.header['commune'])
+                if 'pagination' in self.header:
+                    pag = self.header['pagination']
+                    reference += '-page-' + str(pag[0]) + '-of-' + \
+                        str(pag[1])
+            self._constants = (
+                self.header['region'], self.header['province'],
+                self.header['commune'], reference)
+        return self._constants
 
     def __get_fields_index(self):
         if self.fields_index:
             return self.fields_index
-        regex = r'^NOMBRE\s+C'
+        regex = self.regex_fields_line
         for idx, line in enumerate(self.sheet):
             if re.match(regex, line):
                 self._fields_index = idx
@@ -387,23 +620,34 @@ class RollParser:
             'regex': regex,
             'target': self.sheet})
 
+    def __guard(self, line, ecode):
+        if len(line) <= self.max_line_length:
+            return line
+        self._errors.append({
+            'code': 'line-too-long',
+            'ecode': ecode,
+            'length': len(line)})
+        return line[:self.max_line_length]
+
     def __parser(self, regex, target, ecode):
-        parsed = re.findall(regex, target) if isinstance(target, str) else None
-        if not bool(parsed):
+        parsed = re.search(regex, target) if isinstance(target, str) \
+            else None
+        if not parsed:
             self._errors.append({
                 'code': ecode,
                 'regex': regex,
                 'target': target})
             return None
-        return re.sub(r'\s+', ' ', parsed[0].strip())
+        value = parsed.group(1) if parsed.re.groups else parsed.group()
+        return re.sub(r'\s+', ' ', (value or '').strip())
 
     @property
     def entries(self):
         '''
         Property containing a list of entries from the electoral roll \
-        sheet. Each entry corresponds to a list of data in the order of the \
+        sheet. Each entry corresponds to a tuple of data in the order of the \
         fields defined in the :attr:`fields <RollParser.fields>` \
-        property.
+        property (up to version 0.1.8 the entries were lists).
         '''
         return self._entries
 
@@ -463,6 +707,27 @@ class RollParser:
         '''
         return self._circuns
 
+    @property
+    def place_filter(self):
+        '''
+        :return: instance of :class:`RollFilter <.RollFilter>` or None.
+
+        Property with the filter of places of the sheets (see \
+        :meth:`run <.RollParser.run>`).
+        '''
+        return self._place_filter
+
+    @property
+    def is_filtered(self):
+        '''
+        :return: boolean.
+
+        Property that indicates if the header of the sheet does not match \
+        the :attr:`place_filter <.RollParser.place_filter>`, so its fields \
+        and entries were not parsed.
+        '''
+        return self._is_filtered
+
     @property
     def more_fields(self):
         '''
@@ -480,12 +745,153 @@ class RollParser:
         self._fields = []
         self._entries = []
         self._errors = []
+        self._constants = None
+        self._index, self._needed = None, None
+        self._is_filtered = False
 
-    def __init__(self, sheet, auto=True, more_fields=True, *args, **kwargs):
+    def __init__(self, sheet, auto=True, more_fields=True, fields=None,
+                 place_filter=None, *args, **kwargs):
         if not isinstance(sheet, str) or not sheet:
             raise TypeError('\'sheet\' arg must be string')
+        if fields is not None and (
+                isinstance(fields, str) or
+                any(x not in self.projectable_fields for x in fields)):
+            raise TypeError('fields must be a list of: ' +
+                            ','.join(self.projectable_fields))
         self._more_fields = bool(more_fields)
+        self._projection = tuple(fields) if fields else None
+        self._place_filter = place_filter
         self.__launch_props()
         self._sheet = sheet
         if auto:
             self.run()
+
+
+class RollColumnParser(RollParser):
+    '''
+    :class:`RollColumnParser <.RollColumnParser>` is a :class:`RollParser \
+    <.RollParser>` for sheets rendered with a physical layout, where the \
+    columns of the table have fixed widths (eg: pdftotext with its \
+    *physical* option, see :attr:`pdftotext_options \
+    <.RollColumnParser.pdftotext_options>`).
+
+    The offsets of the columns are derived once per sheet from the fields \
+    line, then the values of each entry are extracted by slicing the line. \
+    Lines that dont fit the columns (the values are not valid) are parsed \
+    with the regular expressions of :meth:`RollParser.parse_entry \
+    <.RollParser.parse_entry>`. The number of entries sliced and parsed \
+    by regular expressions are stored in the :attr:`metadata \
+    <.RollParser.metadata>` property with the *columns* key.
+
+    >>> parser = RollColumnParser(sheet)
+    >>> parser.columns
+    [0, 42, 56, 62, 102, 127]
+    >>> parser.metadata['columns']
+    {'sliced': 30, 'fallback': 1}
+    '''
+    #: fields line regex (the physical layout can indent the lines).
+    regex_fields_line = r'^(\s*)NOMBRE\s+C'
+    #: options of pdftotext to render the sheets in physical layout.
+    pdftotext_options = {'physical': True}
+    #: regex's to validate the sliced values.
+    regexs_columns = {
+        'name': r'[A-ZÑa-z\s]+',
+        'sex': r'(VAR|MUJ)[ONER]*',
+        'table': r'(\d+\s?\w?)(\s+\d+)?'}
+
+    def decompose(self):
+        '''
+        Method that descompose a :attr:`sheet <.RollParser.sheet>` into a \
+        list with each line, removing the trailing spaces and the \
+        indentation of the fields line (the columns keep their offsets).
+        '''
+        if self.is_decomposed:
+            return None
+        lines = [x.rstrip() for x in self._sheet.split('\n')]
+        indent = 0
+        for line in lines:
+            matched = re.match(self.regex_fields_line, line)
+            if matched:
+                indent = len(matched.group(1))
+                break
+        self._sheet = [
+            x[min(indent, len(x) - len(x.lstrip())):] for x in lines]
+
+    def parse_fields(self):
+        '''
+        Extends :meth:`RollParser.parse_fields <.RollParser.parse_fields>` \
+        to derive the offsets of the columns from the fields line (stored \
+        in the :attr:`columns <.RollColumnParser.columns>` property).
+        '''
+        super().parse_fields()
+        self._metadata['columns'] = {'sliced': 0, 'fallback': 0}
+        index = self.fields_index
+        if not index:
+            return None
+        fields_line = self.sheet[index].replace('LIO ELE', 'LIO-ELE')
+        columns = [x.start() for x in re.finditer(r'\S+', fields_line)]
+        if len(columns) == 6:
+            self._columns = columns
+
+    @property
+    def columns(self):
+        '''
+        :return: list of offsets or None.
+
+        Property that contains the offset where each column of the table \
+        starts (*nombre*, *c-identidad*, *sexo*, *domicilio-electoral*, \
+        *circunscripcion* and *mesa*). It is None if the fields line does \
+        not have the six columns.
+        '''
+        return self._columns
+
+    def parse_entry(self, line):
+        '''
+        Method that extracts the data from an entry slicing the line by \
+        the :attr:`columns <.RollColumnParser.columns>`, falling back to \
+        :meth:`RollParser.parse_entry <.RollParser.parse_entry>` if the \
+        line does not fit the columns.
+        '''
+        entry = self.slice_entry(line) if self.columns else None
+        if entry is None:
+            self._metadata['columns']['fallback'] += 1
+            return super().parse_entry(line)
+        self._metadata['columns']['sliced'] += 1
+        return self.complete_entry(entry)
+
+    def slice_entry(self, line):
+        '''
+        :param str line: line of an entry.
+        :return: list with the values of the direct fields or None if \
+            some value is not valid.
+
+        The start of each column is moved to the left while it cuts a \
+        value, because some values are aligned to the right of their \
+        column (eg: *c-identidad*).
+        '''
+        starts = list(self.columns)
+        for idx in range(1, len(starts)):
+            while starts[idx] > starts[idx - 1] and \
+                    0 < starts[idx] < len(line) and \
+                    line[starts[idx] - 1] != ' ' and line[starts[idx]] != ' ':
+                starts[idx] -= 1
+        ends = starts[1:] + [len(line)]
+        values = [line[x:y].strip() for x, y in zip(starts, ends)]
+        table = values.pop()
+        name, rut, sex, direction, circun = [
+            re.sub(r'\s+', ' ', x) for x in values]
+        if not re.fullmatch(self.regexs_columns['name'], name) or \
+                not re.fullmatch(self.regexs_entries['rut'], rut) or \
+                not direction or not self.circuns or \
+                circun not in self.circuns:
+            return None
+        sex = re.fullmatch(self.regexs_columns['sex'], sex)
+        table = re.fullmatch(self.regexs_columns['table'], table)
+        if not sex or not table:
+            return None
+        table = re.sub(r'\s+', ' ', table.group(1).strip())
+        return [name, rut, sex.group(1), direction, circun, table]
+
+    def __init__(self, sheet, *args, **kwargs):
+        self._columns = None
+        super().__init__(sheet, *args, **kwargs)
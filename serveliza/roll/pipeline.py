@@ -0,0 +1,277 @@
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime as dt
+from datetime import timedelta
+import threading
+import queue
+
+from .batches import RollBatch
+from .profiler import profile_call, dump_profiles
+
+
+def parse_sheet(parser_class, sheet, fields=None, place_filter=None,
+                profile=None):
+    '''
+    :param class parser_class: class of the parser (see \
+        :class:`RollParser <.RollParser>`).
+    :param str sheet: sheet in text string.
+    :param tuple fields: fields of the projection (see \
+        :attr:`RollParser.projection <.RollParser.projection>`).
+    :param obj place_filter: filter of places (see \
+        :attr:`RollParser.place_filter <.RollParser.place_filter>`).
+    :param str profile: directory of the profiles (default None, see \
+        :class:`RollProfiler <.RollProfiler>`).
+    :return: tuple with the parsed sheet, the batch of its entries (see \
+        :class:`RollBatch <.RollBatch>`), the start and the duration of \
+        the parsing and the dumped profile.
+
+    Function executed in the worker process of the pipeline.
+    '''
+    init, profiles = dt.now(), {} if profile else None
+    parsed = profile_call(profiles, 'parsing', lambda x: parser_class(
+        x, fields=fields, place_filter=place_filter), sheet)
+    duration = dt.now() - init
+    return parsed, RollBatch([parsed]), init, duration, \
+        dump_profiles(profiles, profile)
+
+
+class RollPipeline:
+    '''
+    :param bool pipeline: If the pipeline is activated (default False).
+    :param bool parse_process: Parses the sheets in a worker process \
+        instead of a thread (default False).
+    :param int queue_size: Maximum of sheets in each queue (default 8).
+
+    :class:`RollPipeline <.RollPipeline>` is an executor that overlaps the \
+    stages of the flow of :class:`ElectoralRoll <.ElectoralRoll>` for the \
+    pages of a file, instead of running them strictly in sequence:
+
+    * A *render* thread processes and adapts each page (the processors \
+      run C code or wait for the disk).
+    * A *parse* thread parses the adapted sheets, or submits them to a \
+      worker process if *parse_process* is true.
+    * A *writer* thread memorizes and exports the parsed sheets (in the \
+      order of the pages) and updates the metadata of the file.
+
+    The stages are connected by bounded queues, so a slow stage blocks the \
+    previous one (backpressure) and memory stays bounded. The depth of \
+    each queue is sampled on each put and reported in :attr:`metrics \
+    <.RollPipeline.metrics>`. It is instantiated within an instance of \
+    :class:`ElectoralRoll <.ElectoralRoll>`.
+    '''
+
+    #: names of the queues between the stages.
+    queues = ['render-parse', 'parse-writer']
+    #: item that indicates the end of a queue.
+    end = None
+
+    def run_sheets(self, roll, file, pdf, files):
+        '''
+        :param obj roll: instance of :class:`ElectoralRoll <.ElectoralRoll>`.
+        :param dict file: data of file.
+        :param obj pdf: processed pdf file (iterable of pages).
+        :param tuple files: number of the file and total of files.
+        :return: metadata of the file.
+
+        Runs the stages of the pages of a file in the pipeline threads \
+        and waits for them. If a stage fails the others are stopped and \
+        the error is raised.
+        '''
+        self._stop = threading.Event()
+        self._errors = []
+        self._file_metadata = {}
+        channels = [queue.Queue(maxsize=self.queue_size)
+                    for _ in self.queues]
+        total_sheets = len(pdf)
+        stages = [
+            (self.render, (roll, file, pdf, channels[0])),
+            (self.parse, (roll, file, channels[0], channels[1])),
+            (self.write, (roll, file, channels[1], files, total_sheets))]
+        threads = [threading.Thread(target=self.guard, args=x, daemon=True)
+                   for x in stages]
+        for thread in threads:
+            thread.start()
+        try:
+            for thread in threads:
+                thread.join()
+        finally:
+            self._stop.set()
+            for thread in threads:
+                thread.join()
+        if self._errors:
+            raise self._errors[0]
+        return self._file_metadata
+
+    def guard(self, stage, args):
+        '''
+        Runs a stage keeping its error and stopping the other stages.
+        '''
+        try:
+            stage(*args)
+        except Exception as error:
+            self._errors.append(error)
+            self._stop.set()
+
+    def render(self, roll, file, pdf, output):
+        '''
+        Stage that processes and adapts each page of the file.
+        '''
+        for sheet in pdf:
+            if self._stop.is_set():
+                return None
+            self.put(output, 0, roll.sheet_process(file, sheet))
+        self.put(output, 0, self.end)
+
+    def parse(self, roll, file, source, output):
+        '''
+        Stage that parses each adapted sheet (in this thread or in the \
+        worker process).
+        '''
+        while True:
+            sheet = self.get(source)
+            if sheet is self.end:
+                break
+            if self.parse_process:
+                parsed = self.executor.submit(
+                    parse_sheet, roll.inner_class_parser, sheet,
+                    roll.projection, roll.place_filter,
+                    roll.profiler.profile)
+            else:
+                parsed = roll.run_stage(
+                    file['name'], 'parsing', 'sheet_parse', [sheet])
+            self.put(output, 1, parsed)
+        self.put(output, 1, self.end)
+
+    def write(self, roll, file, source, files, total_sheets):
+        '''
+        Stage that memorizes and exports each parsed sheet, updating the \
+        metadata of the file and printing the progress.
+        '''
+        idx, rid = 0, None
+        while True:
+            parsed = self.get(source)
+            if parsed is self.end:
+                break
+            if self.parse_process:
+                parsed, batch, init, duration, dumps = parsed.result()
+                batch.unpack([parsed])
+                roll.profiler.add_dumps(dumps)
+                roll._metadata.add_duration(
+                    file['name'], 'parsing', duration)
+                if roll.tracer.is_active:
+                    roll.tracer.add_stage(
+                        file['name'], 'parsing', init, duration, parsed,
+                        tid='parse process')
+            idx += 1
+            roll.printer.run_file_progress(roll.get_progress(
+                rid, files, (idx, total_sheets)))
+            self._file_metadata = roll.sheet_store(
+                file, parsed, self._file_metadata)
+            rid = self._file_metadata.get('rid')
+
+    def put(self, channel, number, item):
+        '''
+        Puts an item in a queue, waiting while it is full (backpressure) \
+        unless the pipeline is stopped. Samples the depth of the queue.
+        '''
+        metrics = self._metrics[self.queues[number]]
+        depth = channel.qsize()
+        metrics['puts'] += 1
+        metrics['depth'] += depth
+        metrics['max'] = max(metrics['max'], depth)
+        init = dt.now()
+        while not self._stop.is_set():
+            try:
+                channel.put(item, timeout=0.1)
+                break
+            except queue.Full:
+                continue
+        metrics['blocked'] += dt.now() - init
+
+    def get(self, channel):
+        '''
+        Gets an item of a queue, returning the end if the pipeline is \
+        stopped.
+        '''
+        while not self._stop.is_set():
+            try:
+                return channel.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return self.end
+
+    def close(self):
+        '''
+        Shuts down the worker process (if any).
+        '''
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    @property
+    def executor(self):
+        '''
+        Executor of the worker process for the parse stage (created on \
+        demand, after starting the resource tracker of the shared memory \
+        of the batches, see :meth:`RollBatch.start_tracker \
+        <.RollBatch.start_tracker>`).
+        '''
+        if self._executor is None:
+            RollBatch.start_tracker()
+            self._executor = ProcessPoolExecutor(max_workers=1)
+        return self._executor
+
+    @property
+    def metrics(self):
+        '''
+        :return: dictionary with the metrics of each queue.
+
+        Metrics of the queues of the pipeline: number of items put, mean \
+        and maximum depth sampled on each put and time blocked waiting \
+        for space (backpressure).
+
+        >>> roll.pipeline.metrics
+        {'render-parse': {'puts': 5, 'mean': 0.4, 'max': 1,
+          'blocked': datetime.timedelta(0)}, ...}
+        '''
+        metrics = {}
+        for name, values in self._metrics.items():
+            metrics[name] = {
+                'puts': values['puts'],
+                'mean': values['depth'] / values['puts']
+                if values['puts'] else 0,
+                'max': values['max'],
+                'blocked': values['blocked']}
+        return metrics
+
+    @property
+    def is_active(self):
+        '''
+        :return: boolean.
+
+        Property that indicates if the pipeline is active as defined \
+        in the constructor.
+        '''
+        return self._is_active
+
+    @property
+    def parse_process(self):
+        '''
+        Determines whether the sheets are parsed in a worker process.
+        '''
+        return self._parse_process
+
+    @property
+    def queue_size(self):
+        '''
+        Maximum of sheets in each queue of the pipeline.
+        '''
+        return self._queue_size
+
+    def __init__(self, *args, **kwargs):
+        self._is_active = bool(kwargs.get('pipeline', False))
+        self._parse_process = bool(kwargs.get('parse_process', False))
+        self._queue_size = int(kwargs.get('queue_size', 8))
+        self._executor = None
+        self._metrics = {x: {'puts': 0, 'depth': 0, 'max': 0,
+                             'blocked': timedelta()}
+                         for x in self.queues}
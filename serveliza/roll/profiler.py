@@ -0,0 +1,233 @@
+from pathlib import Path
+import threading
+import cProfile
+import pstats
+import uuid
+import os
+
+
+def profile_call(profiles, stage, method, *args):
+    '''
+    :param dict profiles: profiles by stage (or None, without profiling).
+    :param stage: name of the stage (or any key of the profile).
+    :param function method: function of the stage.
+    :return: the result of the function.
+
+    Calls the function of a stage enabling its profile (created on its \
+    first call), so the profile accumulates all the calls of the stage. \
+    If another profile is active in other thread and the interpreter \
+    only allows one at a time (python 3.12 or later), the function is \
+    called without profiling.
+    '''
+    if profiles is None:
+        return method(*args)
+    profile = profiles.setdefault(stage, cProfile.Profile())
+    try:
+        profile.enable()
+    except ValueError:
+        return method(*args)
+    try:
+        return method(*args)
+    finally:
+        profile.disable()
+
+
+def dump_profiles(profiles, directory):
+    '''
+    :param dict profiles: profiles by stage (or None).
+    :param str directory: directory of the profiles.
+    :return: dictionary with the path of the dumped profile of each stage.
+
+    Function executed in the worker processes (of the scheduler and the \
+    pipeline) to send their profiles to the main process, which merges \
+    them on :meth:`RollProfiler.export <.RollProfiler.export>`.
+    '''
+    if not profiles:
+        return {}
+    path = Path(directory) / RollProfiler.dumps_dir
+    path.mkdir(parents=True, exist_ok=True)
+    dumps = {}
+    for stage, profile in profiles.items():
+        dumps[stage] = str(path / f'{stage}-{os.getpid()}-'
+                           f'{uuid.uuid4().hex[:8]}.pstats')
+        profile.dump_stats(dumps[stage])
+    return dumps
+
+
+def collapse_stats(stats, threshold=1e-5, depth=64):
+    '''
+    :param dict stats: raw stats of a profile (see :mod:`pstats`).
+    :param float threshold: fraction of the total time under which the \
+        stacks are discarded.
+    :param int depth: maximum depth of the stacks.
+    :return: dictionary with the self time (in microseconds) of each \
+        stack (the functions separated by semicolons).
+
+    cProfile does not keep the stacks, only the time of each call between \
+    a caller and a callee, so the stacks are rebuilt from the roots \
+    distributing the time of each function between its callers in \
+    proportion to the time of their calls (recursive calls are cut).
+    '''
+    callees = {}
+    for func, (_, _, _, _, callers) in stats.items():
+        for caller, values in callers.items():
+            callees.setdefault(caller, []).append((func, values[3]))
+    total = sum([x[2] for x in stats.values()])
+    stacks = {}
+
+    def label(func):
+        filename, line, name = func
+        if filename == '~':
+            return name.replace(';', ',')
+        return f'{name} ({os.path.basename(filename)}:{line})'.replace(
+            ';', ',')
+
+    def walk(func, stack, scale):
+        stack = stack + (func,)
+        time = stats[func][2] * scale
+        if time * 1e6 >= 1:
+            key = ';'.join([label(x) for x in stack])
+            stacks[key] = stacks.get(key, 0) + time * 1e6
+        if len(stack) >= depth:
+            return None
+        for callee, cumulative in callees.get(func, []):
+            if callee in stack or not stats[callee][3]:
+                continue
+            if cumulative * scale < total * threshold:
+                continue
+            walk(callee, stack, scale * cumulative / stats[callee][3])
+
+    for func, (_, _, _, cumulative, callers) in stats.items():
+        called = sum([x[3] for x in callers.values()])
+        if cumulative and cumulative - called > total * threshold:
+            walk(func, (), (cumulative - called) / cumulative)
+    return {x: int(round(y)) for x, y in stacks.items() if round(y)}
+
+
+class RollProfiler:
+    '''
+    :param str profile: directory where the profiles are written \
+        (default None, the profiler is not active).
+
+    :class:`RollProfiler <.RollProfiler>` runs :mod:`cProfile` scoped to \
+    each stage of the flow of :class:`ElectoralRoll <.ElectoralRoll>` \
+    (*processing*, *adapting*, *parsing*, *memorizing* and *exporting*), \
+    also in the worker processes of the scheduler and of the pipeline. \
+    At the end of the run it writes for each stage and processor (eg: \
+    *parsing.pdftotext*):
+
+    * A *.pstats* file, that can be read with :mod:`pstats` or tools as \
+      snakeviz.
+    * A *.collapsed* file with the stacks in the collapsed format of \
+      flamegraph.pl, speedscope or inferno (see :func:`collapse_stats \
+      <.collapse_stats>`, the values are microseconds).
+
+    Each thread (eg: of the pipeline) has its own profile of each stage, \
+    so the stages run concurrently without a shared lock, and the \
+    profiles of a stage are merged on :meth:`export \
+    <.RollProfiler.export>`. The paths of the files are added to the \
+    analysis of the metadata (and \
+    of the summary). It is instantiated within an instance of \
+    :class:`ElectoralRoll <.ElectoralRoll>`.
+
+    >>> roll = ElectoralRoll(source='/path/to/dir', profile='profiles')
+    >>> roll.run()
+    >>> roll.metadata['analysis']['profile']['parsing']
+    {'pstats': '/path/to/profiles/parsing.pdftotext.pstats',
+     'collapsed': '/path/to/profiles/parsing.pdftotext.collapsed'}
+    '''
+
+    #: subdirectory of the profiles dumped by the worker processes.
+    dumps_dir = '.workers'
+
+    def start(self):
+        '''
+        Starts the profiles of a run.
+        '''
+        self._profiles, self._dumps = {}, {}
+
+    def run(self, stage, method, args):
+        '''
+        :param str stage: name of the stage.
+        :param function method: function of the stage.
+        :param list args: arguments of the function.
+        :return: the result of the function.
+
+        Calls the function of a stage with the profile of the stage in \
+        the current thread enabled. A stage called within another one (in \
+        the same thread) is included in the profile of the outer stage.
+        '''
+        if getattr(self._local, 'running', False):
+            return method(*args)
+        self._local.running = True
+        try:
+            return profile_call(self._profiles,
+                                (threading.get_ident(), stage), method, *args)
+        finally:
+            self._local.running = False
+
+    def add_dumps(self, dumps):
+        '''
+        :param dict dumps: paths of the profiles dumped by a worker \
+            process by stage (see :func:`dump_profiles <.dump_profiles>`).
+        '''
+        for stage, path in (dumps or {}).items():
+            self._dumps.setdefault(stage, []).append(path)
+
+    def export(self, processor):
+        '''
+        :param str processor: name of the processor of the run.
+        :return: dictionary with the paths of the files of each stage.
+
+        Merges the profiles of each stage (of the threads of the main \
+        process and the workers), writes their *.pstats* and \
+        *.collapsed* files and removes the dumps of the workers.
+        '''
+        directory = Path(self.profile)
+        directory.mkdir(parents=True, exist_ok=True)
+        exported = {}
+        profiles = {}
+        for (_, stage), profile in self._profiles.items():
+            profiles.setdefault(stage, []).append(profile)
+        for stage in sorted(set(profiles) | set(self._dumps)):
+            sources = profiles.get(stage, []) + self._dumps.get(stage, [])
+            stats = pstats.Stats(*sources)
+            name = directory / f'{stage}.{processor}'
+            files = {'pstats': name.with_suffix(name.suffix + '.pstats'),
+                     'collapsed': name.with_suffix(
+                         name.suffix + '.collapsed')}
+            stats.dump_stats(str(files['pstats']))
+            with files['collapsed'].open('w', encoding='utf-8') as f:
+                for stack, time in collapse_stats(stats.stats).items():
+                    f.write(f'{stack} {time}\n')
+            exported[stage] = {x: str(y.absolute()) for x, y in files.items()}
+        for path in sum(self._dumps.values(), []):
+            os.remove(path)
+        dumps = directory / self.dumps_dir
+        if dumps.is_dir() and not any(dumps.iterdir()):
+            dumps.rmdir()
+        self._profiles, self._dumps = {}, {}
+        return exported
+
+    @property
+    def profile(self):
+        '''
+        Directory where the profiles are written.
+        '''
+        return self._profile
+
+    @property
+    def is_active(self):
+        '''
+        :return: boolean.
+
+        Property that indicates if the profiler is active (a *profile* \
+        directory defined in the constructor).
+        '''
+        return self._profile is not None
+
+    def __init__(self, *args, **kwargs):
+        profile = kwargs.get('profile', None)
+        self._profile = str(profile) if profile else None
+        self._profiles, self._dumps = {}, {}
+        self._local = threading.local()
@@ -1,25 +1,27 @@
 from datetime import datetime as dt
-from datetime import timedelta
 from pathlib import Path
+import hashlib
 from pandas import pandas as pd
-import numpy as np
 
 
 from serveliza.mixins.pdf import PDFProcessorMixin
 from serveliza.utils import pdf as pdf_utils
-from .parsers import RollParser
+from .parsers import RollParser, RollColumnParser
 from .adapters import RollAdapter
 from .printer import RollPrinter
 from .memorizer import RollMemorizer
 from .exporter import RollExporter
-
-
-DURATIONS_SCHEMA = {
-    'processing': timedelta(),
-    'adapting': timedelta(),
-    'parsing': timedelta(),
-    'memorizing': timedelta(),
-    'exporting': timedelta()}
+from .pipeline import RollPipeline
+from .vectorizer import RollVectorizer
+from .layouts import detect_layout
+from .scheduler import RollScheduler
+from .metadata import RollMetadata
+from .catalog import RollCatalog
+from .filters import RollFilter
+from .tracer import RollTracer
+from .profiler import RollProfiler
+from .monitor import RollMemoryMonitor
+from .watchdog import RollWatchdog
 
 
 class ElectoralRoll(PDFProcessorMixin):
@@ -39,15 +41,69 @@ class ElectoralRoll(PDFProcessorMixin):
     <.PDFProcessorMixin>` (*processor*). Likewise, in the constructor \
     it instantiates other nested classes by routing their parameters.
 
-    :param str source: The source path of pdf files.
+    :param str source: The source path of pdf files (it can also be a \
+        zip or tar archive, bytes, a file-like object or a list of them).
     :param bool auto: Run the extract in the instantation.
     :param bool recursive: Determines if the search for pdf files in the \
         delivered source is recursive or is only for the root of the \
         indicated directory,
+    :param bool pipeline: Overlaps the stages of the flow in threads \
+        connected by bounded queues (default=False, see more in \
+        :class:`RollPipeline <.RollPipeline>`).
+    :param bool parse_process: Parses the sheets in a worker process \
+        when the pipeline is active (default=False).
+    :param int workers: Number of worker processes to distribute the \
+        files, largest first (default=1, see more in \
+        :class:`RollScheduler <.RollScheduler>`).
+    :param int steal_pages: Minimum of pages that an idle worker steals \
+        from another at the tail of the run (default=4).
+    :param str shard: Shard of the files to process in the format \
+        *i/N* (see more in :attr:`shard <.ElectoralRoll.shard>`).
+    :param str shard_by: Key to assign the files to shards (*path* \
+        or *size*, default='path').
+    :param str engine: Engine to parse the entries (*sheet* or \
+        *vectorized*, default='sheet', see more in \
+        :class:`RollVectorizer <.RollVectorizer>`).
     :param str processor: Processor to use (default='pdftotext', see \
         more in :class:`PDFProcessorMixin <.PDFProcessorMixin>`).
+    :param str parser: Parser of the sheets (*regex*, *columns* or \
+        *layout*, default='regex', see more in :attr:`parser \
+        <.ElectoralRoll.parser>`).
+    :param list fields: Fields to extract from each entry (default=None, \
+        all fields, see more in :attr:`projection \
+        <.ElectoralRoll.projection>`).
+    :param list regions: Regions to extract (default=None, see more in \
+        :class:`RollFilter <.RollFilter>`).
+    :param list provinces: Provinces to extract (default=None, see more \
+        in :class:`RollFilter <.RollFilter>`).
+    :param list communes: Communes to extract (default=None, see more in \
+        :class:`RollFilter <.RollFilter>`).
+    :param str catalog_index: Index of the catalog used by the filters \
+        of places (default=None, see more in :class:`RollCatalog \
+        <.RollCatalog>`).
+    :param str trace: Path of a json file to write the spans of the \
+        files, pages and stages in the Chrome trace format \
+        (default=None, see more in :class:`RollTracer <.RollTracer>`).
+    :param str profile: Directory to write the cProfile stats and the \
+        collapsed stacks of each stage (default=None, see more in \
+        :class:`RollProfiler <.RollProfiler>`).
+    :param str memory_report: Adds a report of the memory (peak by file \
+        and stage, bytes by memorized entry, size of the errors and top \
+        allocation sites) to the summary, sampling the resident memory \
+        (*rss*) or also tracing the allocations (*tracemalloc*) \
+        (default=None, see more in :class:`RollMemoryMonitor \
+        <.RollMemoryMonitor>`).
+    :param float page_timeout: Renders the pages in isolated worker \
+        processes with a budget of seconds by page, recording and \
+        retrying with the other processor the pages that time out or \
+        crash (default=None, see more in :class:`RollWatchdog \
+        <.RollWatchdog>`).
     :param bool memorize: Storage data in memory of instance (default=True, \
         see more in :class:`RollMemorizer <.RollMemorizer>`).
+    :param max_memory: Memory ceiling of the memorized data, in bytes or \
+        text string as '512mb'. Once it is passed the data is spilled \
+        to temporary files on disk (default=None, see more in \
+        :class:`RollMemorizer <.RollMemorizer>`).
     :param bool export: If export data in csv file (default=False, \
         see more in :class:`RollExporter <.RollExporter>`).
     :param str output: Directory to store the data in csv file(s) (\
@@ -55,7 +111,9 @@ class ElectoralRoll(PDFProcessorMixin):
     :param str mode: Determines the data export mode in files. If it \
         is *unified* (default) it creates a single csv file with the data,\
          or if it is *separated* into several according to communal or \
-        regional criteria (see more in :class:`RollExporter <.RollExporter>`).
+        regional criteria, or if it is *partitioned* into hive-style \
+        directories by region and commune (see more in \
+        :class:`RollExporter <.RollExporter>`).
     :param str mode_sep: Criteria for separating files in export in \
         separate mode (*commune* or *region*, default="commune", \
         see more in :class:`RollExporter <.RollExporter>`).
@@ -65,6 +123,17 @@ class ElectoralRoll(PDFProcessorMixin):
     :param bool summary: Determines whether to generate a summary file of \
         the export and the extracted data (see more in :class:`RollExporter \
         <.RollExporter>`).
+    :param str compression: Compressor of the exported csv files (*gzip*, \
+        *bz2*, *xz* or *zstd*, see more in :class:`RollExporter \
+        <.RollExporter>`).
+    :param bool compression_thread: Determines whether the export runs in \
+        a background thread (see more in :class:`RollExporter \
+        <.RollExporter>`).
+    :param str file_format: Format of the files in partitioned mode \
+        (*csv* or *parquet*, see more in :class:`RollExporter \
+        <.RollExporter>`).
+    :param part_size: Size of each part file in partitioned mode (see \
+        more in :class:`RollExporter <.RollExporter>`).
 
     Anyway, only the *source* parameter is required:
 
@@ -85,6 +154,19 @@ class ElectoralRoll(PDFProcessorMixin):
     inner_class_printer = RollPrinter
     inner_class_memorizer = RollMemorizer
     inner_class_exporter = RollExporter
+    inner_class_pipeline = RollPipeline
+    inner_class_vectorizer = RollVectorizer
+    inner_class_scheduler = RollScheduler
+    inner_class_catalog = RollCatalog
+    inner_class_filter = RollFilter
+    inner_class_tracer = RollTracer
+    inner_class_profiler = RollProfiler
+    inner_class_memory_monitor = RollMemoryMonitor
+    inner_class_watchdog = RollWatchdog
+    #: parsers of the sheets by name (see :attr:`parser \
+    #: <.ElectoralRoll.parser>`).
+    parsers = {'regex': RollParser, 'columns': RollColumnParser,
+               'layout': RollParser}
 
     # Operational methods
     # --------------------
@@ -95,8 +177,12 @@ class ElectoralRoll(PDFProcessorMixin):
         analysis and extraction:
 
         * Iterate over the found files, ordered by size from smallest \
-        to largest, executing the :meth:`run_file <.ElectoralRoll.run_file>` \
-        method with the file, its index and the total.
+        to largest (and the members of archives after them, in the order \
+        of each archive, so compressed tars are decompressed once), \
+        executing the :meth:`run_file <.ElectoralRoll.run_file>` \
+        method with the file, its index and the total (or distribute \
+        them between worker processes with :class:`RollScheduler \
+        <.RollScheduler>` if there are more than one *workers*).
         * It iterates on each page of each file:
             * *Processing* it with the library determined in the processor \
             property and defined in the constructor (see more in \
@@ -121,21 +207,77 @@ class ElectoralRoll(PDFProcessorMixin):
         >>> roll.run()
         '''
         started = dt.now()
-        self._metadata['analysis']['started'] = started
-        files = self._metadata['files']
+        self._metadata.started = started
+        if self.tracer.is_active:
+            self.tracer.start(started)
+        if self.profiler.is_active:
+            self.profiler.start()
+        if self.memory_monitor.is_active:
+            self.memory_monitor.start()
+        if self.watchdog.is_active:
+            self.watchdog.start()
+        files = {x: y.data for x, y in self._metadata.files.items()}
         self.printer.run_started(started, files)
-        files = [x[1] for x in sorted(
-            files.items(), key=lambda x: x[1]['bytes'])]
-        for idx, file in enumerate(files):
-            self.run_file(file, idx, len(files))
+        order = {x: idx for idx, x in enumerate(files)}
+        files = [x[1] for x in sorted(files.items(), key=lambda x: (
+            (1, x[1]['archive'], order[x[0]]) if 'archive' in x[1]
+            else (0, x[1]['bytes'], x[0])))]
+        try:
+            if self.filter.is_active:
+                files = self.filter_files(files)
+            if self.scheduler.is_active:
+                self.scheduler.run(self, files)
+                self._metadata.reports['scheduler'] = self.scheduler.report
+            else:
+                for idx, file in enumerate(files):
+                    self.run_file(file, idx, len(files))
+        finally:
+            self.close_run()
+        if self.pipeline.is_active:
+            self._metadata.reports['pipeline'] = self.pipeline.metrics
+        if self.watchdog.is_active:
+            self._metadata.reports['watchdog'] = self.watchdog.report
         finalized = dt.now()
-        self._metadata['analysis']['finalized'] = finalized
+        self._metadata.finalized = finalized
+        if self.tracer.is_active:
+            self.tracer.add('run', 'run', started, finalized - started,
+                            {'files': len(files)})
+            self._metadata.reports['trace'] = self.tracer.export()
+        if self.profiler.is_active:
+            self._metadata.reports['profile'] = self.profiler.export(
+                self.processor)
+        if self.memory_monitor.is_active:
+            self._metadata.reports['memory'] = self.memory_monitor.export(
+                self.memorizer)
         summary = self.exporter.export_summary(self.rid, self.metadata)
         if summary:
-            self._metadata['exported_to'].append(summary)
+            self._metadata.add_exported(summary)
         self._is_runned = True
         self.printer.run_finalized(finalized, self.metadata)
 
+    def close_run(self):
+        '''
+        Releases what a run keeps open, also when it fails: the workers \
+        of the watchdog, the worker process of the pipeline and the \
+        handles (and compression thread) of the exporter and the opened \
+        archives.
+        '''
+        if self.watchdog.is_active:
+            self.watchdog.close()
+        if self.pipeline.is_active:
+            self.pipeline.close()
+        self.exporter.close()
+        self.close_archives()
+
+    def close_archives(self):
+        '''
+        Closes the archives opened by :meth:`open_file \
+        <.ElectoralRoll.open_file>`.
+        '''
+        for archive in self._archives.values():
+            archive.close()
+        self._archives = {}
+
     def run_file(self, file, file_num, file_total):
         '''
         :param dict file: data of file
@@ -164,84 +306,240 @@ class ElectoralRoll(PDFProcessorMixin):
             by defining the *export* parameter as true in the constructor \
             (see more in :class:`RollExporter <RollExporter>`).
 
-        Stores metadatas of the extraction of each file.
+        Stores metadatas of the extraction of each file. If the pipeline \
+        is active, the pages are iterated by :meth:`RollPipeline.run_sheets \
+        <.RollPipeline.run_sheets>` with the stages overlapped. If the \
+        vectorized engine is active, they are parsed at once by \
+        :meth:`RollVectorizer.run_sheets <.RollVectorizer.run_sheets>`. If \
+        the watchdog is active, the pages are processed and adapted in \
+        isolated workers (see :class:`RollWatchdog <.RollWatchdog>`).
         '''
-
-        def get_progress(self, rid, files, sheets):
-            metadata = self.metadata['rolls'].get(rid, {})
-            if not metadata:
-                metadata['entries'] = {'total': 0, 'errors': 0}
-            return {
-                'entries': metadata['entries']['total'],
-                'errors': metadata['entries']['errors'],
-                'files': files, 'sheets': sheets,
-                'duration': dt.now() - self.metadata['analysis']['started'],
-                }
-
-        def duration_wrapper(self, file, stage, method, args):
-            init = dt.now()
-            method = getattr(self, method)
-            result = method(*args)
-            duration = dt.now() - init
-            self._metadata['files'][file]['durations'][stage] += duration
-            self._metadata['analysis']['durations'][stage] += duration
-            return result
-
-        def update_file_metadata(parsed, metadata):
-            if not metadata:
-                metadata['rid'] = parsed.metadata['rid']
-                attributes = ['roll', 'year', 'region',
-                              'province', 'commune']
-                for attr in attributes:
-                    metadata[attr] = parsed.header[attr]
-                metadata['entries'] = {'total': 0, 'rescue': 0, 'errors': 0}
-                declared = parsed.header.get('total_sheets', False)
-                if declared:
-                    metadata['entries']['declared'] = declared
-            entries = parsed.metadata['entries']
-            for meta in entries:
-                metadata['entries'][meta] += entries[meta]
-            return metadata
-
         # pre-processing
         init = dt.now()
-        pdf = self.process_pdf(file['absolute'])
+        file.pop('layout', None)
+        if self.watchdog.is_active:
+            pdf = self.watchdog.open(self, file)
+        else:
+            pdf = self.process_pdf(self.open_file(file))
         total_sheets = len(pdf)  # number of pages.
         file_metadata = {}
         rid = None
         self.printer.run_file_start(file, file_num)
-        for idx, sheet in enumerate(pdf):
-            # printing
-            progress = get_progress(
-                self, rid, (file_num, file_total), (idx+1, total_sheets))
-            self.printer.run_file_progress(progress)
-            # processing
-            processed = duration_wrapper(
-                self, file['name'], 'processing', 'process_pdf_page', [sheet])
-            # adapting
-            adapted = duration_wrapper(
-                self, file['name'], 'adapting', 'inner_class_adapter',
-                [processed, self.processor]).sheet
-            # parsingd
-            parsed = duration_wrapper(
-                self, file['name'], 'parsing', 'sheet_parse', [adapted])
-            # memorizing
-            duration_wrapper(self, file['name'], 'memorizing',
-                             'sheet_memorize', [parsed])
-            # exporting
-            exported = duration_wrapper(
-                self, file['name'], 'exporting', 'sheet_export', [parsed])
-            if exported:
-                if 'exported_to' not in self.metadata:
-                    self._metadata['exported_to'] = []
-                if exported not in self._metadata['exported_to']:
-                    self._metadata['exported_to'].append(exported)
-            # update file metadata
-            file_metadata = update_file_metadata(parsed, file_metadata)
-            rid = file_metadata['rid']
+        if self.pipeline.is_active:
+            file_metadata = self.pipeline.run_sheets(
+                self, file, pdf, (file_num, file_total))
+        elif self.vectorizer.is_active:
+            file_metadata = self.vectorizer.run_sheets(
+                self, file, pdf, (file_num, file_total))
+        else:
+            for idx, sheet in enumerate(pdf):
+                # printing
+                page_at = dt.now()
+                progress = self.get_progress(
+                    rid, (file_num, file_total), (idx+1, total_sheets))
+                self.printer.run_file_progress(progress)
+                # processing & adapting
+                adapted = self.sheet_process(file, sheet)
+                # parsing
+                parsed = self.run_stage(
+                    file['name'], 'parsing', 'sheet_parse', [adapted])
+                # memorizing, exporting & update file metadata
+                file_metadata = self.sheet_store(
+                    file, parsed, file_metadata)
+                rid = file_metadata.get('rid')
+                if self.tracer.is_active:
+                    self.tracer.add('page', 'page', page_at,
+                                    dt.now() - page_at, {
+                                        'file': file['name'], 'page': idx + 1,
+                                        'length': len(adapted),
+                                        'entries': len(parsed.entries),
+                                        'errors': len(parsed.errors)})
+        del pdf
+        if self.watchdog.is_active:
+            self.watchdog.close()
+        else:
+            self.close_pdf()
         file_metadata['duration'] = dt.now() - init
-        self._metadata['files'][file['name']].update(file_metadata)
-        self.printer.run_file_end(file_metadata)
+        self._metadata.files[file['name']].data.update(file_metadata)
+        if self.tracer.is_active:
+            self.tracer.add('file', 'file', init, file_metadata['duration'],
+                            {'file': file['name'], 'pages': total_sheets,
+                             **file_metadata.get('entries', {})})
+        if 'rid' in file_metadata:
+            self.printer.run_file_end(file_metadata)
+
+    def filter_files(self, files):
+        '''
+        :param list files: data of the files in the order of the run.
+        :return: list with the files whose first page matches the \
+            :attr:`filter <.ElectoralRoll.filter>`.
+
+        Scans the header of the first page of each file with the \
+        :meth:`catalog <.ElectoralRoll.catalog>` (cached in the index of \
+        the filter, if any) and marks the files that dont match (or are \
+        not electoral rolls) with the *filtered* key in their metadata.
+        '''
+        catalog = self.inner_class_catalog(
+            index=self.filter.catalog_index,
+            workers=self.scheduler.workers).run(self)
+        matched = []
+        for file in files:
+            record = catalog[file['name']]
+            if record['is_roll'] and self.filter.match(record):
+                matched.append(file)
+            else:
+                file['filtered'] = True
+        return matched
+
+    def catalog(self, index=None, workers=None):
+        '''
+        :param str index: path of the index file to cache the scanned \
+            files (default None).
+        :param int workers: number of worker processes (default the \
+            number of cpus).
+        :return: dictionary with the record of each file by name.
+
+        Fast scan of the files found in the source without running the \
+        extraction: only the first page of each file is rendered to parse \
+        its header (roll, region, province, commune, pages and declared \
+        entries, see :class:`RollCatalog <.RollCatalog>`).
+
+        >>> roll = ElectoralRoll(source='/path/to/dir')
+        >>> roll.catalog(index='catalog.json')['file.pdf']['commune']
+        'SANTIAGO'
+        '''
+        try:
+            return self.inner_class_catalog(
+                index=index, workers=workers).run(self)
+        finally:
+            self.close_archives()
+
+    def get_progress(self, rid, files, sheets):
+        '''
+        :param str rid: identifier of the electoral roll in progress.
+        :param tuple files: number of the file and total of files.
+        :param tuple sheets: number of the sheet and total of sheets.
+        :return: dictionary with the progress for the printer.
+        '''
+        accumulator = self.memorizer.accumulators.get(rid)
+        entries = accumulator.entries if accumulator else None
+        return {
+            'entries': entries.get('total') if entries else 0,
+            'errors': entries.get('errors') if entries else 0,
+            'files': files, 'sheets': sheets,
+            'duration': dt.now() - self._metadata.started,
+            }
+
+    def run_stage(self, file, stage, method, args):
+        '''
+        :param str file: name of the file.
+        :param str stage: name of the stage (see durations in \
+            :attr:`metadata <.ElectoralRoll.metadata>`).
+        :param str method: name of the method (or class) to call, or the \
+            callable itself.
+        :param list args: arguments of the method.
+        :return: the result of the method.
+
+        Calls a method of a stage of the flow, adding its duration to the \
+        durations of the file and of the analysis.
+        '''
+        init = dt.now()
+        if isinstance(method, str):
+            method = getattr(self, method)
+        if self.memory_monitor.is_active:
+            sample = self.memory_monitor.sample()
+        if self.profiler.is_active:
+            result = self.profiler.run(stage, method, args)
+        else:
+            result = method(*args)
+        duration = dt.now() - init
+        self._metadata.add_duration(file, stage, duration)
+        if self.memory_monitor.is_active:
+            self.memory_monitor.add_stage(file, stage, sample)
+        if self.tracer.is_active:
+            self.tracer.add_stage(file, stage, init, duration, result)
+        return result
+
+    def sheet_process(self, file, sheet):
+        '''
+        :param dict file: data of file.
+        :param obj sheet: page of the pdf file (according to processor).
+        :return: sheet adapted in text string.
+
+        Processes and adapts a page of a file (*processing* and \
+        *adapting* stages). If the watchdog is active, the page was \
+        already rendered by a worker and only its stages are added.
+        '''
+        if self.watchdog.is_active:
+            adapted = self.watchdog.add_stages(self, file, sheet)
+        else:
+            processed = self.run_stage(
+                file['name'], 'processing', 'process_pdf_page', [sheet])
+            adapted = self.run_stage(
+                file['name'], 'adapting', 'inner_class_adapter',
+                [processed, self.processor]).sheet
+        if self.parser == 'layout' and 'layout' not in file:
+            self.detect_layout(file, adapted)
+        return adapted
+
+    def detect_layout(self, file, sheet):
+        '''
+        :param dict file: data of file.
+        :param str sheet: first adapted sheet of the file.
+
+        Detects the layout of a file from its first sheet (see \
+        :func:`detect_layout <.detect_layout>`) and sets the \
+        :attr:`inner_class_parser <.ElectoralRoll.inner_class_parser>` \
+        to parse its sheets.
+        '''
+        parser_class = detect_layout(sheet)
+        file['layout'] = parser_class.layout_name if parser_class else None
+        self.inner_class_parser = parser_class or self.parsers['layout']
+
+    def sheet_store(self, file, parsed, file_metadata):
+        '''
+        :param dict file: data of file.
+        :param obj parsed: instance of :class:`RollParser <.RollParser>`.
+        :param dict file_metadata: metadata of the file in progress.
+        :return: metadata of the file updated with the parsed sheet.
+
+        Memorizes and exports a parsed sheet (*memorizing* and \
+        *exporting* stages) and updates the metadata of the file. The \
+        sheets that dont match the :attr:`filter <.ElectoralRoll.filter>` \
+        are only counted in the metadata of the file (*filtered* key).
+        '''
+        if parsed.is_filtered:
+            file_metadata['filtered'] = file_metadata.get('filtered', 0) + 1
+            return file_metadata
+        self.run_stage(file['name'], 'memorizing', 'sheet_memorize',
+                       [parsed, (file['bytes'], file['name'])])
+        exported = self.run_stage(
+            file['name'], 'exporting', 'sheet_export', [parsed])
+        if exported:
+            self._metadata.add_exported(exported)
+        return self.update_file_metadata(parsed, file_metadata)
+
+    @staticmethod
+    def update_file_metadata(parsed, metadata):
+        '''
+        :param obj parsed: instance of :class:`RollParser <.RollParser>`.
+        :param dict metadata: metadata of the file in progress.
+        :return: metadata of the file updated with the parsed sheet.
+        '''
+        if 'rid' not in metadata:
+            metadata['rid'] = parsed.metadata['rid']
+            attributes = ['roll', 'year', 'region',
+                          'province', 'commune']
+            for attr in attributes:
+                metadata[attr] = parsed.header[attr]
+            metadata['entries'] = {'total': 0, 'rescue': 0, 'errors': 0}
+            declared = parsed.header.get('total_sheets', False)
+            if declared:
+                metadata['entries']['declared'] = declared
+        entries = parsed.metadata['entries']
+        for meta in entries:
+            metadata['entries'][meta] += entries[meta]
+        return metadata
 
     def sheet_parse(self, sheet, *args, **kwargs):
         '''
@@ -250,8 +548,11 @@ class ElectoralRoll(PDFProcessorMixin):
 
         Method that calls the class defined in the :attr:`inner_class_parser \
         <.ElectoralRoll.inner_class_parser>` class attribute, initializing it \
-        with the sheet argument.
+        with the sheet argument (and the fields of the :attr:`projection \
+        <.ElectoralRoll.projection>`).
         '''
+        kwargs.setdefault('fields', self.projection)
+        kwargs.setdefault('place_filter', self.place_filter)
         return self.inner_class_parser(sheet, *args, **kwargs)
 
     def sheet_memorize(self, parsed, *args, **kwargs):
@@ -312,6 +613,36 @@ class ElectoralRoll(PDFProcessorMixin):
         '''
         return self._exporter
 
+    @property
+    def pipeline(self):
+        '''
+        :return: inner instance of :class:`RollPipeline <.RollPipeline>`.
+
+        Property to call the :class:`RollPipeline <.RollPipeline>` object \
+        instanciated in constructor.
+        '''
+        return self._pipeline
+
+    @property
+    def vectorizer(self):
+        '''
+        :return: inner instance of :class:`RollVectorizer <.RollVectorizer>`.
+
+        Property to call the :class:`RollVectorizer <.RollVectorizer>` \
+        object instanciated in constructor.
+        '''
+        return self._vectorizer
+
+    @property
+    def scheduler(self):
+        '''
+        :return: inner instance of :class:`RollScheduler <.RollScheduler>`.
+
+        Property to call the :class:`RollScheduler <.RollScheduler>` \
+        object instanciated in constructor.
+        '''
+        return self._scheduler
+
     # Operational properties
     # -----------------------
     @property
@@ -379,11 +710,11 @@ class ElectoralRoll(PDFProcessorMixin):
            'nulls': {'total': 0},
            'entries': {'total': 999, 'rescue': 0, 'errors': 0}}}}
         '''
-        stored = {'rolls': {}}
+        rolls = {}
         for k, v in self.memorizer.storage.items():
             if 'metadata' in v:
-                stored['rolls'][k] = v['metadata']
-        return {**self._metadata, **stored}
+                rolls[k] = v['metadata']
+        return self._metadata.snapshot(rolls)
 
     @property
     def rid(self):
@@ -400,9 +731,8 @@ class ElectoralRoll(PDFProcessorMixin):
 
         If the instance did not run, it returns None.
         '''
-        if self.memorizer.storage:
-            rids = [x for x in self.memorizer.storage]
-            return rids[0]
+        if self.memorizer.accumulators:
+            return next(iter(self.memorizer.accumulators))
 
     @property
     def roll(self):
@@ -417,8 +747,8 @@ class ElectoralRoll(PDFProcessorMixin):
         Internaly use the :attr:`rid <.ElectoralRoll.rid>` property. If the \
         instance did not run, it returns None.
         '''
-        if self.memorizer.storage:
-            return self.memorizer.storage[self.rid]['metadata']['roll']
+        if self.memorizer.accumulators:
+            return self.memorizer.accumulators[self.rid].roll
 
     @property
     def entries(self):
@@ -427,10 +757,15 @@ class ElectoralRoll(PDFProcessorMixin):
 
         Property that accesses the data entries of the electoral roll \
         analyzed. The data is stored in the :class:`RollMemorizer \
-        <.RollMemorizer>` instance.
+        <.RollMemorizer>` instance as a list-like :class:`RollSpillList \
+        <.RollSpillList>` (it could be partially spilled to disk if \
+        the *max_memory* parameter is defined). Each entry is a tuple \
+        with the values in the order of the :attr:`fields \
+        <.ElectoralRoll.fields>` (up to version 0.1.8 they were lists, \
+        use *list(entry)* to get a mutable copy).
 
         >>> roll.entries
-        [[...]...]
+        [('NAME', '1.111.111-1', ...)...]
 
         Internaly use the :attr:`rid <.ElectoralRoll.rid>` property. If the \
         instance did not run, it returns None.
@@ -496,17 +831,23 @@ class ElectoralRoll(PDFProcessorMixin):
         if not self.is_runned:
             raise UserWarning('You need to run the application before '
                               'converting the result to Pandas DataFrame.')
-        return pd.DataFrame(np.array(self.entries), columns=self.fields)
+        return pd.DataFrame.from_records(
+            iter(self.entries), columns=self.fields)
 
     @property
     def source(self):
         '''
         :return: list of paths to valid pdf files.
-        :raises TypeError: source param must be string or list.
+        :raises TypeError: source param must be string, list, bytes or \
+            file-like object.
         :raises TypeError: source doesnt have valid PDF files.
 
         Property that stores paths of pdf files obtained from a list or \
-        string with file paths or directories.
+        string with file paths, directories or archives (zip or tar, \
+        also compressed). The pdf files can also be delivered in memory, \
+        as bytes or binary file-like objects. The members of archives \
+        and the files in memory are read to memory buffers only when \
+        they are processed (one at a time).
 
         >>> roll.source
         ['relative / path / to / file.pdf']
@@ -517,33 +858,267 @@ class ElectoralRoll(PDFProcessorMixin):
 
         >>> roll.source = ['path / to / file.pdf', '/ path / to / dir']
         >>> roll.source = '/path/to/dir/o/file.pdf'
+        >>> roll.source = ['/path/to/rolls.zip', open('file.pdf', 'rb')]
         '''
         return self._source
 
     @source.setter
     def source(self, source):
+        def __is_buffer(path):
+            return isinstance(path, (bytes, bytearray)) or \
+                hasattr(path, 'read')
+
+        def __buffer_name(buffer):
+            name = Path(str(getattr(buffer, 'name', ''))).name
+            if Path(name).suffix in ['.pdf', '.PDF']:
+                return name
+            return f'buffer-{len(self._buffers)}.pdf'
         paths = []
-        if isinstance(source, str):
+        if isinstance(source, (str, Path)) or __is_buffer(source):
             paths.append(source)
         elif isinstance(source, list):
             paths += source
         else:
-            raise TypeError('source param must be string or list.')
-        files = []
+            raise TypeError('source param must be string, list, bytes '
+                            'or file-like object.')
+        files, members = [], []
         for path in paths:
-            if isinstance(path, str) and pdf_utils.is_valid_pdf(path):
+            if __is_buffer(path):
+                name = __buffer_name(path)
+                self._buffers[name] = path
+                members.append(pdf_utils.get_metadata_from_buffer(
+                    path, name))
+            elif pdf_utils.is_valid_pdf(path):
                 files += [path]
-            elif isinstance(path, str) and Path(path).is_dir():
-                files += self.printer.init_search(
+            elif pdf_utils.is_archive(path):
+                members += pdf_utils.get_all_pdf_in_archive(path)
+            elif Path(str(path)).is_dir():
+                found = self.printer.init_search(
                     pdf_utils.get_all_pdf_in_path, [path, self.recursive])
-        if not files:
+                self._roots.update({
+                    str(x.absolute()): x.relative_to(path).as_posix()
+                    for x in found})
+                files += found
+        if not files and not members:
             raise TypeError('Source doesnt have valid PDF files.')
-        self._source += files
         meta_files = pdf_utils.get_metadata_from_pdfs(files)
+        meta_files.update({x['name']: x for x in members})
+        if self.shard:
+            meta_files = {x: y for x, y in meta_files.items()
+                          if self.in_shard(y)}
+        self._source += [x['relative'] for x in meta_files.values()]
         self.printer.init_founded(meta_files)
-        for file in meta_files:
-            meta_files[file]['durations'] = DURATIONS_SCHEMA
-        self._metadata['files'].update(meta_files)
+        self._metadata.add_files(meta_files)
+
+    def open_file(self, file):
+        '''
+        :param dict file: data of file (see :attr:`metadata \
+            <.ElectoralRoll.metadata>`).
+        :return: path of the file or a memory buffer with its content.
+
+        Method that returns what the processor needs to open a file: its \
+        absolute path, or for members of archives and pdf files in \
+        memory, a memory buffer with the content (read only when the \
+        file is processed, one at a time). The archives stay open until \
+        the end of the run (see :meth:`close_archives \
+        <.ElectoralRoll.close_archives>`).
+        '''
+        if 'archive' in file:
+            if file['archive'] not in self._archives:
+                self._archives[file['archive']] = pdf_utils.ArchiveReader(
+                    file['archive'])
+            return self._archives[file['archive']].read(file['member'])
+        if file.get('buffer'):
+            return pdf_utils.read_buffer(self._buffers[file['name']])
+        return file['absolute']
+
+    @property
+    def parser(self):
+        '''
+        :return: name of the parser.
+        :raises TypeError: parser must be in :attr:`parsers \
+            <.ElectoralRoll.parsers>`.
+
+        Parser of the sheets: *regex* (default) uses :class:`RollParser \
+        <.RollParser>`, *columns* uses :class:`RollColumnParser \
+        <.RollColumnParser>`, which slices the entries by the offsets of \
+        the columns of the table, and *layout* detects the layout of each \
+        file from its first page and uses the parser specialized in it \
+        (see :class:`RollLayoutParser <.RollLayoutParser>`, or \
+        :class:`RollParser <.RollParser>` if it is not detected). The \
+        detected layout is stored in the metadata of the file with the \
+        *layout* key. The parser defines the :attr:`\
+        inner_class_parser <.ElectoralRoll.inner_class_parser>` and the \
+        options of the pdftotext processor (the *columns* parser renders \
+        the sheets with the physical layout).
+
+        >>> roll = ElectoralRoll(source='/path/to/dir', parser='columns')
+        >>> roll.inner_class_parser
+        <class 'serveliza.roll.parsers.RollColumnParser'>
+        '''
+        return self._parser
+
+    @parser.setter
+    def parser(self, parser):
+        parser = parser or 'regex'
+        if parser not in self.parsers:
+            raise TypeError('parser must be: ' + ','.join(self.parsers))
+        self._parser = parser
+        self.inner_class_parser = self.parsers[parser]
+        self.pdftotext_options = self.inner_class_parser.pdftotext_options
+
+    @property
+    def tracer(self):
+        '''
+        :return: inner instance of :class:`RollTracer <.RollTracer>`.
+
+        Property to call the :class:`RollTracer <.RollTracer>` object \
+        instanciated in constructor.
+        '''
+        return self._tracer
+
+    @property
+    def profiler(self):
+        '''
+        :return: inner instance of :class:`RollProfiler <.RollProfiler>`.
+
+        Property to call the :class:`RollProfiler <.RollProfiler>` object \
+        instanciated in constructor.
+        '''
+        return self._profiler
+
+    @property
+    def memory_monitor(self):
+        '''
+        :return: inner instance of :class:`RollMemoryMonitor \
+            <.RollMemoryMonitor>`.
+
+        Property to call the :class:`RollMemoryMonitor \
+        <.RollMemoryMonitor>` object instanciated in constructor.
+        '''
+        return self._memory_monitor
+
+    @property
+    def watchdog(self):
+        '''
+        :return: inner instance of :class:`RollWatchdog <.RollWatchdog>`.
+
+        Property to call the :class:`RollWatchdog <.RollWatchdog>` object \
+        instanciated in constructor.
+        '''
+        return self._watchdog
+
+    @property
+    def filter(self):
+        '''
+        :return: inner instance of :class:`RollFilter <.RollFilter>`.
+
+        Property to call the :class:`RollFilter <.RollFilter>` object \
+        instanciated in constructor (with the *regions*, *provinces* and \
+        *communes* parameters).
+        '''
+        return self._filter
+
+    @property
+    def place_filter(self):
+        '''
+        :return: the :attr:`filter <.ElectoralRoll.filter>` if it is \
+            active, otherwise None.
+
+        Filter of places passed to the parsers (see \
+        :attr:`RollParser.place_filter <.RollParser.place_filter>`).
+        '''
+        return self._filter if self._filter.is_active else None
+
+    @property
+    def projection(self):
+        '''
+        :return: tuple of fields or None.
+        :raises TypeError: fields must be in :attr:`RollParser.\
+            projectable_fields <.RollParser.projectable_fields>`.
+
+        Fields to extract from each entry, in the order of the entries \
+        (*sex* and *sexo* are aliases, see :attr:`RollParser.projection \
+        <.RollParser.projection>`). The parsers skip the values that are \
+        not needed by these fields, and the memorized and exported \
+        entries (and :attr:`to_dataframe <.ElectoralRoll.to_dataframe>`) \
+        only have their columns. It can also be a text string with the \
+        fields separated by commas.
+
+        >>> roll = ElectoralRoll(source='/path/to/dir',
+        ...                      fields=['c-identidad', 'mesa'])
+        >>> roll.to_dataframe.columns
+        Index(['c-identidad', 'mesa'], dtype='object')
+        '''
+        return self._projection
+
+    @projection.setter
+    def projection(self, fields):
+        if isinstance(fields, str):
+            fields = [x.strip() for x in fields.split(',') if x.strip()]
+        if not fields:
+            self._projection = None
+            return None
+        projectable = self.inner_class_parser.projectable_fields
+        if any(x not in projectable for x in fields):
+            raise TypeError('fields must be: ' + ','.join(projectable))
+        self._projection = tuple(dict.fromkeys(fields))
+
+    @property
+    def shard(self):
+        '''
+        :return: tuple (index, total) or None.
+        :raises TypeError: shard must be in the format i/N.
+
+        Shard of the files to process, in the format *i/N* (from 1/N to \
+        N/N). Each file found in the source is deterministically \
+        assigned to a shard by a stable hash of its path relative to the \
+        source (the directory where it was found, or its path in the \
+        archive) or its size (see *shard_by* parameter), independent of \
+        the working directory, so several runs with the same source and \
+        different shards (eg: in different machines) process each file \
+        once. Their outputs can be combined with \
+        :class:`RollMerger <.RollMerger>`.
+
+        >>> roll = ElectoralRoll(source='/path/to/dir', shard='1/4')
+        >>> roll.shard
+        (1, 4)
+        '''
+        return self._shard
+
+    @shard.setter
+    def shard(self, shard):
+        if not shard:
+            self._shard = None
+            return None
+        try:
+            if isinstance(shard, str):
+                shard = shard.split('/')
+            index, total = [int(x) for x in shard]
+        except (TypeError, ValueError):
+            raise TypeError('shard must be in the format i/N.')
+        if total < 1 or not 1 <= index <= total:
+            raise TypeError('shard must be in the format i/N, with i '
+                            'between 1 and N.')
+        self._shard = (index, total)
+
+    def in_shard(self, file):
+        '''
+        :param dict file: data of file.
+        :return: boolean.
+
+        Returns true if the file is assigned to the :attr:`shard \
+        <.ElectoralRoll.shard>` of the instance.
+        '''
+        if not self.shard:
+            return True
+        if self._shard_by == 'size':
+            key = str(file['bytes'])
+        else:
+            key = file.get('member') or self._roots.get(
+                file['absolute'], file['name'])
+        hashed = int(hashlib.md5(key.encode()).hexdigest(), 16)
+        return hashed % self.shard[1] == self.shard[0] - 1
 
     @property
     def recursive(self):
@@ -557,18 +1132,40 @@ class ElectoralRoll(PDFProcessorMixin):
     def __init__(self, source, auto=False, *args, **kwargs):
         processor = kwargs.get('processor', self.processor)
         self.processor = processor
+        self.parser = kwargs.get('parser', None)
+        self.projection = kwargs.get('fields', None)
         self._printer = self.inner_class_printer(**kwargs)
         self._memorizer = self.inner_class_memorizer(**kwargs)
         self._exporter = self.inner_class_exporter(**kwargs)
-        self._metadata = {'files': {}}
+        self._pipeline = self.inner_class_pipeline(**kwargs)
+        self._vectorizer = self.inner_class_vectorizer(**kwargs)
+        self._scheduler = self.inner_class_scheduler(**kwargs)
+        self._filter = self.inner_class_filter(**kwargs)
+        self._tracer = self.inner_class_tracer(**kwargs)
+        self._profiler = self.inner_class_profiler(**kwargs)
+        self._memory_monitor = self.inner_class_memory_monitor(**kwargs)
+        self._watchdog = self.inner_class_watchdog(**kwargs)
+        if self.scheduler.is_active and (
+                self.pipeline.is_active or self.vectorizer.is_active):
+            raise TypeError('workers can not be combined with the '
+                            'pipeline or the vectorized engine.')
+        if self.scheduler.is_active and self.watchdog.is_active:
+            raise TypeError('workers can not be combined with the '
+                            'watchdog (page_timeout).')
+        if self.vectorizer.is_active and (
+                self.pipeline.is_active or self.parser == 'columns'):
+            raise TypeError('vectorized engine requires the regex parser '
+                            'and no pipeline.')
+        self._metadata = RollMetadata()
         self._is_runned = False
         self._recursive = bool(kwargs.get('recursive', False))
         self._source = []
+        self._buffers, self._archives, self._roots = {}, {}, {}
+        self.shard = kwargs.get('shard', None)
+        self._shard_by = kwargs.get('shard_by', None) or 'path'
+        if self._shard_by not in ['path', 'size']:
+            raise TypeError('shard_by must be: path,size')
         self.source = source
-        self._metadata['analysis'] = {
-            'started': None,
-            'finalized': None,
-            'durations': DURATIONS_SCHEMA}
         if auto:
             self.printer.init_auto()
             self.run()
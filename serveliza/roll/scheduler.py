@@ -0,0 +1,425 @@
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from datetime import datetime as dt
+from datetime import timedelta
+import multiprocessing
+import heapq
+import io
+import os
+
+from serveliza.mixins.pdf import PDFProcessorMixin
+from serveliza.utils import pdf as pdf_utils
+from .adapters import RollAdapter
+from .batches import RollBatch
+from .layouts import detect_layout
+from .profiler import profile_call, dump_profiles
+from .monitor import start_tracing, sample_task
+
+
+#: shared progress of the tasks (next page and end of each slot), set \
+#: in each worker process by :func:`init_worker`.
+PROGRESS = None
+
+
+def init_worker(progress):
+    '''
+    :param obj progress: shared array with the progress of the tasks.
+
+    Initializer of the worker processes of :class:`RollScheduler \
+    <.RollScheduler>`.
+    '''
+    global PROGRESS
+    PROGRESS = progress
+
+
+def run_task(slot, source, start, options):
+    '''
+    :param int slot: slot of the task in the shared progress.
+    :param source: absolute path of the pdf file or its content (bytes).
+    :param int start: first page of the task.
+    :param dict options: processor, pdftotext options, parser class, \
+        whether the layout is detected, the fields of the projection, \
+        the filter of places, the directory of the profiles and the mode \
+        of the memory report (see :attr:`options \
+        <.RollScheduler.options>`).
+    :return: dictionary with the parsed sheets, the batch of their \
+        entries, the page where the task stopped, the pages of the file, \
+        the durations of the stages, the detected layout and, if the \
+        trace is active, the timings of each page (see \
+        :meth:`RollTracer.add_task <.RollTracer.add_task>`) and the \
+        profiles of the stages (see :func:`dump_profiles \
+        <.dump_profiles>`) and the peak memory of the task (see \
+        :func:`sample_task <.sample_task>`).
+
+    Function executed in the worker processes. It processes, adapts and \
+    parses the pages of a file from *start*, taking each page from the \
+    shared progress of its slot, so the end of the task can be reduced \
+    while it runs (when another worker steals the rest of its pages). \
+    The first task of a file sets its end to the number of pages. The \
+    entries are returned in a columnar batch (see :class:`RollBatch \
+    <.RollBatch>`).
+    '''
+    init = dt.now()
+    worker = PDFProcessorMixin()
+    worker.processor = options['processor']
+    worker.pdftotext_options = options['pdftotext_options']
+    if isinstance(source, bytes):
+        source = io.BytesIO(source)
+    pdf = worker.process_pdf(source)
+    total = len(pdf)
+    next_idx, end_idx = 2 * slot, 2 * slot + 1
+    with PROGRESS.get_lock():
+        if PROGRESS[end_idx] < 0:
+            PROGRESS[end_idx] = total
+    stages = ['processing', 'adapting', 'parsing']
+    durations = {x: timedelta() for x in stages}
+    parser_class, layout, sheets = options['parser_class'], None, []
+    timings, profiles = [], {} if options['profile'] else None
+    memory = None
+    if options['memory_report'] == 'tracemalloc':
+        start_tracing()
+    while True:
+        with PROGRESS.get_lock():
+            page = PROGRESS[next_idx]
+            if page >= min(PROGRESS[end_idx], total):
+                break
+            PROGRESS[next_idx] = page + 1
+        processing_at = dt.now()
+        processed = profile_call(
+            profiles, 'processing', worker.process_pdf_page, pdf[page])
+        adapting_at = dt.now()
+        durations['processing'] += adapting_at - processing_at
+        adapted = profile_call(profiles, 'adapting', RollAdapter,
+                               processed, options['processor']).sheet
+        durations['adapting'] += dt.now() - adapting_at
+        if options['layout'] and not sheets:
+            detected = detect_layout(adapted)
+            layout = detected.layout_name if detected else None
+            parser_class = detected or parser_class
+        at = dt.now()
+        sheets.append(profile_call(
+            profiles, 'parsing', lambda x: parser_class(
+                x, fields=options['fields'],
+                place_filter=options['place_filter']), adapted))
+        durations['parsing'] += dt.now() - at
+        if options['trace']:
+            timings.append((processing_at, adapting_at, at, dt.now(),
+                            len(adapted)))
+        memory = sample_task(options['memory_report'], memory)
+    worker.close_pdf()
+    return {'start': start, 'end': start + len(sheets), 'total': total,
+            'sheets': sheets, 'batch': RollBatch(sheets),
+            'durations': durations, 'layout': layout, 'init': init,
+            'elapsed': dt.now() - init, 'timings': timings,
+            'pid': os.getpid(),
+            'profiles': dump_profiles(profiles, options['profile']),
+            'memory': memory}
+
+
+class RollScheduler:
+    '''
+    :param int workers: Number of worker processes (default 1, the files \
+        are processed in the main process without the scheduler).
+    :param int steal_pages: Minimum of pages that a worker steals from \
+        another at the tail of the run (default 4).
+
+    :class:`RollScheduler <.RollScheduler>` distributes the files of \
+    :class:`ElectoralRoll <.ElectoralRoll>` between worker processes \
+    with the *longest processing time first* rule:
+
+    * The work of each file is estimated from its number of pages, read \
+      from the page tree of the pdf without rendering it (see \
+      :func:`get_page_count <serveliza.utils.pdf.get_page_count>`), and \
+      the cost of a page with the chosen processor, measured on the \
+      first page of the smallest file.
+    * The files are dispatched from the largest to the smallest to the \
+      idle workers, so the largest ones dont finish last.
+    * At the tail of the run, when there are no files left and a worker \
+      is idle, it steals the second half of the remaining pages of the \
+      task with more remaining pages.
+
+    The entries of the parsed sheets come back from the workers in \
+    columnar batches in shared memory (see :class:`RollBatch \
+    <.RollBatch>`), and the sheets are memorized and exported in the \
+    main process in the order of a serial run (by size of the files and \
+    pages), so the output is the same; the sheets that are completed \
+    out of that order are kept in memory until then. When their batches \
+    pass :attr:`max_buffered <.RollScheduler.max_buffered>` bytes, the \
+    pending files are dispatched in the order of the serial run instead \
+    (the next file to store first), so the buffer does not grow with \
+    the size of the run. The predicted and \
+    the actual completion time are reported in :attr:`report \
+    <.RollScheduler.report>`. It is instantiated within an instance of \
+    :class:`ElectoralRoll <.ElectoralRoll>`.
+
+    >>> roll = ElectoralRoll(source='/path/to/dir', workers=4)
+    >>> roll.run()
+    >>> roll.metadata['analysis']['scheduler']
+    {'workers': 4, 'pages': 120, 'cost': datetime.timedelta(...),
+     'predicted': datetime.timedelta(...),
+     'actual': datetime.timedelta(...), 'tasks': 9, 'steals': 3,
+     'transferred': 2097152, 'buffered': 524288}
+    '''
+
+    #: bytes of the batches completed out of the order of the serial run \
+    #: above which the files are dispatched in that order.
+    max_buffered = 64 * 1024 ** 2
+
+    def run(self, roll, files):
+        '''
+        :param obj roll: instance of :class:`ElectoralRoll <.ElectoralRoll>`.
+        :param list files: data of the files in the order of a serial run.
+
+        Estimates, dispatches and stores the files (see the description \
+        of the class).
+        '''
+        init = dt.now()
+        self._roll, self._files = roll, files
+        pages = [pdf_utils.get_page_count(roll.open_file(x)) for x in files]
+        for file, count in zip(files, pages):
+            file['pages'] = count
+        self._pending = sorted(
+            [(-(x or 0), idx) for idx, x in enumerate(pages)])
+        cost = self.measure_cost(roll, files, pages)
+        predicted = self.predict([x or 0 for x in pages], cost)
+        self._progress = multiprocessing.Array('l', 2 * self.workers)
+        self._results, self._running = {}, {}
+        self._next = [0, 0]
+        self._file_metadata, self._steals, self._tasks = {}, 0, 0
+        self._transferred, self._buffered, self._peak = 0, 0, 0
+        RollBatch.start_tracker()
+        executor = ProcessPoolExecutor(
+            max_workers=self.workers, initializer=init_worker,
+            initargs=(self._progress,))
+        try:
+            while self._pending or self._running:
+                self.dispatch(executor)
+                done, _ = wait(
+                    list(self._running), return_when=FIRST_COMPLETED)
+                for future in done:
+                    file_idx, slot = self._running.pop(future)
+                    result = future.result()
+                    self._results[(file_idx, result['start'])] = result
+                    self._buffered += result['batch'].size
+                    self._peak = max(self._peak, self._buffered)
+                self.store()
+        finally:
+            executor.shutdown()
+            results = list(self._results.values()) + [
+                x.result() for x in self._running if not x.exception()]
+            for result in results:
+                result['batch'].release()
+        self._report = {
+            'workers': self.workers, 'pages': sum([x or 0 for x in pages]),
+            'cost': cost, 'predicted': predicted, 'actual': dt.now() - init,
+            'tasks': self._tasks, 'steals': self._steals,
+            'transferred': self._transferred, 'buffered': self._peak}
+
+    def measure_cost(self, roll, files, pages):
+        '''
+        :return: timedelta with the cost of a page.
+
+        Measures the cost of processing, adapting and parsing the first \
+        page of the smallest file in the main process.
+        '''
+        for file, count in zip(files, pages):
+            if not count:
+                continue
+            init = dt.now()
+            pdf = roll.process_pdf(roll.open_file(file))
+            roll.sheet_parse(roll.inner_class_adapter(
+                roll.process_pdf_page(pdf[0]), roll.processor).sheet)
+            roll.close_pdf()
+            return dt.now() - init
+        return timedelta()
+
+    def predict(self, pages, cost):
+        '''
+        :param list pages: pages of each file.
+        :param obj cost: timedelta with the cost of a page.
+        :return: timedelta with the predicted completion time.
+
+        Simulates the dispatch of the files from the largest to the \
+        smallest to the first idle worker (the workers that run at the \
+        same time are limited by the number of cpus).
+        '''
+        workers = [timedelta()] * min(self.workers, os.cpu_count() or 1)
+        for count in sorted(pages, reverse=True):
+            heapq.heapreplace(workers, workers[0] + cost * count)
+        return max(workers)
+
+    def dispatch(self, executor):
+        '''
+        Submits the pending files (largest first, or in the order of the \
+        serial run if the buffer of completed batches is full) to the \
+        idle workers, or if there are no pending files, the pages stolen \
+        from the running tasks.
+        '''
+        while len(self._running) < self.workers:
+            slot = min(set(range(self.workers)) - set(
+                x[1] for x in self._running.values()))
+            if self._pending:
+                index = 0
+                if self._buffered > self.max_buffered:
+                    index = min(range(len(self._pending)),
+                                key=lambda x: self._pending[x][1])
+                _, file_idx = self._pending.pop(index)
+                start, end = 0, -1
+            else:
+                stolen = self.steal()
+                if not stolen:
+                    return None
+                file_idx, start, end = stolen
+                self._steals += 1
+            with self._progress.get_lock():
+                self._progress[2 * slot] = start
+                self._progress[2 * slot + 1] = end
+            future = executor.submit(
+                run_task, slot, self.get_source(self._files[file_idx]),
+                start, self.options)
+            self._running[future] = (file_idx, slot)
+            self._tasks += 1
+
+    def steal(self):
+        '''
+        :return: tuple with the file, the first page and the end of the \
+            stolen pages, or None.
+
+        Reduces the end of the running task with more remaining pages \
+        to the half of them (if they are at least :attr:`steal_pages \
+        <.RollScheduler.steal_pages>`) and returns the other half.
+        '''
+        best = None
+        with self._progress.get_lock():
+            for file_idx, slot in self._running.values():
+                page = self._progress[2 * slot]
+                end = self._progress[2 * slot + 1]
+                if end >= 0 and end - page >= self.steal_pages and (
+                        not best or end - page > best[2] - best[1]):
+                    best = (slot, file_idx, page, end)
+            if not best:
+                return None
+            slot, file_idx, page, end = best
+            middle = page + (end - page) // 2
+            self._progress[2 * slot + 1] = middle
+        return file_idx, middle, end
+
+    def store(self):
+        '''
+        Memorizes and exports the completed sheets in the order of a \
+        serial run, updating the metadata of the files. The entries of \
+        the sheets are unpacked from their batch.
+        '''
+        roll = self._roll
+        while tuple(self._next) in self._results:
+            file_idx, page = self._next
+            result = self._results.pop(tuple(self._next))
+            self._transferred += result['batch'].size
+            self._buffered -= result['batch'].size
+            result['batch'].unpack(result['sheets'])
+            file = self._files[file_idx]
+            if roll.tracer.is_active:
+                roll.tracer.add_task(file['name'], result)
+            if roll.profiler.is_active:
+                roll.profiler.add_dumps(result['profiles'])
+            if roll.memory_monitor.is_active:
+                roll.memory_monitor.add_file(file['name'], result['memory'])
+            if page == 0:
+                roll.printer.run_file_start(file, file_idx)
+                file['pages'] = result['total']
+                if roll.parser == 'layout':
+                    file['layout'] = result['layout']
+                self._file_metadata = {'duration': timedelta()}
+            for stage, duration in result['durations'].items():
+                roll._metadata.add_duration(file['name'], stage, duration)
+            metadata = self._file_metadata
+            duration = metadata.pop('duration') + result['elapsed']
+            for idx, parsed in enumerate(result['sheets']):
+                roll.printer.run_file_progress(roll.get_progress(
+                    metadata.get('rid'), (file_idx, len(self._files)),
+                    (result['start'] + idx + 1, result['total'])))
+                metadata = roll.sheet_store(file, parsed, metadata)
+            metadata['duration'] = duration
+            self._file_metadata = metadata
+            self._next[1] = result['end']
+            if result['end'] >= result['total']:
+                roll._metadata.files[file['name']].data.update(metadata)
+                if 'rid' in metadata:
+                    roll.printer.run_file_end(metadata)
+                self._next = [file_idx + 1, 0]
+
+    def get_source(self, file):
+        '''
+        :param dict file: data of file.
+        :return: absolute path of the file or its content (bytes) for \
+            members of archives and pdf files in memory.
+        '''
+        source = self._roll.open_file(file)
+        return source.getvalue() if hasattr(source, 'getvalue') else source
+
+    @property
+    def options(self):
+        '''
+        :return: dictionary with the options of the tasks (processor, \
+            pdftotext options, parser class, layout detection, the \
+            fields of the projection, the filter of places, whether the \
+            trace is active, the directory of the profiles and the mode \
+            of the memory report).
+        '''
+        roll = self._roll
+        return {
+            'processor': roll.processor,
+            'pdftotext_options': roll.pdftotext_options,
+            'parser_class': roll.parsers[roll.parser],
+            'layout': roll.parser == 'layout',
+            'fields': roll.projection,
+            'place_filter': roll.place_filter,
+            'trace': roll.tracer.is_active,
+            'profile': roll.profiler.profile,
+            'memory_report': roll.memory_monitor.memory_report}
+
+    @property
+    def workers(self):
+        '''
+        Number of worker processes.
+        '''
+        return self._workers
+
+    @property
+    def steal_pages(self):
+        '''
+        Minimum of pages that a worker steals from another.
+        '''
+        return self._steal_pages
+
+    @property
+    def is_active(self):
+        '''
+        :return: boolean.
+
+        Property that indicates if the scheduler is active (more than \
+        one worker defined in the constructor).
+        '''
+        return self._workers > 1
+
+    @property
+    def report(self):
+        '''
+        :return: dictionary with the workers, the pages, the cost of a \
+            page, the predicted and the actual completion time, the \
+            number of tasks and of steals, the bytes of the batches \
+            of entries transferred and the peak of bytes of the batches \
+            buffered out of order (after :meth:`run \
+            <.RollScheduler.run>`).
+        '''
+        return self._report
+
+    def __init__(self, *args, **kwargs):
+        try:
+            self._workers = int(kwargs.get('workers', None) or 1)
+            self._steal_pages = max(
+                int(kwargs.get('steal_pages', None) or 4), 1)
+        except (TypeError, ValueError):
+            raise TypeError('workers and steal_pages must be integers.')
+        if self._workers < 1:
+            raise TypeError('workers must be at least 1.')
+        self._report = {}
@@ -0,0 +1,677 @@
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+from datetime import datetime as dt
+from collections import deque
+import socketserver
+import multiprocessing
+import threading
+import itertools
+import queue
+import json
+import os
+import io
+
+from serveliza import __version__
+from .roll import ElectoralRoll
+from .layouts import detect_layout
+
+
+#: blank pdf file (one empty page) used to warm up the workers.
+WARM_PDF = b'%PDF-1.4\n1 0 obj<</Type/Catalog/Pages 2 0 R>>endobj\n' \
+    b'2 0 obj<</Type/Pages/Kids[3 0 R]/Count 1>>endobj\n' \
+    b'3 0 obj<</Type/Page/Parent 2 0 R/MediaBox[0 0 612 792]>>' \
+    b'endobj\ntrailer<</Root 1 0 R>>\n%%EOF\n'
+
+#: adapted sheet (header and one entry) parsed to warm up the workers.
+WARM_SHEET = '\n'.join([
+    'REGISTROS:', '1', 'REPUBLICA DE CHILE',
+    'PADRON ELECTORAL AUDITADO \t ELECCIONES MUNICIPALES 2016',
+    'SERVICIO ELECTORAL',
+    'REGION \t : DE MAGALLANES Y ANTARTICA CH.            \t COMUNA: \t '
+    'ANTARTICA \t PAGINA 1 de 1',
+    'PROVINCIA \t : ANTARTICA CHILENA                       ',
+    'NOMBRE \t C.IDENTIDAD SEXO \t DOMICILIO ELECTORAL \t '
+    'CIRCUNSCRIPCIÓN \t MESA',
+    'PEREZ PEREZ JUAN \t 1.111.111-1 VAR \t CALLE 1 \t ANTARTICA \t 1 M'])
+
+#: results queue and options of the worker processes, set in each \
+#: worker process by :func:`init_server_worker`.
+RESULTS, OPTIONS = None, None
+
+
+def init_server_worker(results, options):
+    '''
+    :param obj results: queue of the messages to the main process.
+    :param dict options: options of the rolls (see :attr:`options \
+        <.RollServer.options>`).
+
+    Initializer of the worker processes of :class:`RollServer \
+    <.RollServer>`. It keeps the queue and the options, warms up the \
+    worker (see :func:`warm_worker <.warm_worker>`) and puts a *warm* \
+    message in the queue.
+    '''
+    global RESULTS, OPTIONS
+    RESULTS, OPTIONS = results, options
+    RESULTS.put(('warm', None, warm_worker(options)))
+
+
+def warm_worker(options):
+    '''
+    :param dict options: options of the rolls.
+    :return: id of the worker process.
+
+    Loads in the worker process what the requests reuse: the modules of \
+    the processor (rendering a blank page), the compiled regular \
+    expressions of the parsers and the layouts and the DPA fixture \
+    (parsing :data:`WARM_SHEET <.WARM_SHEET>`). A failure of the warm up \
+    is left to the requests.
+    '''
+    try:
+        roll = RollStreamer(WARM_PDF, **options)
+        pdf = roll.process_pdf(io.BytesIO(WARM_PDF))
+        for sheet in pdf:
+            roll.inner_class_adapter(
+                roll.process_pdf_page(sheet), roll.processor)
+        del pdf
+        roll.close_pdf()
+        parser_class = detect_layout(WARM_SHEET) or roll.inner_class_parser
+        parser_class(WARM_SHEET, fields=roll.projection)
+    except Exception:
+        pass
+    return os.getpid()
+
+
+def serve_task(task_id, source, name=None):
+    '''
+    :param int task_id: id of the request.
+    :param source: path of the source (pdf file, archive or directory) \
+        or the content of a pdf file (bytes).
+    :param str name: name of the pdf file sent by its content.
+
+    Function executed in the worker processes. It runs a \
+    :class:`RollStreamer <.RollStreamer>` on the source and puts in the \
+    results queue a *start* message, a *sheet* message with the lines of \
+    each parsed sheet and an *end* message with the metadata of the \
+    files and the rolls (or an *error* message).
+    '''
+    RESULTS.put(('start', task_id, os.getpid(), dt.now()))
+    if isinstance(source, bytes) and name:
+        source = io.BytesIO(source)
+        source.name = name
+    try:
+        roll = RollStreamer(
+            source, emit=lambda x: RESULTS.put(('sheet', task_id, x)),
+            **OPTIONS)
+        roll.run()
+        metadata = roll.metadata
+        RESULTS.put(('end', task_id, {
+            'files': metadata['files'], 'rolls': metadata['rolls']}))
+    except Exception as error:
+        RESULTS.put(('error', task_id, f'{type(error).__name__}: {error}'))
+
+
+def get_latency_stats(samples):
+    '''
+    :param list samples: latencies in seconds.
+    :return: dictionary with the count, mean, median (*p50*), 95th \
+        percentile (*p95*) and maximum of the latencies.
+    '''
+    samples = sorted(samples)
+    if not samples:
+        return {'count': 0}
+    return {
+        'count': len(samples), 'mean': sum(samples) / len(samples),
+        'p50': samples[(len(samples) - 1) // 2],
+        'p95': samples[int((len(samples) - 1) * 0.95)],
+        'max': samples[-1]}
+
+
+class RollStreamer(ElectoralRoll):
+    '''
+    :param source: source of the electoral roll (see :attr:`source \
+        <.ElectoralRoll.source>`).
+    :param func emit: function that receives the lines of each parsed \
+        sheet.
+
+    :class:`RollStreamer <.RollStreamer>` is an :class:`ElectoralRoll \
+    <.ElectoralRoll>` that passes the entries and errors of each sheet \
+    to *emit* as soon as the sheet is parsed (with the same flow, engines \
+    and options), without memorizing or exporting them. Each line is a \
+    dictionary with its *type* (*entry* or *error*), the file, the page \
+    and the entry (by field) or the error. It is run by the workers of \
+    :class:`RollServer <.RollServer>`.
+
+    >>> roll = RollStreamer('/path/to/file.pdf', emit=print)
+    >>> roll.run()
+    [{'type': 'entry', 'file': 'file.pdf', 'page': 1, 'entry': {...}}, ...]
+    '''
+
+    def sheet_store(self, file, parsed, file_metadata):
+        '''
+        :param dict file: data of file.
+        :param obj parsed: instance of :class:`RollParser <.RollParser>`.
+        :param dict file_metadata: metadata of the file in progress.
+        :return: metadata of the file updated with the parsed sheet.
+
+        Stores a parsed sheet (see :meth:`ElectoralRoll.sheet_store \
+        <.ElectoralRoll.sheet_store>`) and emits its lines.
+        '''
+        file_metadata = super().sheet_store(file, parsed, file_metadata)
+        page = self._pages[file['name']] = self._pages.get(
+            file['name'], 0) + 1
+        if self._emit is not None and not parsed.is_filtered:
+            line = {'file': file['name'], 'page': page}
+            fields = parsed.fields
+            self._emit([
+                {'type': 'entry', **line, 'entry': dict(zip(fields, x))}
+                for x in parsed.entries] + [
+                {'type': 'error', **line, 'error': x}
+                for x in parsed.errors])
+        return file_metadata
+
+    def __init__(self, source, emit=None, *args, **kwargs):
+        self._emit, self._pages = emit, {}
+        kwargs.update({'verbose': False, 'memorize': False,
+                       'export': False})
+        super().__init__(source, *args, **kwargs)
+
+
+class RollServerHandler(BaseHTTPRequestHandler):
+    '''
+    Handler of the requests to :class:`RollServer <.RollServer>`:
+
+    * *POST /roll*: extracts a pdf file sent in the body (its content, \
+      named by the *name* parameter of the query, or a json object with \
+      its *path*) and streams the lines of \
+      :meth:`RollServer.extract <.RollServer.extract>` in NDJSON.
+    * *GET /metrics*: returns the :attr:`metrics <.RollServer.metrics>` \
+      in json.
+    '''
+
+    server_version = f'serveliza/{__version__}'
+
+    def do_GET(self):
+        if urlparse(self.path).path != '/metrics':
+            return self.send_json(404, {'error': 'not found'})
+        self.send_json(200, self.server.roll_server.metrics)
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != '/roll':
+            return self.send_json(404, {'error': 'not found'})
+        name = parse_qs(url.query).get('name', [None])[0]
+        try:
+            length = int(self.headers.get('Content-Length'))
+        except (TypeError, ValueError):
+            return self.send_json(411, {'error': 'length required'})
+        body = self.rfile.read(length)
+        source = body
+        if 'json' in (self.headers.get('Content-Type') or ''):
+            try:
+                source = json.loads(body.decode('utf-8'))['path']
+            except (ValueError, KeyError, TypeError):
+                return self.send_json(400, {
+                    'error': 'the body must be a json object with a path.'})
+        try:
+            lines = self.server.roll_server.extract(source, name)
+        except RuntimeError as error:
+            return self.send_json(503, {'error': str(error)})
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson')
+        self.end_headers()
+        try:
+            for chunk in lines:
+                self.wfile.write(''.join([
+                    json.dumps(x, ensure_ascii=False, default=str) + '\n'
+                    for x in chunk]).encode('utf-8'))
+        except (BrokenPipeError, ConnectionResetError):
+            lines.close()
+
+    def send_json(self, status, data):
+        '''
+        :param int status: status code of the response.
+        :param dict data: content of the response.
+        '''
+        body = json.dumps(data, default=str).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def address_string(self):
+        if isinstance(self.client_address, tuple):
+            return super().address_string()
+        return 'unix'
+
+    def log_message(self, format, *args):
+        if self.server.roll_server.verbose:
+            super().log_message(format, *args)
+
+
+class RollThreadingHTTPServer(socketserver.ThreadingMixIn, HTTPServer):
+    '''
+    HTTP server of :class:`RollServer <.RollServer>` on a TCP port (each \
+    request in a thread).
+    '''
+    daemon_threads = True
+
+
+class RollThreadingUnixServer(socketserver.ThreadingMixIn,
+                              socketserver.UnixStreamServer):
+    '''
+    HTTP server of :class:`RollServer <.RollServer>` on a unix socket \
+    (each request in a thread).
+    '''
+    daemon_threads = True
+
+
+class RollServer:
+    '''
+    :param str host: host of the HTTP server (default '127.0.0.1').
+    :param int port: port of the HTTP server (default 8000, 0 takes a \
+        free port).
+    :param str socket: path of a unix socket to listen instead of the \
+        port (default None).
+    :param int workers: number of worker processes (default the number \
+        of CPUs).
+    :param int max_queue: maximum of requests waiting for a worker, the \
+        next ones are rejected (default 64).
+    :param bool verbose: prints the address and the requests (default \
+        False).
+    :param str processor: processor of the pdf files (see \
+        :class:`ElectoralRoll <.ElectoralRoll>`).
+    :param str parser: parser of the sheets.
+    :param str engine: engine to parse the entries.
+    :param list fields: fields to extract from each entry.
+
+    :class:`RollServer <.RollServer>` is a local extraction service (only \
+    with the standard library) that avoids the startup of the \
+    application in each file:
+
+    * A pool of worker processes is started and warmed up once (see \
+      :func:`warm_worker <.warm_worker>`), keeping the processor, the \
+      compiled regular expressions and the DPA fixture loaded.
+    * Each request (a pdf file by its path or its content) is run by a \
+      worker with a :class:`RollStreamer <.RollStreamer>`, which sends \
+      the entries and errors of each sheet as soon as it is parsed, so \
+      they are streamed to the client in NDJSON, ending with the \
+      metadata of the files and the rolls (see :meth:`extract \
+      <.RollServer.extract>`).
+    * The depth of the queue, the requests in progress, completed, \
+      failed and rejected, and the latencies (waiting for a worker, \
+      running and total) are reported in :attr:`metrics \
+      <.RollServer.metrics>` (*GET /metrics*).
+
+    If a worker crashes, its requests fail and the pool is started \
+    again (with a new queue of results, since the crashed worker could \
+    leave the previous one locked). It is served on a TCP port or a \
+    unix socket (see :class:`RollServerHandler <.RollServerHandler>`).
+
+    >>> server = RollServer(port=8000, workers=4)
+    >>> server.serve()
+
+    .. code-block:: bash
+
+        curl --data-binary @file.pdf http://127.0.0.1:8000/roll?name=a.pdf
+        curl -d '{"path": "/path/to/file.pdf"}' \\
+            -H 'Content-Type: application/json' \\
+            http://127.0.0.1:8000/roll
+        curl http://127.0.0.1:8000/metrics
+    '''
+
+    #: options of the rolls that can be defined in the constructor.
+    roll_options = ('processor', 'parser', 'engine', 'fields')
+
+    #: number of latencies kept to compute the metrics.
+    latency_samples = 1000
+
+    #: seconds to wait for the workers to warm up.
+    warm_timeout = 60
+
+    #: seconds that a dispatcher waits for a message before checking if \
+    #: its pool was stopped.
+    dispatch_timeout = 1
+
+    def start(self):
+        '''
+        Starts the pool of workers (and waits for them to warm up).
+        '''
+        self.start_pool()
+        self._started = dt.now()
+
+    def start_pool(self):
+        '''
+        Starts a pool of workers with its own results queue and the thread \
+        that dispatches their messages, and waits for the workers to warm \
+        up (an empty task is submitted to each one, so all of them are \
+        started before the first request).
+        '''
+        with self._ready:
+            self._warm = set()
+        results, stopped = multiprocessing.Queue(), threading.Event()
+        dispatcher = threading.Thread(
+            target=self.dispatch, args=(results, stopped),
+            name='roll-server-dispatcher', daemon=True)
+        dispatcher.start()
+        executor = ProcessPoolExecutor(
+            max_workers=self.workers, initializer=init_server_worker,
+            initargs=(results, self.options))
+        self._pool = (executor, results, dispatcher, stopped)
+        self._executor, self._broken = executor, False
+        for future in [executor.submit(os.getpid)
+                       for _ in range(self.workers)]:
+            future.result()
+        with self._ready:
+            self._ready.wait_for(lambda: len(self._warm) >= self.workers,
+                                 timeout=self.warm_timeout)
+
+    def stop_pool(self, wait=True):
+        '''
+        :param bool wait: waits for the requests in progress and the \
+            dispatcher (default True).
+
+        Stops the pool of workers and its dispatcher. Without waiting \
+        (eg: when a worker crashed, and the queue may be left locked by \
+        it), the dispatcher ends when its queue is empty.
+        '''
+        executor, results, dispatcher, stopped = self._pool
+        executor.shutdown(wait=wait)
+        stopped.set()
+        if wait:
+            results.put(None)
+            dispatcher.join()
+        self._pool, self._executor = None, None
+
+    def restart_pool(self, executor):
+        '''
+        :param obj executor: broken pool of workers.
+        :raises RuntimeError: the pool of workers can not be started.
+
+        Starts the pool of workers again, unless another request already \
+        did it. It does not hold the lock of the requests, so the \
+        messages of the other requests are still dispatched.
+        '''
+        with self._restarting:
+            if self._executor is not executor:
+                return None
+            self.stop_pool(wait=False)
+            try:
+                self.start_pool()
+            except BrokenProcessPool as error:
+                self._broken = True
+                raise RuntimeError(
+                    f'the pool of workers can not be started: {error}')
+            with self._lock:
+                self._counts['restarts'] += 1
+
+    def extract(self, source, name=None):
+        '''
+        :param source: path of the source (pdf file, archive or \
+            directory) or the content of a pdf file (bytes).
+        :param str name: name of the pdf file sent by its content \
+            (default *buffer-0.pdf*).
+        :return: generator of lists of lines (dictionaries): the *entry* \
+            and *error* lines of each sheet (see :class:`RollStreamer \
+            <.RollStreamer>`), and a *metadata* line with the metadata \
+            of the files and the rolls, the worker and the latencies \
+            (or a *failure* line with the reason).
+        :raises RuntimeError: the queue of the server is full or the \
+            pool of workers can not be started.
+
+        Submits a request to the pool of workers. If the pool is broken \
+        (a worker crashed, also while it was idle) it is started again \
+        and the request is submitted to the new one. The request is \
+        counted only once it is submitted.
+        '''
+        for _ in range(2):
+            executor = self._executor
+            if self._broken:
+                self.restart_pool(executor)
+                executor = self._executor
+            with self._lock:
+                if self._counts['queued'] >= self.max_queue:
+                    self._counts['rejected'] += 1
+                    raise RuntimeError('the queue of the server is full.')
+                task_id = next(self._ids)
+                try:
+                    future = executor.submit(
+                        serve_task, task_id, source, name)
+                except (BrokenProcessPool, RuntimeError):
+                    future = None
+                else:
+                    stream = queue.Queue()
+                    self._tasks[task_id] = {
+                        'submitted': dt.now(), 'started': None,
+                        'stream': stream}
+                    self._counts['queued'] += 1
+            if future is not None:
+                future.add_done_callback(
+                    lambda x: self.check_task(task_id, x, executor))
+                return self.stream(stream)
+            self.restart_pool(executor)
+        raise RuntimeError('the pool of workers can not be started.')
+
+    def stream(self, stream):
+        '''
+        :param obj stream: queue of the messages of a request.
+        :return: generator of lists of lines of the request.
+        '''
+        while True:
+            kind, data = stream.get()
+            if kind == 'sheet':
+                yield data
+                continue
+            yield [data]
+            break
+
+    def dispatch(self, results, stopped):
+        '''
+        :param obj results: queue of the messages of a pool of workers.
+        :param obj stopped: event set when the pool is stopped.
+
+        Receives the messages of the workers of a pool (until None, or \
+        until the pool is stopped and its queue is empty) and passes them \
+        to the stream of their requests, updating the metrics. Only the \
+        messages of the requests take the lock of the requests.
+        '''
+        while True:
+            try:
+                message = results.get(timeout=self.dispatch_timeout)
+            except queue.Empty:
+                if stopped.is_set():
+                    break
+                continue
+            if message is None:
+                break
+            kind, task_id, data = message[0], message[1], message[2:]
+            if kind == 'warm':
+                with self._ready:
+                    self._warm.add(data[0])
+                    self._ready.notify_all()
+                continue
+            with self._lock:
+                task = self._tasks.get(task_id)
+                if task is None:
+                    continue
+                if kind == 'start':
+                    task['pid'], task['started'] = data
+                    self._counts['queued'] -= 1
+                    self._counts['running'] += 1
+                elif kind == 'sheet':
+                    task['stream'].put(('sheet', data[0]))
+                else:
+                    self.finish(task_id, kind, data[0])
+
+    def check_task(self, task_id, future, executor):
+        '''
+        :param int task_id: id of the request.
+        :param obj future: future of the request.
+        :param obj executor: pool of workers of the request.
+
+        Fails the request if its worker crashed (and marks the pool to \
+        be started again, if it is the current one).
+        '''
+        error = future.exception()
+        if error is None:
+            return None
+        with self._lock:
+            if isinstance(error, BrokenProcessPool) and \
+                    executor is self._executor:
+                self._broken = True
+            if task_id in self._tasks:
+                self.finish(task_id, 'error',
+                            f'{type(error).__name__}: {error}')
+
+    def finish(self, task_id, kind, data):
+        '''
+        :param int task_id: id of the request.
+        :param str kind: *end* or *error*.
+        :param data: metadata of the request or the reason of the error.
+
+        Ends the stream of a request with its *metadata* or *failure* \
+        line and adds its latencies to the metrics.
+        '''
+        task = self._tasks.pop(task_id)
+        now = dt.now()
+        if task['started'] is None:
+            self._counts['queued'] -= 1
+            task['started'] = now
+        else:
+            self._counts['running'] -= 1
+        latency = {'wait': task['started'] - task['submitted'],
+                   'service': now - task['started'],
+                   'total': now - task['submitted']}
+        latency = {x: y.total_seconds() for x, y in latency.items()}
+        self._latencies['wait'].append(latency['wait'])
+        if kind == 'end':
+            self._counts['completed'] += 1
+            self._latencies['service'].append(latency['service'])
+            self._latencies['total'].append(latency['total'])
+            line = {'type': 'metadata', **data, 'pid': task.get('pid'),
+                    'latency': latency}
+        else:
+            self._counts['failed'] += 1
+            line = {'type': 'failure', 'reason': data, 'latency': latency}
+        task['stream'].put((kind, line))
+
+    def listen(self):
+        '''
+        :return: HTTP server (bound to the port or the unix socket, a \
+            port 0 is replaced by the port taken).
+        '''
+        if self.socket:
+            if os.path.exists(self.socket):
+                os.unlink(self.socket)
+            httpd = RollThreadingUnixServer(self.socket, RollServerHandler)
+        else:
+            httpd = RollThreadingHTTPServer(
+                (self.host, self.port), RollServerHandler)
+            self.port = httpd.server_address[1]
+        httpd.roll_server = self
+        return httpd
+
+    def serve(self):
+        '''
+        Starts the workers and serves the requests until it is \
+        interrupted.
+        '''
+        self.start()
+        httpd = self.listen()
+        if self.verbose:
+            print(f'Serving on {self.address} ({len(self._warm)} workers '
+                  'warmed up)')
+        try:
+            httpd.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            httpd.server_close()
+            self.close()
+
+    def close(self):
+        '''
+        Stops the pool of workers and the dispatcher (and removes the \
+        unix socket).
+        '''
+        if self._pool is not None:
+            self.stop_pool(wait=not self._broken)
+        if self.socket and os.path.exists(self.socket):
+            os.unlink(self.socket)
+
+    @property
+    def options(self):
+        '''
+        :return: dictionary with the options of the rolls of the \
+            requests.
+        '''
+        return self._options
+
+    @property
+    def metrics(self):
+        '''
+        :return: dictionary with the workers (and those warmed up), the \
+            depth of the queue, the requests in progress, completed, \
+            failed and rejected, the restarts of the pool, the uptime and \
+            the statistics of the latencies in seconds (waiting for a \
+            worker, running and total, see :func:`get_latency_stats \
+            <.get_latency_stats>`).
+
+        >>> server.metrics
+        {'workers': 4, 'warm': 4, 'queue_depth': 0, 'in_progress': 1, \
+         'completed': 10, 'failed': 0, 'rejected': 0, 'restarts': 0, \
+         'max_queue': 64, 'uptime': 120.5, 'latency': {'wait': {\
+         'count': 10, 'mean': 0.001, 'p50': 0.001, 'p95': 0.002, \
+         'max': 0.002}, 'service': {...}, 'total': {...}}}
+        '''
+        with self._lock:
+            counts = dict(self._counts)
+            latencies = {x: list(y) for x, y in self._latencies.items()}
+        uptime = (dt.now() - self._started).total_seconds() \
+            if self._started else None
+        return {
+            'workers': self.workers, 'warm': len(self._warm),
+            'queue_depth': counts['queued'],
+            'in_progress': counts['running'],
+            'completed': counts['completed'], 'failed': counts['failed'],
+            'rejected': counts['rejected'], 'restarts': counts['restarts'],
+            'max_queue': self.max_queue, 'uptime': uptime,
+            'latency': {x: get_latency_stats(y)
+                        for x, y in latencies.items()}}
+
+    @property
+    def address(self):
+        '''
+        Address where the server listens (unix socket or host and port).
+        '''
+        return self.socket or f'{self.host}:{self.port}'
+
+    def __init__(self, *args, **kwargs):
+        self.host = kwargs.get('host', None) or '127.0.0.1'
+        self.socket = kwargs.get('socket', None)
+        self.verbose = bool(kwargs.get('verbose', False))
+        try:
+            self.port = int(kwargs.get('port', 8000))
+            self.workers = int(kwargs.get('workers', None) or
+                               os.cpu_count() or 1)
+            self.max_queue = int(kwargs.get('max_queue', None) or 64)
+        except (TypeError, ValueError):
+            raise TypeError('port, workers and max_queue must be integers.')
+        if self.workers < 1 or self.max_queue < 1:
+            raise TypeError('workers and max_queue must be positive.')
+        self._options = {x: kwargs[x] for x in self.roll_options
+                         if kwargs.get(x, None) is not None}
+        RollStreamer(WARM_PDF, **self._options)
+        self._lock, self._ready = threading.Lock(), threading.Condition()
+        self._restarting = threading.Lock()
+        self._ids = itertools.count(1)
+        self._tasks = {}
+        self._counts = {x: 0 for x in [
+            'queued', 'running', 'completed', 'failed', 'rejected',
+            'restarts']}
+        self._latencies = {x: deque(maxlen=self.latency_samples)
+                           for x in ['wait', 'service', 'total']}
+        self._pool, self._executor = None, None
+        self._started, self._warm, self._broken = None, set(), False
@@ -0,0 +1,202 @@
+from datetime import datetime as dt
+from pathlib import Path
+import threading
+import json
+import os
+
+
+class RollTracer:
+    '''
+    :param str trace: path of the json file where the spans are written \
+        (default None, the tracer is not active).
+
+    :class:`RollTracer <.RollTracer>` records a span for the run, each \
+    file and each page, the stages of the flow (*processing*, \
+    *adapting*, *parsing*, *memorizing* and *exporting*) and the steps \
+    of the parser (*header*, *fields*, *entries* and *rescue*, laid out \
+    from the durations measured by the parser), with attributes as the \
+    entries, errors and length of the text. The spans are written in \
+    the `Chrome trace event`_ format (complete events, in microseconds), \
+    which can be opened in *chrome://tracing* or `Perfetto`_: the spans \
+    of each thread of the pipeline and of each worker process of the \
+    scheduler are shown in their own track.
+
+    When it is not active, the flow only checks :attr:`is_active \
+    <.RollTracer.is_active>` once per stage. It is instantiated within \
+    an instance of :class:`ElectoralRoll <.ElectoralRoll>`.
+
+    >>> roll = ElectoralRoll(source='/path/to/dir', trace='trace.json')
+    >>> roll.run()
+    >>> roll.metadata['analysis']['trace']
+    '/path/to/trace.json'
+
+    .. _Chrome trace event: https://docs.google.com/document/d/\
+        1CvAClvFfyA5R-PhYUmn5OOQtYMH4h6I0nSsKchNAySU
+    .. _Perfetto: https://ui.perfetto.dev
+    '''
+
+    #: steps of the parser (keys of its times, see :attr:`RollParser.\
+    #: metadata <.RollParser.metadata>`).
+    parser_steps = ('header', 'fields', 'entries')
+
+    def start(self, origin=None):
+        '''
+        :param obj origin: datetime of the origin of the timestamps \
+            (default now).
+
+        Starts the trace.
+        '''
+        self._origin, self._events, self._threads = origin or dt.now(), \
+            [], {}
+
+    def add(self, name, category, start, duration, args=None, pid=None,
+            tid=None):
+        '''
+        :param str name: name of the span.
+        :param str category: category of the span (*run*, *file*, \
+            *page*, *stage* or *parser*).
+        :param obj start: datetime of the start.
+        :param obj duration: timedelta of the span.
+        :param dict args: attributes of the span.
+        :param int pid: process of the span (default the current).
+        :param tid: thread of the span (default the current).
+        '''
+        if tid is None:
+            thread = threading.current_thread()
+            tid = thread.ident
+            self._threads[(os.getpid(), tid)] = thread.name
+        self._events.append((name, category, start, duration, args,
+                             pid or os.getpid(), tid))
+
+    def add_stage(self, file, stage, start, duration, result, **kwargs):
+        '''
+        :param str file: name of the file.
+        :param str stage: name of the stage.
+        :param obj start: datetime of the start.
+        :param obj duration: timedelta of the stage.
+        :param obj result: result of the stage (eg: the adapter or the \
+            parsed sheet).
+
+        Adds the span of a stage with the attributes of its result (the \
+        length of the adapted text or the entries and errors of the \
+        parsed sheets) and the steps of the parser.
+        '''
+        args = {'file': file}
+        if stage == 'adapting' and isinstance(
+                getattr(result, 'sheet', None), str):
+            args['length'] = len(result.sheet)
+        elif stage == 'parsing':
+            sheets = result if isinstance(result, list) else [result]
+            args['entries'] = sum([len(x.entries) for x in sheets])
+            args['errors'] = sum([len(x.errors) for x in sheets])
+            if not isinstance(result, list):
+                self.add_parser(result, start, **kwargs)
+        self.add(stage, 'stage', start, duration, args, **kwargs)
+
+    def add_parser(self, parsed, start, **kwargs):
+        '''
+        :param obj parsed: parsed sheet (see :class:`RollParser \
+            <.RollParser>`).
+        :param obj start: datetime of the start of the parsing.
+
+        Adds the spans of the steps of the parser one after the other \
+        (the rescue of malformed lines at the end of the entries).
+        '''
+        times = parsed.metadata.get('times', {})
+        for step in self.parser_steps:
+            if step not in times:
+                continue
+            self.add(step, 'parser', start, times[step], **kwargs)
+            start += times[step]
+        if times.get('rescue') and 'entries' in times:
+            self.add('rescue', 'parser', start - times['rescue'],
+                     times['rescue'], {'rescued': parsed.metadata.get(
+                         'entries', {}).get('rescue', 0)}, **kwargs)
+
+    def add_task(self, file, result):
+        '''
+        :param str file: name of the file.
+        :param dict result: result of a task of a worker process (see \
+            :func:`run_task <.run_task>`).
+
+        Adds the spans of the task, its pages and their stages in the \
+        track of the worker process.
+        '''
+        pid, tid = result['pid'], 'worker'
+        self._threads[(pid, tid)] = f'worker {pid}'
+        self.add('task', 'file', result['init'], result['elapsed'],
+                 {'file': file, 'start': result['start'],
+                  'end': result['end']}, pid=pid, tid=tid)
+        stages = ['processing', 'adapting', 'parsing']
+        for idx, (parsed, timing) in enumerate(
+                zip(result['sheets'], result['timings'])):
+            *marks, length = timing
+            counts = {'entries': len(parsed.entries),
+                      'errors': len(parsed.errors)}
+            self.add('page', 'page', marks[0], marks[-1] - marks[0],
+                     {'file': file, 'page': result['start'] + idx + 1,
+                      'length': length, **counts}, pid=pid, tid=tid)
+            for stage, start, end in zip(stages, marks, marks[1:]):
+                args = {'file': file, **(counts if stage == 'parsing' else {})}
+                self.add(stage, 'stage', start, end - start, args, pid=pid,
+                         tid=tid)
+            self.add_parser(parsed, marks[2], pid=pid, tid=tid)
+
+    def export(self):
+        '''
+        :return: absolute path of the json file (or None).
+
+        Writes the spans in the Chrome trace event format.
+        '''
+        if not self.is_active or self._origin is None:
+            return None
+        events = []
+        for (pid, tid), name in self._threads.items():
+            events.append({'name': 'thread_name', 'ph': 'M', 'pid': pid,
+                           'tid': tid, 'args': {'name': name}})
+        for name, category, start, duration, args, pid, tid in \
+                self._events:
+            event = {
+                'name': name, 'cat': category, 'ph': 'X',
+                'ts': int((start - self._origin).total_seconds() * 1e6),
+                'dur': int(duration.total_seconds() * 1e6),
+                'pid': pid, 'tid': tid}
+            if args:
+                event['args'] = args
+            events.append(event)
+        path = Path(self.trace)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with path.open('w', encoding='utf-8') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f,
+                      ensure_ascii=False, default=str)
+        return str(path.absolute())
+
+    @property
+    def trace(self):
+        '''
+        Path of the json file of the trace.
+        '''
+        return self._trace
+
+    @property
+    def is_active(self):
+        '''
+        :return: boolean.
+
+        Property that indicates if the tracer is active (a *trace* path \
+        defined in the constructor).
+        '''
+        return self._trace is not None
+
+    @property
+    def events(self):
+        '''
+        :return: list of recorded spans (name, category, start, duration, \
+            attributes, process and thread).
+        '''
+        return self._events
+
+    def __init__(self, *args, **kwargs):
+        trace = kwargs.get('trace', None)
+        self._trace = str(trace) if trace else None
+        self._origin, self._events, self._threads = None, [], {}
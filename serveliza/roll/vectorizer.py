@@ -0,0 +1,242 @@
+import re
+import numpy as np
+from pandas import pandas as pd
+
+
+class RollVectorizer:
+    '''
+    :param str engine: Engine to parse the entries: *sheet* (default) \
+        parses them line by line in each sheet, *vectorized* parses all \
+        entries of a file at once.
+
+    :class:`RollVectorizer <.RollVectorizer>` is an alternative engine \
+    to parse the entries for batch workloads. The pages of a file are \
+    processed and adapted, their headers and fields are parsed by the \
+    parser of :class:`ElectoralRoll <.ElectoralRoll>` and then the well \
+    composed lines of every page are gathered in one pandas Series.
+
+    The fields of all lines are extracted with a single vectorized \
+    *str.extract* over a pattern that combines the regular expressions \
+    of :attr:`RollParser.regexs_entries <.RollParser.regexs_entries>` \
+    in the order of the line (each one is searched from the end of the \
+    previous one, see :meth:`combine <.RollVectorizer.combine>`). The \
+    circunscription and the electoral domicile are \
+    derived from the spans of the sex and the table with vectorized \
+    operations. Lines with missing values (that the parser would report \
+    as errors) are parsed by :meth:`RollParser.parse_entry \
+    <.RollParser.parse_entry>` and malformed lines are rescued by the \
+    parser, so the result matches the *sheet* engine. It is \
+    instantiated within an instance of :class:`ElectoralRoll \
+    <.ElectoralRoll>`.
+
+    >>> roll = ElectoralRoll(source='/path/to/dir', engine='vectorized')
+    '''
+
+    #: engines to parse the entries.
+    engines = ['sheet', 'vectorized']
+
+    def run_sheets(self, roll, file, pdf, files):
+        '''
+        :param obj roll: instance of :class:`ElectoralRoll <.ElectoralRoll>`.
+        :param dict file: data of file.
+        :param obj pdf: processed pdf file (iterable of pages).
+        :param tuple files: number of the file and total of files.
+        :return: metadata of the file.
+
+        Processes and adapts all pages of the file, parses them at once \
+        with :meth:`parse_sheets <.RollVectorizer.parse_sheets>` and \
+        memorizes and exports each parsed sheet in order.
+        '''
+        total_sheets = len(pdf)
+        sheets = []
+        for idx, sheet in enumerate(pdf):
+            roll.printer.run_file_progress(roll.get_progress(
+                None, files, (idx + 1, total_sheets)))
+            sheets.append(roll.sheet_process(file, sheet))
+        parsers = roll.run_stage(
+            file['name'], 'parsing', self.parse_sheets,
+            [roll.inner_class_parser, sheets, roll.projection,
+             roll.place_filter])
+        file_metadata = {}
+        for parsed in parsers:
+            file_metadata = roll.sheet_store(file, parsed, file_metadata)
+        return file_metadata
+
+    def parse_sheets(self, parser_class, sheets, fields=None,
+                     place_filter=None):
+        '''
+        :param class parser_class: class of the parser (see \
+            :class:`RollParser <.RollParser>`).
+        :param list sheets: adapted sheets of a file.
+        :param tuple fields: fields of the projection (see \
+            :attr:`RollParser.projection <.RollParser.projection>`).
+        :param obj place_filter: filter of places (see \
+            :attr:`RollParser.place_filter <.RollParser.place_filter>`).
+        :return: list of parsed sheets (instances of the parser).
+
+        Parses the header and fields of each sheet and the entries of all \
+        sheets at once (see :meth:`parse_lines \
+        <.RollVectorizer.parse_lines>`). Lines that are not parsed are \
+        passed to the parser of their sheet.
+        '''
+        parsers, splits, owners, lines = [], [], [], []
+        for idx, sheet in enumerate(sheets):
+            parser = parser_class(sheet, auto=False, fields=fields,
+                                  place_filter=place_filter)
+            parser.run(entries=False)
+            split = parser.split_entries() if parser.fields_index and \
+                not parser.is_filtered else None
+            if split:
+                owners += [idx] * len(split[0])
+                lines += split[0]
+            parsers.append(parser)
+            splits.append(split)
+        values = iter(self.parse_lines(parsers, owners, lines))
+        for parser, split in zip(parsers, splits):
+            if split is None:
+                continue
+            lines, groups, orphans = split
+            if lines and 'nulls' not in parser.metadata:
+                parser.metadata['nulls'] = {'total': 0}
+            entries = []
+            for line in lines:
+                entry = next(values)
+                if entry:
+                    entry = parser.complete_entry(entry)
+                else:
+                    entry = parser.parse_entry(line)
+                if entry:
+                    entries.append(entry)
+            parser.store_entries(entries, groups, orphans)
+        return parsers
+
+    def parse_lines(self, parsers, owners, lines):
+        '''
+        :param list parsers: parsed sheets (without entries).
+        :param list owners: index of the sheet of each line.
+        :param list lines: well composed lines of all sheets.
+        :return: list with the direct values of each line (*name*, *rut*, \
+            *sex*, *domicile*, *circunscription* and *table*) or None for \
+            lines that must be parsed by the parser.
+        '''
+        if not lines:
+            return []
+        limit = parsers[0].max_line_length
+        series = pd.Series([x if len(x) <= limit else '' for x in lines],
+                           dtype=object)
+        regexs = dict(parsers[0].regexs_entries)
+        regexs['table'] = parsers[0].regex_table_prefix + regexs['table']
+        pattern, columns = self.combine(regexs)
+        extracted = series.str.extract(pattern, flags=re.S)
+        keys = ['name', 'rut', 'sex', 'table']
+        found = extracted[[columns[x][2] for x in keys]].notna().all(axis=1)
+        values, starts, offset = {}, {}, 0
+        for key in keys:
+            values[key] = extracted[columns[key][2]].str.strip()\
+                .str.replace(r'\s+', ' ', regex=True)
+            gap, match, _ = columns[key]
+            starts[key] = offset + extracted[gap].str.len()
+            offset = starts[key] + extracted[match].str.len()
+        values['ini'] = starts['sex'] + extracted[columns['sex'][1]].str.len()
+        values['position'] = starts['table']
+        circuns = pd.Series([tuple(parsers[x].circuns or ()) for x in owners])
+        values['circun'] = pd.Series(None, index=series.index, dtype=object)
+        for group in circuns[found].unique():
+            if not group:
+                continue
+            mask = found & (circuns == group)
+            values['circun'][mask] = self.parse_circuns(
+                series[mask], values['position'][mask], group)
+        values['end'] = pd.Series(np.nan, index=series.index)
+        for circun in values['circun'].dropna().unique():
+            mask = values['circun'] == circun
+            end = series[mask].str.extract(
+                '^(.*?)' + str(circun) + r'\s*' + regexs['table'],
+                flags=re.S)[0]
+            values['end'][mask] = end.str.len()
+        found = found & values['circun'].notna() & values['end'].notna()
+        columns = [values[x].tolist() for x in [
+            'name', 'rut', 'sex', 'ini', 'end', 'circun', 'table']]
+        result = []
+        for line, is_found, *value in zip(lines, found.tolist(), *columns):
+            name, rut, sex, ini, end, circun, table = value
+            direction = line[int(ini):int(end)].strip() if is_found else ''
+            result.append([name, rut, sex, direction, circun, table]
+                          if direction else None)
+        return result
+
+    @staticmethod
+    def parse_circuns(series, position, circuns):
+        '''
+        :param obj series: lines of sheets with the same circunscriptions.
+        :param obj position: position where the table starts in each line.
+        :param tuple circuns: circunscriptions of the commune.
+        :return: Series with the circunscription of each line (or None).
+
+        Vectorized version of the search of the circunscription of \
+        :meth:`RollParser.parse_entry <.RollParser.parse_entry>`: the \
+        first circunscription followed by two spaces after the cut (the \
+        position of the table minus the largest circunscription), or the \
+        only one found after the cut.
+        '''
+        cut = position - max([len(x) for x in circuns])
+        start = cut.where(cut >= 0, (series.str.len() + cut).clip(lower=0))
+        value = pd.Series(None, index=series.index, dtype=object)
+        for circun in reversed(circuns):
+            value[series.str.rfind(circun + '  ') >= start] = circun
+        hits = np.column_stack([
+            (series.str.rfind(x) >= start).to_numpy() for x in circuns])
+        single = value.isna().to_numpy() & (hits.sum(axis=1) == 1)
+        value[single] = [circuns[x] for x in hits[single].argmax(axis=1)]
+        return value
+
+    @staticmethod
+    def combine(regexs):
+        '''
+        :param dict regexs: regular expressions by key.
+        :return: tuple with the combined pattern and a dictionary with \
+            the columns extracted for each key: the text between the \
+            previous match and the match, the match and the value (the \
+            group of the regular expression if it has one, as \
+            *re.findall* returns it).
+
+        The regular expressions are searched in the order of the keys, \
+        each one from the end of the match of the previous one: a \
+        lookahead with a lazy prefix finds its first match (as \
+        *re.search* does) and backreferences consume it. A lookahead does \
+        not backtrack once it matches, so a line where a field is missing \
+        fails without trying other matches of the previous fields and the \
+        line is scanned in linear time. Lines whose fields are not found \
+        in this order do not match (and are parsed by the parser).
+        '''
+        pattern, columns = '^', {}
+        for key, regex in regexs.items():
+            number = re.compile(pattern).groups
+            value = number + 2 if re.compile(regex).groups else number + 1
+            columns[key] = (number, number + 1, value)
+            pattern += f'(?=(.*?)({regex}))(?:\\{number + 1})' \
+                f'(?:\\{number + 2})'
+        return pattern, columns
+
+    @property
+    def engine(self):
+        '''
+        Engine to parse the entries (*sheet* or *vectorized*).
+        '''
+        return self._engine
+
+    @property
+    def is_active(self):
+        '''
+        :return: boolean.
+
+        Property that indicates if the vectorized engine is active as \
+        defined in the constructor.
+        '''
+        return self._engine == 'vectorized'
+
+    def __init__(self, *args, **kwargs):
+        engine = kwargs.get('engine', None) or 'sheet'
+        if engine not in self.engines:
+            raise TypeError('engine must be: ' + ','.join(self.engines))
+        self._engine = engine
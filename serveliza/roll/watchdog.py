@@ -0,0 +1,353 @@
+from datetime import datetime as dt
+from collections import namedtuple
+import multiprocessing
+import io
+
+from serveliza.mixins.pdf import PDFProcessorMixin
+from .adapters import RollAdapter
+
+
+#: page processed and adapted by a worker of :class:`RollWatchdog \
+#: <.RollWatchdog>` (the adapted sheet, its processor and the datetimes \
+#: of the start of the processing, the start of the adapting and the end).
+RollRenderedSheet = namedtuple('RollRenderedSheet', [
+    'sheet', 'processor', 'processing_at', 'adapting_at', 'end'])
+
+
+def render_pages(conn, source, processor, pdftotext_options):
+    '''
+    :param obj conn: connection with the main process.
+    :param source: absolute path of the pdf file or its content (bytes).
+    :param str processor: processor of the pages.
+    :param dict pdftotext_options: options of pdftotext.
+
+    Function executed in the isolated worker processes of \
+    :class:`RollWatchdog <.RollWatchdog>`. It opens the pdf file and \
+    sends its number of pages, then it processes and adapts each page \
+    whose index it receives and sends back the adapted sheet with the \
+    datetimes of its stages (or the error raised), until it receives \
+    None.
+    '''
+    worker = PDFProcessorMixin()
+    worker.processor = processor
+    worker.pdftotext_options = pdftotext_options
+    if isinstance(source, bytes):
+        source = io.BytesIO(source)
+    try:
+        pdf = worker.process_pdf(source)
+        conn.send(('opened', len(pdf)))
+        while True:
+            index = conn.recv()
+            if index is None:
+                break
+            try:
+                processing_at = dt.now()
+                processed = worker.process_pdf_page(pdf[index])
+                adapting_at = dt.now()
+                sheet = RollAdapter(processed, processor).sheet
+                conn.send(('sheet', sheet, processing_at, adapting_at,
+                           dt.now()))
+            except Exception as error:
+                conn.send(('error', f'{type(error).__name__}: {error}'))
+    except EOFError:
+        pass
+    except Exception as error:
+        conn.send(('error', f'{type(error).__name__}: {error}'))
+    finally:
+        worker.close_pdf()
+        conn.close()
+
+
+class RollWatchdogPages:
+    '''
+    :param obj watchdog: instance of :class:`RollWatchdog <.RollWatchdog>`.
+    :param obj roll: instance of :class:`ElectoralRoll <.ElectoralRoll>`.
+    :param dict file: data of file.
+
+    Sequence of the pages of a pdf file opened by :meth:`RollWatchdog.open \
+    <.RollWatchdog.open>`, used by the flow in place of the pages of the \
+    processor. Its iteration yields the rendered sheets (see \
+    :class:`RollRenderedSheet <.RollRenderedSheet>`), skipping the pages \
+    that failed with both processors.
+    '''
+
+    def __len__(self):
+        return self._total
+
+    def __iter__(self):
+        for index in range(self._total):
+            rendered = self._watchdog.render(self._roll, self._file, index)
+            if rendered is not None:
+                yield rendered
+
+    def __init__(self, watchdog, roll, file, total):
+        self._watchdog, self._roll, self._file = watchdog, roll, file
+        self._total = total
+
+
+class RollWatchdog:
+    '''
+    :param float page_timeout: seconds that a page can take to be \
+        processed and adapted (default None, the watchdog is not active).
+
+    :class:`RollWatchdog <.RollWatchdog>` isolates the rendering of the \
+    pages of :class:`ElectoralRoll <.ElectoralRoll>` from the main \
+    process, so a pathological page (that makes the layout analysis of \
+    pdfminer run for minutes or crashes poppler) does not stall or kill \
+    the run:
+
+    * Each file is opened in a worker process with the processor of the \
+      run, that processes and adapts its pages one at a time (see \
+      :func:`render_pages <.render_pages>`), while the parsing, \
+      memorizing and exporting stay in the main process.
+    * A page that takes more than *page_timeout* seconds, crashes the \
+      worker or raises an error is recorded in the errors (*page-timeout*, \
+      *page-crash* or *page-error* code, with the file, the page and the \
+      processor). The worker is restarted for the next pages, and the \
+      page is retried once in a worker with the other processor (see \
+      :attr:`fallbacks <.RollWatchdog.fallbacks>`). If it fails again it \
+      is skipped and the run continues.
+    * A file that can not be opened is recorded in the same way (*file-* \
+      codes) and its pages are rendered with the other processor.
+
+    The counts of the pages, failures, retries, recovered and failed \
+    pages and the failures are added to the analysis of the metadata \
+    (and of the summary). It can not be combined with the workers of \
+    :class:`RollScheduler <.RollScheduler>`, and the stages that run in \
+    the workers are not profiled or sampled by the memory monitor. It is \
+    instantiated within an instance of :class:`ElectoralRoll \
+    <.ElectoralRoll>`.
+
+    >>> roll = ElectoralRoll(source='/path/to/dir', page_timeout=30)
+    >>> roll.run()
+    >>> roll.metadata['analysis']['watchdog']
+    {'page_timeout': 30.0, 'pages': 120, 'timeouts': 1, 'crashes': 0, \
+     'errors': 0, 'retries': 1, 'recovered': 1, 'failed': 0, \
+     'failures': [{'code': 'page-timeout', 'file': 'A.pdf', \
+     'processor': 'pdftotext', 'reason': '30.0 seconds', 'page': 7}]}
+    '''
+
+    #: processor to retry the pages that fail with each processor.
+    fallbacks = {'pdftotext': 'pdfminersix', 'pdfminersix': 'pdftotext'}
+
+    def start(self):
+        '''
+        Starts the counts of a run.
+        '''
+        self._report = {
+            'page_timeout': self.page_timeout, 'pages': 0, 'timeouts': 0,
+            'crashes': 0, 'errors': 0, 'retries': 0, 'recovered': 0,
+            'failed': 0, 'failures': []}
+
+    def open(self, roll, file):
+        '''
+        :param obj roll: instance of :class:`ElectoralRoll <.ElectoralRoll>`.
+        :param dict file: data of file.
+        :return: instance of :class:`RollWatchdogPages <.RollWatchdogPages>`.
+
+        Opens a file in a worker with the processor of the run (or with \
+        the other processor if it fails).
+        '''
+        self.close()
+        source = roll.open_file(file)
+        self._source = source.getvalue() if hasattr(source, 'getvalue') \
+            else source
+        self._options = roll.pdftotext_options
+        self._processors = [roll.processor, self.fallbacks[roll.processor]]
+        for processor in list(self._processors):
+            result = self.spawn(processor)
+            if result[0] == 'opened':
+                return RollWatchdogPages(self, roll, file, result[1])
+            self.add_error(roll, file, None, processor, result)
+            self._processors.remove(processor)
+        return RollWatchdogPages(self, roll, file, 0)
+
+    def render(self, roll, file, index):
+        '''
+        :param obj roll: instance of :class:`ElectoralRoll <.ElectoralRoll>`.
+        :param dict file: data of file.
+        :param int index: index of the page.
+        :return: instance of :class:`RollRenderedSheet \
+            <.RollRenderedSheet>` or None if the page failed.
+
+        Renders a page in the worker of the processor of the file, \
+        retrying it once with the other processor if it fails.
+        '''
+        self._report['pages'] += 1
+        for attempt, processor in enumerate(self._processors):
+            if attempt:
+                self._report['retries'] += 1
+            result = self.request(processor, index)
+            if result[0] == 'sheet':
+                if attempt:
+                    self._report['recovered'] += 1
+                return RollRenderedSheet(result[1], processor, *result[2:])
+            self.add_error(roll, file, index, processor, result)
+        self._report['failed'] += 1
+        return None
+
+    def spawn(self, processor):
+        '''
+        :param str processor: processor of the worker.
+        :return: tuple with the message of the worker when the file is \
+            opened (*opened* and the number of pages) or the failure.
+
+        Starts a worker that opens the file with a processor.
+        '''
+        conn, child = multiprocessing.Pipe()
+        process = multiprocessing.Process(
+            target=render_pages, daemon=True,
+            args=(child, self._source, processor, self._options))
+        process.start()
+        child.close()
+        self._workers[processor] = (process, conn)
+        result = self.receive(processor)
+        if result[0] != 'opened':
+            self.kill(processor)
+        return result
+
+    def request(self, processor, index):
+        '''
+        :param str processor: processor of the worker.
+        :param int index: index of the page.
+        :return: tuple with the message of the worker (*sheet* and the \
+            rendered sheet) or the failure.
+
+        Sends a page to the worker of a processor (started if it is not \
+        running) and waits for it.
+        '''
+        if processor not in self._workers:
+            result = self.spawn(processor)
+            if result[0] != 'opened':
+                return result
+        try:
+            self._workers[processor][1].send(index)
+        except (BrokenPipeError, OSError):
+            return self.receive(processor)
+        return self.receive(processor)
+
+    def receive(self, processor):
+        '''
+        :param str processor: processor of the worker.
+        :return: tuple with the message of the worker, or with *timeout* \
+            or *crash* and the reason (the worker is stopped).
+        '''
+        process, conn = self._workers[processor]
+        if not conn.poll(self.page_timeout):
+            self.kill(processor)
+            return ('timeout', f'{self.page_timeout} seconds')
+        try:
+            return conn.recv()
+        except (EOFError, OSError):
+            process.join(self.page_timeout)
+            self.kill(processor)
+            return ('crash', f'exit code {process.exitcode}')
+
+    def add_error(self, roll, file, index, processor, result):
+        '''
+        :param obj roll: instance of :class:`ElectoralRoll <.ElectoralRoll>`.
+        :param dict file: data of file.
+        :param int index: index of the page (or None for the file).
+        :param str processor: processor of the worker.
+        :param tuple result: failure (*timeout*, *crash* or *error* and \
+            the reason).
+
+        Counts a failure and adds it to the report and to the errors of \
+        the memorizer.
+        '''
+        kind, reason = result[0], result[1]
+        self._report[{'timeout': 'timeouts', 'crash': 'crashes'}.get(
+            kind, 'errors')] += 1
+        error = {'code': ('page-' if index is not None else 'file-') + kind,
+                 'file': file['name'], 'processor': processor,
+                 'reason': reason}
+        if index is not None:
+            error['page'] = index + 1
+        self._report['failures'].append(error)
+        if roll.memorizer.is_active:
+            roll.memorizer.errors.extend([error])
+
+    def add_stages(self, roll, file, rendered):
+        '''
+        :param obj roll: instance of :class:`ElectoralRoll <.ElectoralRoll>`.
+        :param dict file: data of file.
+        :param obj rendered: instance of :class:`RollRenderedSheet \
+            <.RollRenderedSheet>`.
+        :return: the adapted sheet.
+
+        Adds the durations (and the spans of the tracer) of the \
+        *processing* and *adapting* stages of a page rendered by a worker.
+        '''
+        marks = [rendered.processing_at, rendered.adapting_at, rendered.end]
+        for stage, start, end in zip(['processing', 'adapting'], marks,
+                                     marks[1:]):
+            roll._metadata.add_duration(file['name'], stage, end - start)
+            if roll.tracer.is_active:
+                roll.tracer.add_stage(file['name'], stage, start,
+                                      end - start, rendered)
+        return rendered.sheet
+
+    def kill(self, processor):
+        '''
+        :param str processor: processor of the worker.
+
+        Stops a worker (that hangs or crashed).
+        '''
+        process, conn = self._workers.pop(processor)
+        conn.close()
+        if process.is_alive():
+            process.terminate()
+        process.join()
+
+    def close(self):
+        '''
+        Stops the workers of the file.
+        '''
+        for processor in list(self._workers):
+            process, conn = self._workers[processor]
+            try:
+                conn.send(None)
+                process.join(self.page_timeout)
+            except (BrokenPipeError, OSError):
+                pass
+            self.kill(processor)
+
+    @property
+    def page_timeout(self):
+        '''
+        Seconds that a page can take to be processed and adapted.
+        '''
+        return self._page_timeout
+
+    @property
+    def is_active(self):
+        '''
+        :return: boolean.
+
+        Property that indicates if the watchdog is active (a \
+        *page_timeout* defined in the constructor).
+        '''
+        return self._page_timeout is not None
+
+    @property
+    def report(self):
+        '''
+        :return: dictionary with the timeout of the pages and the counts \
+            of the pages, timeouts, crashes, errors, retries, recovered \
+            and failed pages, and the failures (after \
+            :meth:`ElectoralRoll.run <.ElectoralRoll.run>`).
+        '''
+        return self._report
+
+    def __init__(self, *args, **kwargs):
+        page_timeout = kwargs.get('page_timeout', None)
+        try:
+            self._page_timeout = float(page_timeout) \
+                if page_timeout is not None else None
+        except (TypeError, ValueError):
+            raise TypeError('page_timeout must be a number.')
+        if self._page_timeout is not None and self._page_timeout <= 0:
+            raise TypeError('page_timeout must be positive.')
+        self._workers, self._processors = {}, []
+        self._source, self._options = None, {}
+        self._report = {}
@@ -1,14 +1,23 @@
 """Main module."""
-from serveliza.roll import ElectoralRoll
+from serveliza.roll import ElectoralRoll, RollMerger, RollServer
 
 
 def roll_from_pdf_to_csv(
         source, output='output',
         processor=None, mode=None, mode_sep=None,
         no_suffix=False, recursive=False, no_summary=False,
-        silent=False, no_colors=False,):
+        silent=False, no_colors=False, compression=None,
+        compression_thread=False, file_format='csv', part_size=None,
+        shard=None, shard_by='path', pipeline=False, parse_process=False,
+        parser=None, engine=None, workers=1, fields=None, regions=None,
+        provinces=None, communes=None, catalog_index=None, trace=None,
+        profile=None, memory_report=None, page_timeout=None):
     roll = ElectoralRoll(
-        source=source, output=output,
+        source=source, output=output, parser=parser, engine=engine,
+        workers=workers, fields=fields, regions=regions,
+        provinces=provinces, communes=communes, catalog_index=catalog_index,
+        trace=trace, profile=profile, memory_report=memory_report,
+        page_timeout=page_timeout,
         mode=mode, mode_sep=mode_sep,
         random_suffix=False if no_suffix else True,
         summary=False if no_summary else True,
@@ -16,16 +25,47 @@ def roll_from_pdf_to_csv(
         recursive=recursive,
         verbose=False if silent else True,
         colors=False if no_colors else True,
+        compression=compression,
+        compression_thread=compression_thread,
+        file_format=file_format, part_size=part_size,
+        shard=shard, shard_by=shard_by,
+        pipeline=pipeline, parse_process=parse_process,
         export=True)
     roll.run()
     return roll.metadata['exported_to']
 
 
+def roll_catalog(source, index=None, workers=None, processor=None,
+                 recursive=False):
+    roll = ElectoralRoll(
+        source=source, recursive=recursive, verbose=False,
+        processor=processor or 'pdftotext')
+    return roll.catalog(index=index, workers=workers)
+
+
+def roll_merge(sources, output='output', no_suffix=False):
+    merger = RollMerger(
+        sources=sources, output=output,
+        random_suffix=False if no_suffix else True)
+    return merger.run()
+
+
+def roll_serve(host=None, port=8000, socket=None, workers=None,
+               max_queue=None, processor=None, parser=None, engine=None,
+               fields=None, silent=False):
+    server = RollServer(
+        host=host, port=port, socket=socket, workers=workers,
+        max_queue=max_queue, processor=processor, parser=parser,
+        engine=engine, fields=fields,
+        verbose=False if silent else True)
+    server.serve()
+
+
 def roll_from_pdf_to_dataframe(
         source, recursive=False,
-        verbose=False, processor=None):
+        verbose=False, processor=None, max_memory=None):
     roll = ElectoralRoll(
         source=source, recursive=recursive,
-        verbose=verbose, processor=None)
+        verbose=verbose, processor=None, max_memory=max_memory)
     roll.run()
     return roll.to_dataframe()
@@ -12,3 +12,32 @@ def this_bytes(bts, short=False):
         if bts > measure[0]:
             msr = measure[1] if not short else measure[2]
             return str(bts // measure[0]) + ' ' + msr
+
+
+def to_bytes(text):
+    '''
+    :raises TypeError: the value must be an integer or a text string \
+        with a measure.
+
+    Inverse of :func:`this_bytes`. Converts a text string with a \
+    measure (*gb*, *mb*, *kb* or *b*, eg: '512mb') or an integer \
+    into the number of bytes it represents (None is returned as is).
+    '''
+    if text is None or (isinstance(text, int) and
+                        not isinstance(text, bool)):
+        return text
+    error = TypeError(f'{text!r} must be an integer of bytes or a text '
+                      'string with a measure: gb,mb,kb,b (eg: 512mb).')
+    if not isinstance(text, str):
+        raise error
+    measures = {'gb': 1000000000, 'mb': 1000000, 'kb': 1000, 'b': 1}
+    value = text.strip().lower()
+    for suffix, measure in measures.items():
+        if value.endswith(suffix):
+            number = value[:-len(suffix)].strip()
+            if number.replace('.', '', 1).isdigit():
+                return int(float(number) * measure)
+            raise error
+    if value.isdigit():
+        return int(value)
+    raise error
@@ -1,5 +1,19 @@
 from pathlib import Path
 from datetime import datetime
+import tarfile
+import os
+import zipfile
+import io
+
+from pdfminer.pdfparser import PDFParser
+from pdfminer.pdfdocument import PDFDocument
+from pdfminer.pdftypes import resolve1
+
+#: suffixes of the archives that can contain pdf files.
+ARCHIVE_SUFFIXES = ['.zip', '.tar', '.tgz', '.tbz2', '.txz',
+                    '.gz', '.bz2', '.xz']
+#: magic numbers of the compressed tar archives (gzip, bz2 and xz).
+COMPRESSIONS = [b'\x1f\x8b', b'BZh', b'\xfd7zXZ\x00']
 
 
 def is_valid_pdf(pathfile, raise_exception=False):
@@ -39,7 +53,7 @@ def get_metadata_from_pdfs(filelist, output='dict'):
         path = Path(pdf)
         meta = {
             'name': path.name, 'bytes': path.stat().st_size,
-            'relative': str(path.relative_to('.')),
+            'relative': os.path.relpath(str(path)),
             'absolute': str(path.absolute()),
             'mtime': datetime.fromtimestamp(path.stat().st_mtime),
             'atime': datetime.fromtimestamp(path.stat().st_mtime),
@@ -52,3 +66,165 @@ def get_metadata_from_pdfs(filelist, output='dict'):
         for meta in metadata:
             dict_metadata[meta['name']] = meta
         return dict_metadata
+
+
+def is_archive(pathfile):
+    '''
+    Returns true if the path is a zip or tar archive (also compressed).
+    '''
+    path = Path(str(pathfile))
+    if not path.is_file() or path.suffix.lower() not in ARCHIVE_SUFFIXES:
+        return False
+    return zipfile.is_zipfile(str(path)) or tarfile.is_tarfile(str(path))
+
+
+def get_all_pdf_in_archive(pathfile):
+    '''
+    Returns a list with the metadata of the pdf files contained in a \
+    zip or tar archive (as :func:`get_metadata_from_pdfs` with the \
+    *archive* and *member* keys). The name of each member is its path in \
+    the archive, so members with the same file name in different \
+    directories are distinct files. The members are not extracted.
+    '''
+    path = Path(str(pathfile))
+    members = []
+    if zipfile.is_zipfile(str(path)):
+        with zipfile.ZipFile(str(path)) as archive:
+            for info in archive.infolist():
+                if not info.is_dir():
+                    members.append((info.filename, info.file_size,
+                                    datetime(*info.date_time)))
+    else:
+        with tarfile.open(str(path)) as archive:
+            for info in archive:
+                if info.isfile():
+                    members.append((info.name, info.size,
+                                    datetime.fromtimestamp(info.mtime)))
+    metadata = []
+    for member, size, mtime in members:
+        if Path(member).suffix not in ['.pdf', '.PDF']:
+            continue
+        metadata.append({
+            'name': member, 'bytes': size,
+            'relative': f'{str(path)}/{member}',
+            'absolute': f'{str(path.absolute())}/{member}',
+            'mtime': mtime, 'atime': mtime,
+            'archive': str(path.absolute()), 'member': member,
+            })
+    return metadata
+
+
+class ArchiveReader:
+    '''
+    Reader of the members of a zip or tar archive into memory buffers, \
+    that keeps the archive open between the reads. A compressed tar \
+    can not seek its members, so it is read as a stream (without \
+    temporary files): the members are decompressed one at a time in the \
+    order of the archive, and reading a member that precedes the last \
+    one read restarts the decompression from the start of the archive. \
+    The runs read the members in the order of the archive, so the \
+    archive is decompressed once, but readers in another order (as the \
+    dispatch of the scheduler, by pages) pay a restart for each member \
+    read backwards.
+    '''
+
+    def read(self, member):
+        '''
+        Reads a member of the archive into a memory buffer.
+        '''
+        if self._zip is not None:
+            return io.BytesIO(self._zip.read(member))
+        if self._members is not None:
+            return io.BytesIO(
+                self._tar.extractfile(self._members[member]).read())
+        if member in self._passed:
+            self.open_stream()
+        while True:
+            info = self._tar.next()
+            if info is None:
+                raise KeyError(f'{member} not found in {self._archive}')
+            self._passed.add(info.name)
+            if info.name == member:
+                return io.BytesIO(self._tar.extractfile(info).read())
+
+    def open_stream(self):
+        '''
+        Opens (or reopens from the start) the stream of a compressed tar.
+        '''
+        if self._tar is not None:
+            self._tar.close()
+        self._tar = tarfile.open(self._archive, 'r|*')
+        self._passed = set()
+
+    def close(self):
+        '''
+        Closes the archive.
+        '''
+        for handle in [self._zip, self._tar]:
+            if handle is not None:
+                handle.close()
+        self._zip = self._tar = None
+
+    def __init__(self, archive):
+        self._archive = str(archive)
+        self._zip, self._tar, self._members = None, None, None
+        if zipfile.is_zipfile(self._archive):
+            self._zip = zipfile.ZipFile(self._archive)
+            return
+        with open(self._archive, 'rb') as f:
+            magic = f.read(6)
+        if any(magic.startswith(x) for x in COMPRESSIONS):
+            self.open_stream()
+        else:
+            self._tar = tarfile.open(self._archive)
+            self._members = {x.name: x for x in self._tar.getmembers()}
+
+
+def get_metadata_from_buffer(buffer, name):
+    '''
+    Returns the metadata of a pdf file in memory (bytes or file-like \
+    object) as :func:`get_metadata_from_pdfs` does.
+    '''
+    if isinstance(buffer, (bytes, bytearray)):
+        size = len(buffer)
+    else:
+        position = buffer.tell()
+        size = buffer.seek(0, 2) - position
+        buffer.seek(position)
+    now = datetime.now()
+    return {
+        'name': name, 'bytes': size, 'relative': name, 'absolute': name,
+        'mtime': now, 'atime': now, 'buffer': True}
+
+
+def read_buffer(buffer):
+    '''
+    Returns a new memory buffer with the content of a pdf file in \
+    memory (bytes or file-like object), so it can be closed by the \
+    processors without closing the original.
+    '''
+    if isinstance(buffer, (bytes, bytearray)):
+        return io.BytesIO(buffer)
+    position = buffer.tell()
+    content = buffer.read()
+    buffer.seek(position)
+    return io.BytesIO(content)
+
+
+def get_page_count(pathfile):
+    '''
+    Returns the number of pages of a pdf file (path or binary file-like \
+    object) read from the page tree of its catalog, without rendering \
+    the pages, or None if it can not be read.
+    '''
+    opened = not hasattr(pathfile, 'read')
+    file = open(str(pathfile), 'rb') if opened else pathfile
+    try:
+        document = PDFDocument(PDFParser(file))
+        pages = resolve1(document.catalog['Pages'])
+        return int(resolve1(pages['Count']))
+    except Exception:
+        return None
+    finally:
+        if opened:
+            file.close()
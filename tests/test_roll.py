@@ -4,12 +4,46 @@
 
 from datetime import datetime, timedelta
 from pandas import pandas as pd
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+import tempfile
 import unittest
+import json
+import re
+import pstats
+import tracemalloc
+import shutil
+import tarfile
+import zipfile
+import gzip
+import lzma
+import time
+import sys
+import os
+import socket
+import signal
+import subprocess
+import threading
+import http.client
 
-from serveliza.roll import ElectoralRoll
+from serveliza.roll import ElectoralRoll, RollMerger
 from serveliza.roll.printer import RollPrinter
 from serveliza.roll.memorizer import RollMemorizer
 from serveliza.roll.exporter import RollExporter
+from serveliza.roll.parsers import RollParser, RollColumnParser
+from serveliza.roll.batches import RollBatch
+from serveliza.roll.vectorizer import RollVectorizer
+from serveliza.roll.accumulators import RollPlaces, RollPartial
+from serveliza.roll.catalog import RollCatalog
+from serveliza.roll.adapters import RollAdapter
+from serveliza.roll.filters import (
+    RollFilter, normalize_place, abbreviated_words)
+from serveliza.roll.server import RollServer, RollStreamer
+from serveliza.mixins.pdf_processors import PdfminersixPages
+from serveliza.utils import pdf as pdf_utils
+from serveliza.roll.layouts import (
+    RollParser2016, detect_layout, register_layout, LAYOUTS)
 
 
 class TestServeliza(unittest.TestCase):
@@ -44,6 +78,933 @@ class TestServeliza(unittest.TestCase):
         roll.run()
         self.roll_assert_runned(roll)
 
+    def test_roll_max_memory(self):
+        source = 'tests/fixtures/Antártica.pdf'
+        roll = ElectoralRoll(source=source, processor='pdfminersix')
+        roll.run()
+        spilled = ElectoralRoll(
+            source=source, processor='pdfminersix', max_memory='1kb')
+        spilled.run()
+        self.roll_assert_runned(spilled)
+        self.assertTrue(len(spilled.entries.segments) > 0)
+        self.assertTrue(spilled.memorizer.memory <= 1000)
+        self.assertEqual(list(spilled.entries), list(roll.entries))
+        self.assertEqual(spilled.entries[-1], roll.entries[-1])
+        self.assertEqual(spilled.entries[10:300:7], roll.entries[10:300:7])
+        self.assertEqual(len(spilled.errors), len(roll.errors))
+        memorizer = RollMemorizer(max_memory='1kb')
+        memorizer.merge(roll.memorizer)
+        memorizer.merge(spilled.memorizer)
+        merged = memorizer.storage[roll.rid]['entries']
+        self.assertEqual(list(merged), 2 * list(roll.entries))
+        self.assertEqual(len(merged), 2 * len(roll.entries))
+        self.assertEqual(len(memorizer.errors), 2 * len(roll.errors))
+        self.assertTrue(memorizer.memory <= 1000)
+        for max_memory in ['512m', '1 GiB', 1.5]:
+            with self.assertRaises(TypeError):
+                ElectoralRoll(source=source, max_memory=max_memory)
+
+    def test_roll_compression(self):
+        source = 'tests/fixtures/Antártica.pdf'
+        with tempfile.TemporaryDirectory() as output:
+            kwargs = {'source': source, 'processor': 'pdfminersix',
+                      'export': True, 'random_suffix': False,
+                      'mode': 'separated', 'mode_sep': 'commune'}
+            ElectoralRoll(output=output+'/plain', **kwargs).run()
+            ElectoralRoll(output=output+'/gzip', compression='gzip',
+                          **kwargs).run()
+            ElectoralRoll(output=output+'/xz', compression='xz',
+                          compression_thread=True, **kwargs).run()
+            plain = Path(output+'/plain/PEAEM-2016-antartica-data.csv')
+            gzipped = Path(output+'/gzip/PEAEM-2016-antartica-data.csv.gz')
+            xz = Path(output+'/xz/PEAEM-2016-antartica-data.csv.xz')
+            with gzip.open(str(gzipped), 'rt') as f:
+                self.assertEqual(f.read(), plain.read_text())
+            with lzma.open(str(xz), 'rt') as f:
+                self.assertEqual(f.read(), plain.read_text())
+
+    def test_roll_partitioned(self):
+        source = 'tests/fixtures/Antártica.pdf'
+        with tempfile.TemporaryDirectory() as output:
+            roll = ElectoralRoll(
+                source=source, processor='pdfminersix', export=True,
+                output=output, mode='partitioned', part_size='10kb',
+                random_suffix=False)
+            roll.run()
+            partition = Path(output) / 'rid=PEAEM-2016' / \
+                'region=DE MAGALLANES Y ANTARTICA CH.' / 'commune=ANTARTICA'
+            parts = sorted(partition.glob('part-*.csv'))
+            self.assertTrue(len(parts) > 1)
+            self.assertEqual(parts[0].name, 'part-0000.csv')
+            data = pd.concat([pd.read_csv(x) for x in parts])
+            self.assertEqual(len(data), len(roll.entries))
+            self.assertFalse('region' in data.columns)
+            self.assertFalse('comuna' in data.columns)
+            self.assertEqual(
+                list(data.columns),
+                [x for x in roll.fields if x not in ['region', 'comuna']])
+            self.assertTrue(str(partition.parents[1].absolute()) in
+                            roll.metadata['exported_to'])
+
+    def test_roll_archives_and_buffers(self):
+        source = 'tests/fixtures/Antártica.pdf'
+        roll = ElectoralRoll(source=source, processor='pdfminersix')
+        roll.run()
+        with tempfile.TemporaryDirectory() as tmp:
+            with zipfile.ZipFile(tmp+'/rolls.zip', 'w') as f:
+                f.write(source, 'rolls/Antártica.pdf')
+            with tarfile.open(tmp+'/rolls.tar.gz', 'w:gz') as f:
+                f.add(source, 'rolls/Antártica.pdf')
+            for archive in ['rolls.zip', 'rolls.tar.gz']:
+                packed = ElectoralRoll(
+                    source=tmp+'/'+archive, processor='pdfminersix')
+                file = packed.metadata['files']['rolls/Antártica.pdf']
+                self.assertEqual(file['member'], 'rolls/Antártica.pdf')
+                packed.run()
+                self.assertEqual(list(packed.entries), list(roll.entries))
+                self.assertEqual(packed._archives, {})
+            with tarfile.open(tmp+'/twins.tar.gz', 'w:gz') as f:
+                f.add(source, 'a/Antártica.pdf')
+                f.add(source, 'b/Antártica.pdf')
+            twins = ElectoralRoll(
+                source=tmp+'/twins.tar.gz', processor='pdfminersix')
+            self.assertEqual(sorted(twins.metadata['files']),
+                             ['a/Antártica.pdf', 'b/Antártica.pdf'])
+            reader = pdf_utils.ArchiveReader(tmp+'/twins.tar.gz')
+            with open(source, 'rb') as f:
+                content = f.read()
+            self.assertEqual(reader.read('b/Antártica.pdf').getvalue(),
+                             content)
+            self.assertEqual(reader.read('a/Antártica.pdf').getvalue(),
+                             content)
+            reader.close()
+            with tarfile.open(tmp+'/ordered.tar.gz', 'w:gz') as f:
+                f.add(source, 'z/Antártica.pdf')
+                f.add(source, 'a/Antártica.pdf')
+            streams, open_stream = [], pdf_utils.ArchiveReader.open_stream
+
+            def count_streams(reader):
+                streams.append(reader)
+                open_stream(reader)
+            ordered = ElectoralRoll(
+                source=tmp+'/ordered.tar.gz', processor='pdfminersix')
+            with patch.object(pdf_utils.ArchiveReader, 'open_stream',
+                              count_streams):
+                ordered.run()
+            self.assertEqual(len(streams), 1)
+            self.assertEqual(len(ordered.entries), 2 * len(roll.entries))
+        with open(source, 'rb') as f:
+            content = f.read()
+            f.seek(0)
+            buffered = ElectoralRoll(
+                source=[content, f], processor='pdfminersix')
+            self.assertEqual(len(buffered.metadata['files']), 2)
+            buffered.run()
+            self.assertFalse(f.closed)
+        self.assertEqual(len(buffered.entries), 2 * len(roll.entries))
+
+    def test_roll_shards_merge(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            for name in ['a.pdf', 'b.pdf', 'c.pdf', 'd.pdf']:
+                shutil.copy('tests/fixtures/Antártica.pdf', tmp+'/'+name)
+            kwargs = {'source': tmp, 'processor': 'pdfminersix',
+                      'export': True, 'random_suffix': False}
+            serial = ElectoralRoll(output=tmp+'/serial', **kwargs)
+            serial.run()
+            shards = []
+            for shard in ['1/2', '2/2']:
+                roll = ElectoralRoll(
+                    output=tmp+'/'+shard[0], shard=shard, **kwargs)
+                shards += list(roll.metadata['files'])
+                roll.run()
+            self.assertEqual(sorted(shards), sorted(serial.metadata['files']))
+            cwd = os.getcwd()
+            try:
+                os.chdir(tmp)
+                moved = ElectoralRoll(source='.', shard='2/2')
+            finally:
+                os.chdir(cwd)
+            self.assertEqual(list(moved.metadata['files']),
+                             list(roll.metadata['files']))
+            merger = RollMerger([tmp+'/1', tmp+'/2'], output=tmp+'/merged',
+                                random_suffix=False)
+            merger.run()
+            data = Path(tmp+'/merged/PEAEM-2016-data.csv').read_text()
+            expected = Path(tmp+'/serial/PEAEM-2016-data.csv').read_text()
+            self.assertEqual(data, expected)
+            merged = merger.metadata['rolls']['PEAEM-2016']
+            rolls = serial.metadata['rolls']['PEAEM-2016']
+            self.assertEqual(merged['entries'], rolls['entries'])
+            self.assertEqual(merged, rolls)
+            self.assertEqual(merged['communes'], rolls['communes'])
+
+    def test_roll_pipeline(self):
+        source = 'tests/fixtures/Antártica.pdf'
+        roll = ElectoralRoll(source=source, processor='pdfminersix')
+        roll.run()
+        for parse_process in [False, True]:
+            pipelined = ElectoralRoll(
+                source=source, processor='pdfminersix', pipeline=True,
+                parse_process=parse_process, queue_size=2)
+            pipelined.run()
+            self.roll_assert_runned(pipelined)
+            self.assertEqual(list(pipelined.entries), list(roll.entries))
+            self.assertEqual(pipelined.metadata['rolls'],
+                             roll.metadata['rolls'])
+            metrics = pipelined.metadata['analysis']['pipeline']
+            self.assertEqual(metrics['render-parse']['puts'], 6)
+            self.assertTrue(metrics['parse-writer']['max'] <= 2)
+        name = next(iter(roll._metadata.files))
+        before = roll.metadata['analysis']['durations']['parsing']
+        interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        try:
+            threads = [threading.Thread(target=lambda: [
+                roll._metadata.add_duration(
+                    name, 'parsing', timedelta(microseconds=1))
+                for _ in range(50000)]) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            sys.setswitchinterval(interval)
+        self.assertEqual(roll.metadata['analysis']['durations']['parsing'],
+                         before + timedelta(microseconds=200000))
+        with tempfile.TemporaryDirectory() as tmp:
+            failed = ElectoralRoll(
+                source=source, processor='pdfminersix', pipeline=True,
+                parse_process=True, export=True, output=tmp,
+                compression='gzip', compression_thread=True)
+            memorize, calls = failed.sheet_memorize, []
+
+            def faulty(parsed, *args):
+                calls.append(parsed)
+                if len(calls) > 2:
+                    raise ValueError('memorizing failed')
+                return memorize(parsed, *args)
+            failed.sheet_memorize = faulty
+            with self.assertRaises(ValueError):
+                failed.run()
+            self.assertEqual(failed.exporter._handles, {})
+            self.assertIsNone(failed.exporter._thread)
+            self.assertIsNone(failed.pipeline._executor)
+        code = ('from serveliza.roll import ElectoralRoll\n'
+                f'ElectoralRoll(source={source!r}, processor="pdfminersix", '
+                'pipeline=True, parse_process=True, verbose=False).run()')
+        result = subprocess.run([sys.executable, '-c', code],
+                                capture_output=True, text=True)
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stderr, '')
+
+    def test_roll_column_parser(self):
+        rows = [
+            ('ABARCA GONZALEZ LUIS ENRIQUE', ' 8.407.686-4', 'VAR',
+             'B A EDO FREI MONTALVA', 'ANTARTICA', '3 V'),
+            ('ACUÑA MOLINA BAUTISTA', '12.864.906-1', 'MUJ',
+             'LA ANTARTICA', 'ANTARTICA', '1 M'),
+            ('AGUILA MANSILLA MANUEL', '19.140.943-4', 'VAR',
+             'EL TUCAPEL 0493 POBL. 18 DE SEPTBRE FINAL', 'ANTARTICA',
+             '2 V')]
+        lines = [
+            '  REPUBLICA DE CHILE',
+            '  PADRON ELECTORAL AUDITADO ELECCIONES MUNICIPALES 2016',
+            '  REGION : DE MAGALLANES Y ANTARTICA CH.      COMUNA: '
+            'ANTARTICA      PAGINA 1 de 5',
+            '  PROVINCIA : ANTARTICA CHILENA',
+            '  ' + 'NOMBRE'.ljust(37) + 'C.IDENTIDAD'.ljust(14) +
+            'SEXO'.ljust(6) + 'DOMICILIO ELECTORAL'.ljust(36) +
+            'CIRCUNSCRIPCION'.ljust(18) + 'MESA']
+        for row in rows:
+            lines.append('  ' + row[0].ljust(35) + row[1].rjust(13) + '   ' +
+                         row[2].ljust(6) + row[3].ljust(36) +
+                         row[4].ljust(18) + row[5] + '   ')
+        sheet = '\n'.join(lines)
+        parsed = RollColumnParser(sheet)
+        self.assertEqual(parsed.columns, [0, 37, 51, 57, 93, 111])
+        self.assertEqual(parsed.metadata['columns'],
+                         {'sliced': 2, 'fallback': 1})
+        self.assertEqual(parsed.metadata['entries']['total'], 3)
+        self.assertEqual(parsed.entries[0][:3], (
+            'ABARCA GONZALEZ LUIS ENRIQUE', '8.407.686-4', 'VAR'))
+        self.assertEqual(parsed.entries[1][6:9], (
+            'LA ANTARTICA', 'ANTARTICA', '1 M'))
+        self.assertTrue(all(isinstance(x, tuple) for x in parsed.entries))
+        for idx in [3, 4, 5, 9]:
+            self.assertIs(parsed.entries[0][idx], parsed.entries[2][idx])
+        expected = RollParser('\n'.join(x.strip() for x in lines))
+        self.assertEqual(parsed.fields, expected.fields)
+        self.assertEqual(parsed.entries, expected.entries)
+        roll = ElectoralRoll(source='tests/fixtures/', parser='columns')
+        self.assertEqual(roll.pdftotext_options, {'physical': True})
+        with self.assertRaises(TypeError):
+            ElectoralRoll(source='tests/fixtures/', parser='slices')
+
+    def test_roll_line_classifier(self):
+        rows = [
+            ('ABARCA GONZALEZ LUIS ENRIQUE', '8.407.686-4', 'VAR',
+             'B A EDO FREI MONTALVA', 'ANTARTICA', '3 V'),
+            ('ACUÑA MOLINA BAUTISTA', '12.864.906-1', 'MUJ',
+             'LA ANTARTICA', 'ANTARTICA', '1 M'),
+            ('AGUILA MANSILLA MANUEL', '19.140.943-4', 'VAR',
+             'EL TUCAPEL 0493', 'ANTARTICA', '2 V')]
+        lines = [
+            'REPUBLICA DE CHILE',
+            'PADRON ELECTORAL AUDITADO ELECCIONES MUNICIPALES 2016',
+            'REGION : DE MAGALLANES Y ANTARTICA CH.      COMUNA: '
+            'ANTARTICA      PAGINA 1 de 5',
+            'PROVINCIA : ANTARTICA CHILENA',
+            'NOMBRE'.ljust(37) + 'C.IDENTIDAD'.ljust(14) +
+            'SEXO'.ljust(6) + 'DOMICILIO ELECTORAL'.ljust(36) +
+            'CIRCUNSCRIPCION'.ljust(18) + 'MESA']
+        entries = [row[0].ljust(35) + row[1].rjust(13) + '   ' +
+                   row[2].ljust(6) + row[3].ljust(36) + row[4].ljust(18) +
+                   row[5] for row in rows]
+        body = ['   ORPHAN', entries[0], entries[1][:60], '',
+                '   ' + entries[1][60:], entries[2][:50],
+                ' ' + entries[2][50:], 'FOOTER']
+        kinds = ['continuation', 'entry', 'start', 'noise', 'continuation',
+                 'start', 'continuation', 'start']
+        self.assertEqual([RollParser.classify_line(x) for x in body], kinds)
+        for line in ['ab1', 'ab1 ', 'ab1 M', 'ab1M', 'a1', 'ab M', '_b9\n',
+                     'a b', ' ab1', '1.2 M ', 'x\n9']:
+            self.assertEqual(
+                RollParser.classify_line(line) == 'entry',
+                bool(re.match(r'^\w+.+\d+\s?\w?$', line)), line)
+        parsed = RollParser('\n'.join(lines + body))
+        _, groups, orphans = parsed.split_entries()
+        self.assertEqual(groups, [
+            entries[1][:60] + '   ' + entries[1][60:],
+            entries[2][:50] + ' ' + entries[2][50:], 'FOOTER'])
+        self.assertEqual(orphans, ['   ORPHAN'])
+        self.assertEqual(parsed.metadata['entries'],
+                         {'rescue': 2, 'errors': 1, 'total': 3})
+        self.assertEqual([x[:3] for x in parsed.entries],
+                         [x[:3] for x in rows])
+        self.assertEqual([x['code'] for x in parsed.errors],
+                         ['malformed-no-start'])
+
+    def test_roll_adversarial_lines(self):
+        row = ('ABARCA GONZALEZ LUIS ENRIQUE', '8.407.686-4', 'VAR',
+               'B A EDO FREI MONTALVA', 'ANTARTICA', '3 V')
+        header = [
+            'REPUBLICA DE CHILE',
+            'PADRON ELECTORAL AUDITADO ELECCIONES MUNICIPALES 2016',
+            'REGION : DE MAGALLANES Y ANTARTICA CH.      COMUNA: '
+            'ANTARTICA      PAGINA 1 de 5',
+            'PROVINCIA : ANTARTICA CHILENA']
+        fields = ('NOMBRE'.ljust(37) + 'C.IDENTIDAD'.ljust(14) +
+                  'SEXO'.ljust(6) + 'DOMICILIO ELECTORAL'.ljust(36) +
+                  'CIRCUNSCRIPCION'.ljust(18) + 'MESA')
+        entry = row[0].ljust(35) + row[1].rjust(13) + '   ' + \
+            row[2].ljust(6) + row[3].ljust(36) + row[4].ljust(18) + row[5]
+        clean = RollParser('\n'.join(header + [fields, entry]))
+        size = 100000
+        noise = ['a' * size + ' ' * size, 'PAGINA' + ' ' * size + 'x',
+                 'x' + ' 1.' * size]
+        lines = ['A ' + '1' * size, 'A' + ' ' * size + '1.1',
+                 'A ' + '1.' * size + '1', 'A ' + ' 1' * size]
+        sheet = '\n'.join(noise + header + [fields, entry] + lines)
+        started = datetime.now()
+        parsed = RollParser(sheet)
+        vectorized = RollVectorizer(engine='vectorized').parse_sheets(
+            RollParser, [sheet])[0]
+        self.assertTrue(datetime.now() - started < timedelta(seconds=5))
+        for sheet in [parsed, vectorized]:
+            self.assertEqual(sheet.header, clean.header)
+            self.assertEqual(sheet.entries[0], clean.entries[0])
+            self.assertEqual(
+                [x['ecode'] for x in sheet.errors
+                 if x['code'] == 'line-too-long'],
+                ['header'] * len(noise) + ['entry'] * len(lines))
+        regexs = [RollParser.regex_roll, RollParser.regex_region,
+                  RollParser.regex_commune, RollParser.regex_pagination,
+                  RollParser.regex_table_prefix +
+                  RollParser.regexs_entries['table']] + \
+            list(RollParser.regexs_entries.values()) + \
+            [x.regex_roll for x in LAYOUTS]
+        targets = noise + lines + [
+            '1' * size, ' ' + '1' * size + '.', 'REGION :' + ' A' * size,
+            'COMUNA:' + ' ' * size + 'x', 'PADRON ELECTORAL' + ' ' * size,
+            'PADRON ELECTORAL A ' * 4000]
+        for target in targets:
+            for regex in regexs:
+                started = datetime.now()
+                re.search(regex, target)
+                self.assertTrue(
+                    datetime.now() - started < timedelta(seconds=1), regex)
+
+    def test_roll_vectorized(self):
+        source = 'tests/fixtures/Antártica.pdf'
+        roll = ElectoralRoll(source=source, processor='pdfminersix')
+        roll.run()
+        vectorized = ElectoralRoll(
+            source=source, processor='pdfminersix', engine='vectorized')
+        self.assertTrue(vectorized.vectorizer.is_active)
+        vectorized.run()
+        self.roll_assert_runned(vectorized)
+        self.assertEqual(list(vectorized.entries), list(roll.entries))
+        self.assertEqual(list(vectorized.errors), list(roll.errors))
+        self.assertEqual(vectorized.metadata['rolls'],
+                         roll.metadata['rolls'])
+        with self.assertRaises(TypeError):
+            ElectoralRoll(source=source, engine='vectorized', pipeline=True)
+        with self.assertRaises(TypeError):
+            ElectoralRoll(source=source, engine='numpy')
+
+    def test_roll_layouts(self):
+        source = 'tests/fixtures/Antártica.pdf'
+        roll = ElectoralRoll(source=source, processor='pdfminersix')
+        roll.run()
+        layout = ElectoralRoll(
+            source=source, processor='pdfminersix', parser='layout')
+        layout.run()
+        self.roll_assert_runned(layout)
+        self.assertEqual(layout.inner_class_parser, RollParser2016)
+        self.assertEqual(
+            layout.metadata['files']['Antártica.pdf']['layout'], '2016')
+        self.assertEqual(list(layout.entries), list(roll.entries))
+        self.assertEqual(layout.metadata['rolls'], roll.metadata['rolls'])
+        self.assertIsNone(detect_layout('REPUBLICA DE CHILE\nNOMBRE C'))
+        with self.assertRaises(TypeError):
+            register_layout(RollParser)
+
+    def test_roll_projection(self):
+        source = 'tests/fixtures/Antártica.pdf'
+        roll = ElectoralRoll(source=source, processor='pdfminersix')
+        roll.run()
+        fields = ['c-identidad', 'comuna', 'sex', 'mesa']
+        index = [roll.fields.index(x) for x in [
+            'c-identidad', 'comuna', 'sexo', 'mesa']]
+        expected = [tuple(x[y] for y in index) for x in roll.entries]
+        for kwargs in [{}, {'engine': 'vectorized'}, {'workers': 2}]:
+            projected = ElectoralRoll(
+                source=source, processor='pdfminersix',
+                fields=','.join(fields), **kwargs)
+            projected.run()
+            self.assertEqual(projected.projection, tuple(fields))
+            self.assertEqual(projected.fields, fields)
+            self.assertEqual(list(projected.entries), expected)
+            self.assertEqual(
+                list(projected.to_dataframe.columns), fields)
+        parsed = RollParser(
+            'REPUBLICA DE CHILE', auto=False, fields=['reference'])
+        self.assertEqual(parsed.projection, ('reference',))
+        with self.assertRaises(TypeError):
+            ElectoralRoll(source=source, fields=['c-identidad', 'rut'])
+        with self.assertRaises(TypeError):
+            RollParser('REPUBLICA DE CHILE', fields='mesa')
+
+    def test_roll_workers(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            for name in ['a.pdf', 'b.pdf', 'c.pdf']:
+                shutil.copy('tests/fixtures/Antártica.pdf', tmp+'/'+name)
+            roll = ElectoralRoll(source=tmp, processor='pdfminersix')
+            roll.run()
+            scheduled = ElectoralRoll(
+                source=tmp, processor='pdfminersix', workers=2,
+                steal_pages=1)
+            self.assertTrue(scheduled.scheduler.is_active)
+            scheduled.run()
+            self.roll_assert_runned(scheduled)
+            self.assertEqual(list(scheduled.entries), list(roll.entries))
+            self.assertEqual(scheduled.metadata['rolls'],
+                             roll.metadata['rolls'])
+            for name, file in scheduled.metadata['files'].items():
+                self.assertEqual(file['pages'], 5)
+                self.assertEqual(file['entries'],
+                                 roll.metadata['files'][name]['entries'])
+            report = scheduled.metadata['analysis']['scheduler']
+            self.assertEqual(report['pages'], 15)
+            self.assertEqual(report['tasks'], 3 + report['steals'])
+            self.assertTrue(report['predicted'] > timedelta())
+            self.assertTrue(report['buffered'] <= report['transferred'])
+            bounded = ElectoralRoll(
+                source=tmp, processor='pdfminersix', workers=2)
+            bounded.scheduler.max_buffered = 0
+            bounded.run()
+            self.assertEqual(list(bounded.entries), list(roll.entries))
+            self.assertEqual(bounded.metadata['rolls'],
+                             roll.metadata['rolls'])
+            shm = os.path.isdir('/dev/shm')
+            blocks = set(os.listdir('/dev/shm')) if shm else None
+            failed = ElectoralRoll(
+                source=tmp, processor='pdfminersix', workers=2)
+
+            def faulty(*args):
+                raise ValueError('memorizing failed')
+            failed.sheet_memorize = faulty
+            with self.assertRaises(ValueError):
+                failed.run()
+            if shm:
+                self.assertEqual(set(os.listdir('/dev/shm')), blocks)
+        with self.assertRaises(TypeError):
+            ElectoralRoll(source='tests/fixtures/Antártica.pdf', workers=2,
+                          pipeline=True)
+
+    def test_roll_batches(self):
+        entries = [
+            [['ACUÑA MOLINA', '12.864.906-1', 'MUJ', 'ANTARTICA', '1 M'],
+             ['ABARCA \x1f LUIS', None, 'VAR', 'ANTARTICA', '3 V'],
+             ['AGUILA MANSILLA', '19.140.943-4', 'VAR', 'ANTARTICA', '']],
+            [],
+            [['PEREZ PEREZ', '1.111.111-1', None, 'ANTARTICA']]]
+        sheets = []
+        for sheet_entries in entries:
+            parsed = RollParser('REPUBLICA DE CHILE', auto=False)
+            parsed._entries = [list(x) for x in sheet_entries]
+            sheets.append(parsed)
+        batch = RollBatch(sheets)
+        self.assertTrue(batch.size > 0)
+        self.assertEqual([x.entries for x in sheets], [[], [], []])
+        batch.unpack(sheets)
+        self.assertEqual([x.entries for x in sheets],
+                         [[tuple(y) for y in x] for x in entries])
+        self.assertFalse(batch.in_shared_memory)
+
+    def test_roll_lazy_pages(self):
+        roll = ElectoralRoll(source='tests/fixtures/Antártica.pdf',
+                             processor='pdfminersix')
+        pages = roll.process_pdf('tests/fixtures/Antártica.pdf')
+        self.assertIsInstance(pages, PdfminersixPages)
+        self.assertEqual(len(pages), 5)
+        self.assertEqual(pages[1].pageid, pages[-4].pageid)
+        self.assertNotEqual(pages[0].pageid, pages[1].pageid)
+        self.assertEqual(len(list(pages)), 5)
+        with self.assertRaises(IndexError):
+            pages[5]
+        roll.run()
+        self.roll_assert_runned(roll)
+        self.assertIsNone(roll._tmp_file)
+
+    def test_roll_catalog(self):
+        blank = b'%PDF-1.4\n1 0 obj<</Type/Catalog/Pages 2 0 R>>endobj\n' \
+            b'2 0 obj<</Type/Pages/Kids[3 0 R]/Count 1>>endobj\n' \
+            b'3 0 obj<</Type/Page/Parent 2 0 R/MediaBox[0 0 612 792]>>' \
+            b'endobj\ntrailer<</Root 1 0 R>>\n%%EOF\n'
+        with tempfile.TemporaryDirectory() as tmp:
+            shutil.copy('tests/fixtures/Antártica.pdf', tmp+'/a.pdf')
+            Path(tmp+'/blank.pdf').write_bytes(blank)
+            index = tmp+'/index/catalog.json'
+            roll = ElectoralRoll(source=tmp, processor='pdfminersix')
+            catalog = roll.catalog(index=index, workers=2)
+            self.assertEqual(sorted(catalog), ['a.pdf', 'blank.pdf'])
+            self.assertTrue(catalog['a.pdf']['is_roll'])
+            self.assertEqual(catalog['a.pdf']['pages'], 5)
+            self.assertEqual(catalog['a.pdf']['layout'], '2016')
+            self.assertEqual(catalog['a.pdf']['commune'], 'ANTARTICA')
+            self.assertFalse(catalog['a.pdf']['cached'])
+            self.assertFalse(catalog['blank.pdf']['is_roll'])
+            self.assertTrue(Path(index).is_file())
+            roll = ElectoralRoll(source=tmp+'/a.pdf', processor='pdfminersix')
+            roll.run()
+            self.assertEqual(catalog['a.pdf']['rid'], roll.rid)
+            self.assertEqual(catalog['a.pdf']['region'],
+                             roll.metadata['rolls'][roll.rid]['regions'][0])
+            cached = ElectoralRoll(source=tmp, processor='pdfminersix')
+            again = cached.catalog(index=index, workers=1)
+            self.assertTrue(all(x['cached'] for x in again.values()))
+            self.assertEqual(
+                {x: {**y, 'cached': False} for x, y in again.items()},
+                catalog)
+            buffer = ElectoralRoll(
+                source=[Path(tmp+'/a.pdf').read_bytes()],
+                processor='pdfminersix')
+            self.assertTrue(list(buffer.catalog(
+                index=index, workers=1).values())[0]['is_roll'])
+            Path(tmp+'/blank.pdf').write_bytes(blank + b'\n')
+            modified = ElectoralRoll(source=tmp, processor='pdfminersix')
+            modified = modified.catalog(index=index, workers=1)
+            self.assertTrue(modified['a.pdf']['cached'])
+            self.assertFalse(modified['blank.pdf']['cached'])
+            sources = [tmp+'/a.pdf', tmp+'/blank.pdf'] * 5
+            in_flight, peak = [0], [0]
+
+            class Executor(ThreadPoolExecutor):
+                def submit(self, *args):
+                    future = super().submit(*args)
+                    in_flight[0] += 1
+                    peak[0] = max(peak[0], in_flight[0])
+                    result = future.result
+
+                    def retrieve():
+                        in_flight[0] -= 1
+                        return result()
+                    future.result = retrieve
+                    return future
+            with patch('serveliza.roll.catalog.ProcessPoolExecutor',
+                       Executor):
+                records = RollCatalog.scan(
+                    iter(sources), {'processor': 'pdfminersix',
+                                    'pdftotext_options': {}}, 2)
+            self.assertEqual([x['is_roll'] for x in records],
+                             [True, False] * 5)
+            self.assertEqual(peak[0], 4)
+
+    def test_roll_filters(self):
+        self.assertEqual(normalize_place('Antártica  Chilena.'),
+                         ('antartica', 'chilena'))
+        region = {'region': 'DE MAGALLANES Y ANTARTICA CH.',
+                  'province': 'ANTARTICA CHILENA', 'commune': 'ANTARTICA'}
+        self.assertTrue(RollFilter(
+            regions='Magallanes y Antártica Chilena').match(region))
+        self.assertTrue(RollFilter(
+            provinces=['Arica', 'Antártica']).match(region))
+        self.assertFalse(RollFilter(
+            regions=['Magallanes'], communes=['Punta Arenas']).match(region))
+        aysen = {'region': 'DE AYSEN DEL GRAL. C. IBANEZ DEL CAMPO'}
+        self.assertFalse(RollFilter(regions=['Coquimbo']).match(aysen))
+        self.assertFalse(RollFilter(regions=['Antártica Chilena']).match(
+            {'region': 'DE MAGALLANES Y ANTARTICA CH'}))
+        self.assertTrue(RollFilter(regions=['Aysén Ibáñez']).match(aysen))
+        self.assertEqual(abbreviated_words(aysen['region']), {'gral'})
+        self.assertFalse(RollFilter().is_active)
+        with self.assertRaises(TypeError):
+            RollFilter(communes=['Gotham'])
+        source = 'tests/fixtures/Antártica.pdf'
+        roll = ElectoralRoll(source=source, processor='pdfminersix')
+        pdf = roll.process_pdf(source)
+        sheet = RollAdapter(roll.process_pdf_page(pdf[1]),
+                            'pdfminersix').sheet
+        roll.close_pdf()
+        parsed = RollParser(
+            sheet, place_filter=RollFilter(communes='Santiago'))
+        self.assertTrue(parsed.is_filtered)
+        self.assertEqual(parsed.header['commune'], 'ANTARTICA')
+        self.assertEqual((parsed.fields, parsed.entries), ([], []))
+        self.assertFalse(RollParser(
+            sheet, place_filter=RollFilter(communes='Antártica')).is_filtered)
+        roll.run()
+        with tempfile.TemporaryDirectory() as tmp:
+            shutil.copy(source, tmp+'/a.pdf')
+            Path(tmp+'/blank.pdf').write_bytes(b'%PDF-1.4\n%%EOF\n')
+            for kwargs in [{}, {'workers': 2}]:
+                matched = ElectoralRoll(
+                    source=tmp, processor='pdfminersix',
+                    regions=['Magallanes'], communes='ANTÁRTICA',
+                    catalog_index=tmp+'/catalog.json', **kwargs)
+                matched.run()
+                self.assertEqual(list(matched.entries), list(roll.entries))
+                files = matched.metadata['files']
+                self.assertTrue(files['blank.pdf']['filtered'])
+                self.assertNotIn('filtered', files['a.pdf'])
+            self.assertTrue(Path(tmp+'/catalog.json').is_file())
+            skipped = ElectoralRoll(
+                source=tmp, processor='pdfminersix', communes=['Santiago'])
+            skipped.run()
+            self.assertTrue(skipped.metadata['files']['a.pdf']['filtered'])
+            self.assertEqual(
+                skipped.metadata['analysis']['durations']['parsing'],
+                timedelta())
+            self.assertIsNone(skipped.fields)
+
+    def test_roll_tracer(self):
+        source = 'tests/fixtures/Antártica.pdf'
+        with tempfile.TemporaryDirectory() as tmp:
+            for kwargs in [{}, {'pipeline': True}, {'workers': 2}]:
+                trace = tmp+'/trace/trace.json'
+                roll = ElectoralRoll(source=source, processor='pdfminersix',
+                                     trace=trace, **kwargs)
+                roll.run()
+                self.assertEqual(roll.metadata['analysis']['trace'],
+                                 str(Path(trace).absolute()))
+                with open(trace) as f:
+                    events = json.load(f)['traceEvents']
+                spans = [x for x in events if x['ph'] == 'X']
+                names = {x['name'] for x in spans}
+                self.assertTrue({'run', 'processing', 'adapting', 'parsing',
+                                 'header', 'fields', 'entries'} <= names)
+                self.assertTrue(all(x['dur'] >= 0 and x['ts'] >= 0
+                                    for x in spans))
+                parsing = [x for x in spans if x['name'] == 'parsing']
+                self.assertEqual(len(parsing), 5)
+                self.assertEqual(sum([x['args']['entries'] for x in parsing]),
+                                 len(roll.entries))
+                if not kwargs.get('pipeline'):
+                    pages = [x for x in spans if x['name'] == 'page']
+                    self.assertEqual(len(pages), 5)
+                    self.assertTrue(all(x['args']['length'] > 0
+                                        for x in pages))
+        roll = ElectoralRoll(source=source, processor='pdfminersix')
+        roll.run()
+        self.assertFalse(roll.tracer.is_active)
+        self.assertEqual(roll.tracer.events, [])
+        self.assertNotIn('trace', roll.metadata['analysis'])
+
+    def test_roll_profiler(self):
+        source = 'tests/fixtures/Antártica.pdf'
+        stages = {'processing', 'adapting', 'parsing', 'memorizing'}
+        with tempfile.TemporaryDirectory() as tmp:
+            for kwargs in [{}, {'pipeline': True},
+                           {'pipeline': True, 'parse_process': True},
+                           {'workers': 2}]:
+                profile = tmp+'/profile'
+                roll = ElectoralRoll(source=source, processor='pdfminersix',
+                                     profile=profile, **kwargs)
+                roll.run()
+                exported = roll.metadata['analysis']['profile']
+                self.assertTrue(stages <= set(exported))
+                for stage, files in exported.items():
+                    self.assertEqual(
+                        files['pstats'],
+                        str(Path(profile, f'{stage}.pdfminersix.pstats')
+                            .absolute()))
+                    stats = pstats.Stats(files['pstats'])
+                    self.assertTrue(stats.total_calls > 0)
+                    with open(files['collapsed']) as f:
+                        lines = f.read().splitlines()
+                    self.assertTrue(lines)
+                    self.assertTrue(all(
+                        int(x.rsplit(' ', 1)[1]) > 0 for x in lines))
+                stats = pstats.Stats(exported['parsing']['pstats'])
+                self.assertTrue(any(x[2] == 'parse_entry'
+                                    for x in stats.stats))
+                self.assertFalse(any(x[2] == 'parse_entry' for x in
+                                     pstats.Stats(exported['processing'][
+                                         'pstats']).stats))
+                self.assertFalse(Path(profile, '.workers').exists())
+                self.assertEqual(len(roll.entries), 312)
+            barrier = threading.Barrier(2, timeout=10)
+            threads = [threading.Thread(target=roll.profiler.run, args=(
+                x, barrier.wait, [])) for x in ['parsing', 'exporting']]
+            roll.profiler.start()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            self.assertFalse(barrier.broken)
+            self.assertEqual(set(roll.profiler.export('pdfminersix')),
+                             {'parsing', 'exporting'})
+        roll = ElectoralRoll(source=source, processor='pdfminersix')
+        self.assertFalse(roll.profiler.is_active)
+
+    def test_roll_memory_report(self):
+        source = 'tests/fixtures/Antártica.pdf'
+        with tempfile.TemporaryDirectory() as tmp:
+            for kwargs in [{'memory_report': 'rss'},
+                           {'memory_report': 'tracemalloc', 'memory_top': 3},
+                           {'memory_report': 'rss', 'workers': 2}]:
+                roll = ElectoralRoll(source=source, processor='pdfminersix',
+                                     output=tmp, export=True, **kwargs)
+                roll.run()
+                report = roll.metadata['analysis']['memory']
+                self.assertEqual(report['mode'], kwargs['memory_report'])
+                self.assertTrue(report['rss']['peak'] >= report['rss']['end'])
+                self.assertTrue(report['files']['Antártica.pdf']['rss'] > 0)
+                self.assertTrue({'memorizing', 'exporting'} <=
+                                set(report['stages']))
+                self.assertEqual(report['memorized']['entries'], 312)
+                self.assertTrue(report['memorized']['bytes_per_entry'] > 0)
+                self.assertEqual(report['errors']['count'], len(roll.errors))
+                self.assertEqual(report['errors']['spilled'], 0)
+                if kwargs['memory_report'] == 'tracemalloc':
+                    self.assertEqual(len(report['top']), 3)
+                    self.assertTrue(report['traced']['peak'] > 0)
+                    self.assertTrue(report['stages']['parsing']['peak'] > 0)
+                    self.assertFalse(tracemalloc.is_tracing())
+                else:
+                    self.assertNotIn('top', report)
+                summary = [x for x in roll.metadata['exported_to']
+                           if 'summary' in x][0]
+                with open(summary) as f:
+                    self.assertIn('bytes_per_entry', f.read())
+        roll = ElectoralRoll(source=source, processor='pdfminersix')
+        self.assertFalse(roll.memory_monitor.is_active)
+        with self.assertRaises(TypeError):
+            ElectoralRoll(source=source, memory_report='heap')
+
+    def test_roll_watchdog(self):
+        source = 'tests/fixtures/Antártica.pdf'
+        roll = ElectoralRoll(source=source, processor='pdfminersix')
+        roll.run()
+        guarded = ElectoralRoll(source=source, processor='pdfminersix',
+                                page_timeout=60)
+        self.assertTrue(guarded.watchdog.is_active)
+        guarded.run()
+        self.roll_assert_runned(guarded)
+        self.assertEqual(list(guarded.entries), list(roll.entries))
+        self.assertEqual(guarded.metadata['rolls'], roll.metadata['rolls'])
+        report = guarded.metadata['analysis']['watchdog']
+        self.assertEqual((report['pages'], report['retries']), (5, 0))
+        self.assertEqual(report['failures'], [])
+
+        getitem = PdfminersixPages.__getitem__
+
+        def faulty(pages, index):
+            if index == 1:
+                os._exit(3)
+            if index == 2:
+                time.sleep(60)
+            return getitem(pages, index)
+        PdfminersixPages.__getitem__ = faulty
+        try:
+            faulted = ElectoralRoll(source=source, processor='pdfminersix',
+                                    page_timeout=5)
+            faulted.run()
+        finally:
+            PdfminersixPages.__getitem__ = getitem
+        report = faulted.metadata['analysis']['watchdog']
+        self.assertEqual((report['crashes'], report['timeouts']), (1, 1))
+        self.assertEqual(report['retries'], 2)
+        self.assertEqual(report['recovered'] + report['failed'], 2)
+        errors = [x for x in faulted.errors
+                  if x.get('code', '').startswith('page-')]
+        self.assertEqual(
+            [(x['code'], x['page'], x['processor']) for x in errors[:1]],
+            [('page-crash', 2, 'pdfminersix')])
+        self.assertIn(('page-timeout', 3, 'pdfminersix'),
+                      [(x['code'], x['page'], x['processor'])
+                       for x in errors])
+        self.assertEqual(errors, report['failures'])
+        expected = []
+        for idx, page in enumerate(roll.process_pdf(source)):
+            if idx not in (1, 2):
+                expected += roll.sheet_parse(RollAdapter(
+                    roll.process_pdf_page(page), 'pdfminersix').sheet).entries
+        roll.close_pdf()
+        entries = list(faulted.entries)
+        self.assertTrue(all([tuple(x) in entries for x in expected]))
+        with self.assertRaises(TypeError):
+            ElectoralRoll(source=source, page_timeout=5, workers=2)
+        with self.assertRaises(TypeError):
+            ElectoralRoll(source=source, page_timeout='soon')
+
+    def test_roll_server(self):
+        source = 'tests/fixtures/Antártica.pdf'
+        roll = ElectoralRoll(source=source, processor='pdfminersix')
+        roll.run()
+        run = RollStreamer.run
+
+        def faulty(streamer):
+            if 'crash.pdf' in streamer.metadata['files']:
+                os._exit(3)
+            return run(streamer)
+        RollStreamer.run = faulty
+        try:
+            with tempfile.TemporaryDirectory() as tmp:
+                shutil.copy(source, tmp+'/crash.pdf')
+                for kwargs in [{'port': 0},
+                               {'socket': tmp+'/serveliza.sock'}]:
+                    server = RollServer(workers=2, processor='pdfminersix',
+                                        **kwargs)
+                    server.start()
+                    httpd = server.listen()
+                    thread = threading.Thread(target=httpd.serve_forever)
+                    thread.start()
+                    try:
+                        self.roll_assert_served(server, roll, tmp)
+                    finally:
+                        httpd.shutdown()
+                        thread.join()
+                        httpd.server_close()
+                        server.close()
+        finally:
+            RollStreamer.run = run
+        with self.assertRaises(TypeError):
+            RollServer(fields=['edad'])
+
+    def roll_assert_served(self, server, roll, tmp):
+        self.assertEqual(server.metrics['warm'], 2)
+        pdf = Path(roll.source[0]).read_bytes()
+        status, lines = self.roll_request(
+            server, 'POST', '/roll?name=a.pdf', pdf)
+        self.assertEqual(status, 200)
+        self.assertEqual([tuple(x['entry'].values()) for x in lines
+                          if x['type'] == 'entry'], list(roll.entries))
+        self.assertEqual(len([x for x in lines if x['type'] == 'error']),
+                         len(roll.errors))
+        pages = [x['page'] for x in lines[:-1]]
+        self.assertEqual(pages, sorted(pages))
+        self.assertEqual(lines[-1]['type'], 'metadata')
+        self.assertEqual(lines[-1]['files']['a.pdf']['rid'], 'PEAEM-2016')
+        json_headers = {'Content-Type': 'application/json'}
+        status, lines = self.roll_request(
+            server, 'POST', '/roll',
+            json.dumps({'path': tmp+'/crash.pdf'}).encode(), json_headers)
+        self.assertEqual(lines[-1]['type'], 'failure')
+        self.assertIn('BrokenProcessPool', lines[-1]['reason'])
+        status, lines = self.roll_request(
+            server, 'POST', '/roll',
+            json.dumps({'path': roll.source[0]}).encode(), json_headers)
+        self.assertEqual(lines[-1]['files']['Antártica.pdf']['entries'][
+            'total'], 312)
+        status, lines = self.roll_request(
+            server, 'POST', '/roll', b'{}', json_headers)
+        self.assertEqual(status, 400)
+        status, lines = self.roll_request(server, 'GET', '/')
+        self.assertEqual(status, 404)
+        status, metrics = self.roll_request(server, 'GET', '/metrics')
+        self.assertEqual([metrics[x] for x in [
+            'queue_depth', 'in_progress', 'completed', 'failed',
+            'restarts']], [0, 0, 2, 1, 1])
+        self.assertEqual(metrics['latency']['wait']['count'], 3)
+        self.assertTrue(metrics['latency']['total']['p95'] > 0)
+        os.kill(next(iter(server._warm)), signal.SIGKILL)
+        time.sleep(1)
+        status, lines = self.roll_request(
+            server, 'POST', '/roll?name=a.pdf', pdf)
+        self.assertEqual(status, 200)
+        self.assertEqual(lines[-1]['type'], 'metadata')
+        metrics = server.metrics
+        self.assertEqual([metrics[x] for x in [
+            'queue_depth', 'in_progress', 'completed', 'failed',
+            'restarts']], [0, 0, 3, 1, 2])
+
+    @staticmethod
+    def roll_request(server, method, path, body=None, headers={}):
+        if server.socket:
+            client = http.client.HTTPConnection('localhost')
+            client.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            client.sock.connect(server.socket)
+        else:
+            client = http.client.HTTPConnection(server.host, server.port)
+        client.request(method, path, body=body, headers=headers)
+        response = client.getresponse()
+        content = response.read().decode('utf-8')
+        client.close()
+        if response.headers['Content-Type'] == 'application/x-ndjson':
+            return response.status, [json.loads(x)
+                                     for x in content.splitlines()]
+        return response.status, json.loads(content)
+
+    def test_roll_accumulators(self):
+        places = [RollPlaces(), RollPlaces()]
+        places[0].add('ANTARTICA', ((200, 'b.pdf'), 0))
+        places[1].add('CABO DE HORNOS', ((100, 'a.pdf'), 1))
+        places[1].add('ANTARTICA', ((300, 'c.pdf'), 2))
+        for first, second in [places, places[::-1]]:
+            self.assertEqual(first.merge(second).to_list(),
+                             ['CABO DE HORNOS', 'ANTARTICA'])
+        with tempfile.TemporaryDirectory() as tmp:
+            for name in ['a.pdf', 'b.pdf', 'c.pdf']:
+                shutil.copy('tests/fixtures/Antártica.pdf', tmp+'/'+name)
+            serial = ElectoralRoll(source=tmp, processor='pdfminersix')
+            serial.run()
+            shards = [ElectoralRoll(source=tmp, processor='pdfminersix',
+                                    shard=x) for x in ['1/2', '2/2']]
+            for shard in shards:
+                shard.run()
+            memorizer = RollMemorizer()
+            partial = RollPartial()
+            for shard in reversed(shards):
+                memorizer.merge(shard.memorizer)
+                partial = RollPartial.from_metadata(shard.metadata)\
+                    .merge(partial)
+            rolls = serial.metadata['rolls']
+            self.assertEqual(
+                {x: y['metadata'] for x, y in memorizer.storage.items()},
+                rolls)
+            self.assertEqual(len(memorizer.storage[serial.rid]['entries']),
+                             len(serial.entries))
+            metadata = partial.to_metadata()
+            self.assertEqual(metadata['rolls'], rolls)
+            self.assertEqual(sorted(metadata['files']),
+                             sorted(serial.metadata['files']))
+            self.assertEqual(
+                metadata['analysis']['durations']['parsing'],
+                sum([x.metadata['analysis']['durations']['parsing']
+                     for x in shards], timedelta()))
+
     def roll_assert_props(self, roll):
         # operationals
         self.assertFalse(roll.is_runned)
@@ -90,3 +1051,7 @@ class TestServeliza(unittest.TestCase):
         self.assertTrue(analysis['durations']['parsing'] > timedelta())
         self.assertTrue(analysis['durations']['memorizing'] > timedelta())
         self.assertTrue(analysis['durations']['exporting'] > timedelta())
+        files = roll.metadata['files'].values()
+        for stage, duration in analysis['durations'].items():
+            self.assertEqual(sum([x['durations'][stage] for x in files],
+                                 timedelta()), duration)